@@ -0,0 +1,109 @@
+import math
+
+from django.conf import settings
+from django.core import checks, signing
+from django.core.cache import caches
+from django.db.models.signals import post_delete
+
+from . import caching
+from .models import AuthToken, Profile
+
+
+SALT = "API.access_tokens"
+
+
+def enabled():
+    return getattr(settings, "AUTH_ACCESS_TOKENS", False)
+
+
+def lifetime():
+    return getattr(settings, "AUTH_ACCESS_TOKEN_SECONDS", 300)
+
+
+def revocation_alias():
+    return getattr(settings, "AUTH_REVOCATION_CACHE_ALIAS", "default")
+
+
+def revocations():
+    return caches[revocation_alias()]
+
+
+def revoked_key(token_id):
+    return f"revoked-token:{token_id}"
+
+
+def is_access_token(value):
+    # refresh tokens are 40 hex chars; signed values carry ":" separators
+    return ":" in value
+
+
+def issue(token, profile):
+    # Short-lived bearer token signed with SECRET_KEY; it names the AuthToken
+    # (refresh token) it was minted from so deleting that row revokes it, and
+    # the key generation (created_at) so rotating the key revokes it too.
+    claims = {
+        "u": token.user_id,
+        "p": profile.id,
+        "t": token.id,
+        "g": token.created_at.timestamp(),
+        "a": profile.is_admin,
+        "e": profile.is_elder,
+    }
+    return signing.dumps(claims, salt=SALT, compress=False)
+
+
+def grant(token, profile):
+    if not enabled():
+        return {}
+    return {"access_token": issue(token, profile), "access_expires_in": lifetime()}
+
+
+def verify(value):
+    # (profile, error message); no database query on success
+    if not enabled():
+        return None, "Invalid token"
+    try:
+        claims = signing.loads(value, salt=SALT, max_age=lifetime())
+    except signing.SignatureExpired:
+        return None, "Token expired"
+    except signing.BadSignature:
+        return None, "Invalid token"
+    revoked_before = revocations().get(revoked_key(claims["t"]))
+    if revoked_before is not None and claims.get("g", 0) < revoked_before:
+        return None, "Token revoked"
+    # the remaining fields are deferred and load on first access
+    profile = Profile.from_db(
+        "default",
+        ["id", "user_id", "is_admin", "is_elder"],
+        [claims["p"], claims["u"], claims["a"], claims["e"]],
+    )
+    return profile, None
+
+
+def revoke(token_id, before=math.inf):
+    # access tokens from generations older than `before` stop working;
+    # remembered only as long as an access token minted from it can live
+    revocations().set(revoked_key(token_id), before, lifetime())
+
+
+def token_deleted(sender, instance, **kwargs):
+    revoke(instance.pk)
+
+
+def check_revocation_cache(app_configs, **kwargs):
+    if not enabled() or caching.is_shared(revocation_alias()):
+        return []
+    return [
+        checks.Error(
+            "AUTH_ACCESS_TOKENS needs a cache shared by all processes.",
+            hint="Point AUTH_REVOCATION_CACHE_ALIAS at a shared cache (e.g. set REDIS_URL); "
+            "with a per-process cache, revocations only reach the process that made them.",
+            obj="AUTH_REVOCATION_CACHE_ALIAS",
+            id="API.E001",
+        )
+    ]
+
+
+def connect_signals():
+    checks.register(check_revocation_cache, checks.Tags.security)
+    post_delete.connect(token_deleted, sender=AuthToken, dispatch_uid="access-token-revocation")
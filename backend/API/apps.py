@@ -4,3 +4,29 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'API'
+
+    def ready(self):
+        from . import (
+            access_tokens,
+            audiences,
+            caching,
+            comments,
+            images,
+            memberships,
+            polls,
+            rsvp,
+            search,
+            storage,
+        )
+        from .models import ArquivosIgreja, RecursosEducacionais
+
+        access_tokens.connect_signals()
+        audiences.connect_signals()
+        caching.connect_signals()
+        comments.connect_signals()
+        images.connect_signals()
+        memberships.connect_signals()
+        polls.connect_signals()
+        rsvp.connect_signals()
+        search.connect_signals()
+        storage.connect_signals([ArquivosIgreja, RecursosEducacionais])
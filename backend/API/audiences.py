@@ -0,0 +1,118 @@
+from django.db.models import CharField, Exists, OuterRef, Q, Value
+from django.db.models.signals import post_delete
+
+from . import memberships
+from .helpers import has_staff_access
+from .models import Avisos, Comunicados, Leituras
+
+
+IGREJA = "igreja"
+GRUPOS = "grupos"
+PERFIS = "perfis"
+PUBLICOS = (IGREJA, GRUPOS, PERFIS)
+
+# tipo stored in Leituras -> model
+ANUNCIOS = {
+    "comunicado": Comunicados,
+    "aviso": Avisos,
+}
+
+INBOX_FIELDS = ("id", "titulo", "mensagem", "data_envio", "igreja_id", "publico")
+
+
+def owner_column(model):
+    return f"{model._meta.model_name}_id"
+
+
+def in_my_groups(model, profile):
+    through = model.grupos.through
+    return Exists(
+        through.objects.filter(
+            **{owner_column(model): OuterRef("pk"), "grupos_id__in": memberships.group_ids(profile)}
+        )
+    )
+
+
+def addressed_to(model, profile):
+    through = model.destinatarios.through
+    return Exists(
+        through.objects.filter(**{owner_column(model): OuterRef("pk"), "profile_id": profile.id})
+    )
+
+
+def visible(queryset, profile):
+    # Whole-church announcements are public; group and profile audiences
+    # resolve against the caller's cached group ids and the recipients table.
+    if profile is not None and has_staff_access(profile):
+        return queryset
+    if profile is None:
+        return queryset.filter(publico=IGREJA)
+    model = queryset.model
+    return queryset.filter(
+        Q(publico=IGREJA)
+        | (Q(publico=GRUPOS) & in_my_groups(model, profile))
+        | (Q(publico=PERFIS) & addressed_to(model, profile))
+    )
+
+
+def can_view(anuncio, profile):
+    if anuncio.publico == IGREJA or (profile is not None and has_staff_access(profile)):
+        return True
+    if profile is None:
+        return False
+    if anuncio.publico == GRUPOS:
+        return anuncio.grupos.filter(id__in=memberships.group_ids(profile)).exists()
+    return anuncio.destinatarios.filter(pk=profile.id).exists()
+
+
+def inbox(model, profile):
+    # Announcements meant for this profile: its churches, groups or itself.
+    return model.objects.filter(
+        Q(publico=IGREJA, igreja_id__in=memberships.igreja_ids(profile))
+        | (Q(publico=GRUPOS) & in_my_groups(model, profile))
+        | (Q(publico=PERFIS) & addressed_to(model, profile))
+    )
+
+
+def unread(profile):
+    # One UNION ALL query over both announcement tables, newest first.
+    parts = []
+    for tipo, model in ANUNCIOS.items():
+        read = Leituras.objects.filter(perfil_id=profile.id, tipo=tipo, objeto_id=OuterRef("pk"))
+        parts.append(
+            inbox(model, profile)
+            .filter(~Exists(read))
+            .annotate(tipo=Value(tipo, output_field=CharField()))
+            .values("tipo", *INBOX_FIELDS)
+        )
+    first, *rest = parts
+    return first.union(*rest, all=True).order_by("-data_envio", "-id")
+
+
+def mark_read(profile, tipo, ids):
+    # Only announcements the profile may see are marked; returns how many
+    # were not already read.
+    model = ANUNCIOS[tipo]
+    ids = set(visible(model.objects.filter(pk__in=ids), profile).values_list("pk", flat=True))
+    if not ids:
+        return 0
+    ids -= set(
+        Leituras.objects.filter(perfil_id=profile.id, tipo=tipo, objeto_id__in=ids).values_list(
+            "objeto_id", flat=True
+        )
+    )
+    Leituras.objects.bulk_create(
+        [Leituras(perfil_id=profile.id, tipo=tipo, objeto_id=objeto_id) for objeto_id in ids],
+        ignore_conflicts=True,
+    )
+    return len(ids)
+
+
+def anuncio_deleted(sender, instance, **kwargs):
+    tipo = next(tipo for tipo, model in ANUNCIOS.items() if model is sender)
+    Leituras.objects.filter(tipo=tipo, objeto_id=instance.pk).delete()
+
+
+def connect_signals():
+    for tipo, model in ANUNCIOS.items():
+        post_delete.connect(anuncio_deleted, sender=model, dispatch_uid=f"leituras-{tipo}")
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias):
+    # LocMem lives in one process and Dummy stores nothing, so neither can
+    # carry an invalidation from one worker to another.
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def check_replica_cache(app_configs, **kwargs):
+    # ReplicaRoutingMiddleware pins a client to the primary after a write
+    # through the default cache; a pin kept in one worker misses the next
+    # request when another worker serves it.
+    if not getattr(settings, "DATABASE_REPLICAS", []) or is_shared("default"):
+        return []
+    return [
+        checks.Error(
+            "DATABASE_REPLICAS needs a default cache shared by all processes.",
+            hint="Set REDIS_URL; with a per-process cache, reads right after a write "
+            "can go to a lagging replica.",
+            obj="DATABASE_REPLICAS",
+            id="API.E002",
+        )
+    ]
+
+
+def connect_signals():
+    checks.register(check_replica_cache, checks.Tags.caches)
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.db.models.signals import post_delete, post_save
+
+from .models import ComentariosPostagens, PostagensGrupos
+
+
+def preview_size():
+    return getattr(settings, "COMENTARIOS_PREVIEW_SIZE", 3)
+
+
+def latest(postagem_ids, size=None):
+    # The newest `size` comments of every postagem in one windowed query,
+    # instead of one comment list request per post.
+    size = preview_size() if size is None else size
+    postagem_ids = list(postagem_ids)
+    if not postagem_ids or size <= 0:
+        return ComentariosPostagens.objects.none()
+    return (
+        ComentariosPostagens.objects.filter(postagem_id__in=postagem_ids)
+        .annotate(
+            posicao=Window(
+                RowNumber(),
+                partition_by=[F("postagem_id")],
+                order_by=[F("data_comentario").desc(), F("id").desc()],
+            )
+        )
+        .filter(posicao__lte=size)
+        .order_by("postagem_id", "posicao")
+    )
+
+
+def recount(postagem_ids=None):
+    counts = (
+        ComentariosPostagens.objects.filter(postagem_id=OuterRef("pk"))
+        .values("postagem_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    postagens = PostagensGrupos.objects.all()
+    if postagem_ids is not None:
+        postagens = postagens.filter(pk__in=postagem_ids)
+    return postagens.update(comentarios_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def comentario_saved(sender, instance, created, **kwargs):
+    if created:
+        PostagensGrupos.objects.filter(pk=instance.postagem_id).update(
+            comentarios_count=F("comentarios_count") + 1
+        )
+
+
+def comentario_deleted(sender, instance, **kwargs):
+    # when the postagem itself is being deleted this updates nothing
+    PostagensGrupos.objects.filter(pk=instance.postagem_id, comentarios_count__gt=0).update(
+        comentarios_count=F("comentarios_count") - 1
+    )
+
+
+def connect_signals():
+    post_save.connect(comentario_saved, sender=ComentariosPostagens, dispatch_uid="comentarios-count")
+    post_delete.connect(
+        comentario_deleted, sender=ComentariosPostagens, dispatch_uid="comentarios-count"
+    )
@@ -0,0 +1,114 @@
+import datetime
+import decimal
+import json
+import re
+import secrets
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+ORJSON_OPTIONS = 0
+if orjson is not None:
+    # datetimes are encoded natively: RFC 3339 with microseconds when set and
+    # "Z" for UTC. ApiJSONEncoder writes the same strings on the stdlib path.
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def fast_json_enabled():
+    return orjson is not None and getattr(settings, "JSON_ENCODER_BACKEND", "auto") != "stdlib"
+
+
+class JsonFragment:
+    # Already-serialized JSON (e.g. a JSONField read as text) embedded in the
+    # output verbatim, without a json.loads/dumps round trip.
+    __slots__ = ("raw",)
+
+    def __init__(self, raw):
+        self.raw = raw.encode() if isinstance(raw, str) else raw
+
+
+def json_fragment(raw):
+    return None if raw is None else JsonFragment(raw)
+
+
+class Fragments:
+    # Each fragment is encoded as a placeholder string carrying a per-call
+    # nonce, then the placeholders are swapped for the raw bytes in one pass.
+    def __init__(self):
+        self.nonce = secrets.token_hex(8)
+        self.raw = []
+
+    def placeholder(self, fragment):
+        self.raw.append(fragment.raw)
+        return f"{self.nonce}:{len(self.raw) - 1}"
+
+    def splice(self, encoded):
+        if not self.raw:
+            return encoded
+        pattern = re.compile(b'"' + self.nonce.encode() + rb':(\d+)"')
+        return pattern.sub(lambda match: self.raw[int(match.group(1))], encoded)
+
+
+def orjson_default(value, fragments):
+    if isinstance(value, JsonFragment):
+        return fragments.placeholder(value)
+    if isinstance(value, datetime.timedelta):
+        return duration_iso_string(value)
+    if isinstance(value, (decimal.Decimal, Promise)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ApiJSONEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder with orjson's datetime format, so the backend choice
+    # does not change what clients receive.
+    def __init__(self, *args, fragments=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragments = fragments
+
+    def default(self, o):
+        if isinstance(o, JsonFragment) and self.fragments is not None:
+            return self.fragments.placeholder(o)
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        if isinstance(o, datetime.time):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(data, encoder=None, json_dumps_params=None):
+    fragments = Fragments()
+    if fast_json_enabled() and encoder is None and not json_dumps_params:
+        encoded = orjson.dumps(
+            data, default=lambda value: orjson_default(value, fragments), option=ORJSON_OPTIONS
+        )
+        return fragments.splice(encoded)
+    if encoder is not None:
+        return json.dumps(data, cls=encoder, **(json_dumps_params or {})).encode()
+    encoded = json.dumps(
+        data, cls=ApiJSONEncoder, fragments=fragments, **(json_dumps_params or {})
+    ).encode()
+    return fragments.splice(encoded)
+
+
+class JsonResponse(HttpResponse):
+    # Drop-in for django.http.JsonResponse that encodes with orjson when it
+    # is installed.
+    def __init__(self, data, encoder=None, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data, encoder, json_dumps_params), **kwargs)
@@ -0,0 +1,94 @@
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+
+
+class Busy(Exception):
+    pass
+
+
+class HashPool:
+    # Password hashing runs on `workers` threads (hashlib releases the GIL
+    # inside PBKDF2), so a login burst can use at most that many cores.
+    # At most `queue` more jobs wait; beyond that callers get Busy at once
+    # instead of piling up request threads.
+    def __init__(self, workers, queue, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(workers + queue) if workers > 0 else None
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+            return self.executor
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise Busy
+        try:
+            future = self.get_executor().submit(self.call, func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    @staticmethod
+    def call(func, *args):
+        try:
+            return func(*args)
+        finally:
+            # pool threads outlive requests, so a job that touched the
+            # database (authenticate does) must not keep its connection
+            connections.close_all()
+
+    def run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        future = self.submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise Busy
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashPool(
+                settings.PASSWORD_HASH_WORKERS,
+                settings.PASSWORD_HASH_QUEUE,
+                settings.PASSWORD_HASH_TIMEOUT,
+            )
+        return _pool
+
+
+def run(func, *args):
+    return get_pool().run(func, *args)
+
+
+def authenticate_user(request, username, password):
+    # django.contrib.auth.authenticate itself runs on the pool, so every
+    # AUTHENTICATION_BACKENDS entry, the is_active rule, ModelBackend's
+    # rehash-on-login and user_login_failed behave as in a plain login.
+    # Raises Busy.
+    return run(partial(authenticate, request, username=username, password=password))
+
+
+def hash_password(password):
+    return run(make_password, password)
@@ -0,0 +1,272 @@
+import json
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .encoders import JsonResponse
+from . import access_tokens, memberships
+from .models import AuthToken, Grupos, Profile
+
+
+def json_error(message, status=400, **extra):
+    payload = {"error": message}
+    payload.update(extra)
+    return JsonResponse(payload, status=status)
+
+
+def parse_json_body(request):
+    if not request.body:
+        return {}, None
+    try:
+        return json.loads(request.body), None
+    except json.JSONDecodeError:
+        return None, json_error("Invalid JSON body", status=400)
+
+
+def get_request_data(request):
+    content_type = request.content_type or ""
+    if content_type.startswith("application/json"):
+        return parse_json_body(request)
+    if request.POST:
+        return request.POST.dict(), None
+    if not request.body:
+        return {}, None
+    return parse_json_body(request)
+
+
+def get_list_value(data, name, request=None):
+    if name in data:
+        value = data.get(name)
+        if isinstance(value, list):
+            return value
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return [value]
+    if request is not None:
+        values = request.POST.getlist(name)
+        if values:
+            return values
+    return []
+
+
+def require_fields(data, fields):
+    missing = [field for field in fields if data.get(field) in (None, "")]
+    if missing:
+        return json_error("Missing required fields", status=400, fields=missing)
+    return None
+
+
+def parse_int(value, field_name, required=True):
+    if value in (None, ""):
+        if required:
+            return None, json_error(f"{field_name} is required", status=400)
+        return None, None
+    try:
+        return int(value), None
+    except (TypeError, ValueError):
+        return None, json_error(f"Invalid {field_name}", status=400)
+
+
+def parse_datetime_value(value, field_name, required=True):
+    if value in (None, ""):
+        if required:
+            return None, json_error(f"{field_name} is required", status=400)
+        return None, None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None, json_error(f"Invalid datetime for {field_name}", status=400)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed, None
+
+
+def parse_page(request, default_size=20, max_size=50):
+    page, error = parse_int(request.GET.get("page"), "page", required=False)
+    if error:
+        return None, error
+    page_size, error = parse_int(request.GET.get("page_size"), "page_size", required=False)
+    if error:
+        return None, error
+    return (max(page or 1, 1), min(max(page_size or default_size, 1), max_size)), None
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "sim")
+    return bool(value)
+
+
+def extract_token_key(request):
+    auth_header = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth_header:
+        return None
+    parts = auth_header.split()
+    if len(parts) == 2 and parts[0].lower() in ("token", "bearer"):
+        return parts[1]
+    return auth_header
+
+
+def token_expiry_cutoffs(now=None):
+    # (idle, age): a token expires when it was last used before idle
+    # (sliding AUTH_TOKEN_TTL_DAYS) or issued before age (AUTH_TOKEN_MAX_AGE_DAYS).
+    now = now or timezone.now()
+    ttl_days = getattr(settings, "AUTH_TOKEN_TTL_DAYS", 7)
+    max_age_days = getattr(settings, "AUTH_TOKEN_MAX_AGE_DAYS", 0)
+    idle = now - timedelta(days=ttl_days) if ttl_days and ttl_days > 0 else None
+    age = now - timedelta(days=max_age_days) if max_age_days and max_age_days > 0 else None
+    return idle, age
+
+
+def expired_tokens_filter(now=None):
+    idle, age = token_expiry_cutoffs(now)
+    condition = Q(pk__in=[])
+    if idle is not None:
+        condition |= Q(last_used_at__lt=idle) | Q(last_used_at__isnull=True, created_at__lt=idle)
+    if age is not None:
+        condition |= Q(created_at__lt=age)
+    return condition
+
+
+def token_is_expired(token, now=None):
+    idle, age = token_expiry_cutoffs(now)
+    if idle is not None and (token.last_used_at or token.created_at) < idle:
+        return True
+    return age is not None and token.created_at < age
+
+
+def token_needs_touch(token, now):
+    # Sliding expiry without a write per request: last_used_at only moves
+    # once every AUTH_TOKEN_TOUCH_SECONDS.
+    interval = timedelta(seconds=getattr(settings, "AUTH_TOKEN_TOUCH_SECONDS", 300))
+    return token.last_used_at is None or now - token.last_used_at >= interval
+
+
+def touch_token(token, now=None):
+    now = now or timezone.now()
+    if not token_needs_touch(token, now):
+        return False
+    AuthToken.objects.filter(pk=token.pk).update(last_used_at=now)
+    token.last_used_at = now
+    return True
+
+
+async def atouch_token(token, now=None):
+    now = now or timezone.now()
+    if not token_needs_touch(token, now):
+        return False
+    await AuthToken.objects.filter(pk=token.pk).aupdate(last_used_at=now)
+    token.last_used_at = now
+    return True
+
+
+def issue_token(user, device=""):
+    # One token per device, so logging in on a tablet keeps the phone signed
+    # in. Logging in again on the same device replaces its token.
+    device = (device or "").strip()[:100]
+    if device:
+        AuthToken.objects.filter(user=user, device=device).delete()
+    now = timezone.now()
+    token = AuthToken.objects.create(
+        user=user, device=device, key=secrets.token_hex(20), last_used_at=now
+    )
+    limit = getattr(settings, "AUTH_TOKEN_MAX_PER_USER", 10)
+    if limit and limit > 0:
+        stale = AuthToken.objects.filter(user=user).order_by("-last_used_at", "-id")[limit:]
+        stale_ids = list(stale.values_list("id", flat=True))
+        if stale_ids:
+            AuthToken.objects.filter(pk__in=stale_ids).delete()
+    return token
+
+
+def refresh_token(token):
+    # New key and a fresh lifetime for the same device; the old key stops
+    # working at once. None when a concurrent refresh already rotated it.
+    now = timezone.now()
+    key = secrets.token_hex(20)
+    updated = AuthToken.objects.filter(pk=token.pk, key=token.key).update(
+        key=key, created_at=now, last_used_at=now
+    )
+    if not updated:
+        return None
+    access_tokens.revoke(token.pk, before=now.timestamp())
+    token.key, token.created_at, token.last_used_at = key, now, now
+    return token
+
+
+def get_authenticated_profile(request):
+    token_key = extract_token_key(request)
+    if not token_key:
+        return None, json_error("Authorization header missing", status=401)
+    if access_tokens.is_access_token(token_key):
+        return verify_access_token(request, token_key)
+    try:
+        token = AuthToken.objects.select_related("user").get(key=token_key)
+    except AuthToken.DoesNotExist:
+        return None, json_error("Invalid token", status=401)
+    if token_is_expired(token):
+        token.delete()
+        return None, json_error("Token expired", status=401)
+    touch_token(token)
+    request.auth_token = token
+    profile, _ = Profile.objects.get_or_create(user=token.user)
+    return profile, None
+
+
+async def aget_authenticated_profile(request):
+    token_key = extract_token_key(request)
+    if not token_key:
+        return None, json_error("Authorization header missing", status=401)
+    if access_tokens.is_access_token(token_key):
+        return verify_access_token(request, token_key)
+    try:
+        token = await AuthToken.objects.select_related("user").aget(key=token_key)
+    except AuthToken.DoesNotExist:
+        return None, json_error("Invalid token", status=401)
+    if token_is_expired(token):
+        await token.adelete()
+        return None, json_error("Token expired", status=401)
+    await atouch_token(token)
+    request.auth_token = token
+    profile, _ = await Profile.objects.aget_or_create(user=token.user)
+    return profile, None
+
+
+def verify_access_token(request, token_key):
+    profile, message = access_tokens.verify(token_key)
+    if message:
+        return None, json_error(message, status=401)
+    request.auth_token = None
+    return profile, None
+
+
+def has_staff_access(profile):
+    return profile.is_admin or profile.is_elder
+
+
+def is_group_member(profile, grupo):
+    if has_staff_access(profile):
+        return True
+    grupo_id = grupo.pk if isinstance(grupo, Grupos) else grupo
+    return grupo_id in memberships.group_ids(profile)
+
+
+def wants_columns(request):
+    return request.GET.get("format") == "columns"
+
+
+def projection_response(request, queryset, projection):
+    if wants_columns(request):
+        return JsonResponse(projection.columns(queryset))
+    return JsonResponse(projection.many(queryset), safe=False)
+
+
+async def aprojection_response(request, queryset, projection):
+    if wants_columns(request):
+        return JsonResponse(await projection.acolumns(queryset))
+    return JsonResponse(await projection.amany(queryset), safe=False)
@@ -0,0 +1,155 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, features
+
+from .models import PostagensGrupos, Profile
+
+logger = logging.getLogger(__name__)
+
+
+DERIVATIVE_SPECS = {
+    "avatar": {"size": (96, 96), "crop": True},
+    "thumbnail": {"size": (320, 320), "crop": False},
+    "feed": {"size": (1080, 1920), "crop": False},
+}
+
+# model -> (file field, variants field, derivative names)
+IMAGE_SOURCES = {
+    Profile: ("image", "image_variants", ("avatar", "thumbnail")),
+    PostagensGrupos: ("arquivo", "arquivo_variants", ("thumbnail", "feed")),
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+READ_SIZE = 64 * 1024
+
+_executor = None
+
+
+def derivative_format():
+    return ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+
+
+def is_image_name(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def content_digest(field_file):
+    digest = hashlib.sha256()
+    with field_file.storage.open(field_file.name, "rb") as handle:
+        for chunk in iter(lambda: handle.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render(image, spec):
+    if spec["crop"]:
+        return ImageOps.fit(image, spec["size"], Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail(spec["size"], Image.LANCZOS)
+    return resized
+
+
+def build_derivatives(model, pk):
+    file_field, variants_field, names = IMAGE_SOURCES[model]
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, file_field)
+    if not field_file or not is_image_name(field_file.name):
+        return None
+
+    storage = field_file.storage
+    digest = content_digest(field_file)
+    image_format, extension = derivative_format()
+    variants = {"source": field_file.name}
+    with storage.open(field_file.name, "rb") as handle:
+        with Image.open(handle) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ("RGB", "RGBA"):
+                original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+            for name in names:
+                target = f"derivatives/{digest[:2]}/{digest}-{name}.{extension}"
+                if not storage.exists(target):
+                    derivative = render(original, DERIVATIVE_SPECS[name])
+                    if image_format == "JPEG" and derivative.mode != "RGB":
+                        derivative = derivative.convert("RGB")
+                    buffer = io.BytesIO()
+                    derivative.save(buffer, image_format, quality=80, method=4)
+                    target = storage.save(target, ContentFile(buffer.getvalue()))
+                variants[name] = target
+
+    # skip the write if the file was replaced while we were rendering
+    model.objects.filter(pk=pk, **{file_field: field_file.name}).update(
+        **{variants_field: variants}
+    )
+    return variants
+
+
+def build_or_log(model, pk):
+    # A broken or unreadable image must not fail the save that scheduled it;
+    # the row keeps no variants for that file and payloads fall back to it.
+    try:
+        return build_derivatives(model, pk)
+    except Exception:
+        logger.exception("Image derivatives failed for %s %s", model.__name__, pk)
+        return None
+
+
+def run_job(model, pk):
+    try:
+        build_or_log(model, pk)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix="image-derivatives"
+        )
+    return _executor
+
+
+def submit(model, pk):
+    if settings.IMAGE_DERIVATIVE_WORKERS <= 0:
+        build_or_log(model, pk)
+    else:
+        get_executor().submit(run_job, model, pk)
+
+
+def schedule_derivatives(sender, instance, **kwargs):
+    file_field, variants_field, _ = IMAGE_SOURCES[sender]
+    field_file = getattr(instance, file_field)
+    variants = getattr(instance, variants_field) or {}
+    if not field_file or not is_image_name(field_file.name):
+        if variants:
+            sender.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+        return
+    if variants.get("source") == field_file.name:
+        return
+    transaction.on_commit(lambda: submit(sender, instance.pk))
+
+
+def current_variants(source_name, variants):
+    # derivative paths, only while they were rendered from the current file
+    if not variants or not source_name or variants.get("source") != source_name:
+        return {}
+    return {name: path for name, path in variants.items() if name != "source"}
+
+
+def connect_signals():
+    for model in IMAGE_SOURCES:
+        post_save.connect(
+            schedule_derivatives,
+            sender=model,
+            dispatch_uid=f"image-derivatives-{model._meta.model_name}",
+        )
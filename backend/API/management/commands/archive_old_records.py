@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from API import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Move read notifications and old private messages into the archive tables "
+        "in small batches (see NOTIFICACOES_RETENCAO_DIAS / MENSAGENS_RETENCAO_MESES)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause", type=float, default=0.05, help="Seconds to sleep between batches."
+        )
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument(
+            "--only", action="append", choices=["notificacoes", "mensagens"], default=None
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            notificacoes = retention.expired_notificacoes().count()
+            mensagens = retention.expired_mensagens().count()
+            self.stdout.write(
+                f"Would archive {notificacoes} notificacoes and {mensagens} mensagens."
+            )
+            return
+        moved = retention.run(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            max_batches=options["max_batches"],
+            only=options["only"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Archived " + ", ".join(f"{count} {name}" for name, count in moved.items()) + "."
+            )
+        )
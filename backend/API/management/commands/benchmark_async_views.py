@@ -0,0 +1,194 @@
+import asyncio
+import statistics
+import threading
+import time
+import types
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.urls import include, path
+from django.utils import timezone
+
+from API import urls as api_urls
+from API.helpers import issue_token
+from API.models import (
+    Events,
+    Grupos,
+    Igreja,
+    MensagensPrivadas,
+    NotificacoesGrupos,
+    PostagensGrupos,
+    Profile,
+)
+
+
+ENDPOINTS = [
+    "/api/postagens-grupos/",
+    "/api/mensagens-privadas/",
+    "/api/events/",
+    "/api/profiles/notify/",
+    "/api/profiles/resumo/",
+]
+
+
+def urlconf(async_views):
+    module = types.ModuleType(f"benchmark_urls_{'async' if async_views else 'sync'}")
+    module.urlpatterns = [path("api/", include(api_urls.build(async_views=async_views)))]
+    return module
+
+
+@transaction.atomic
+def seed(rows, suffix):
+    # atomic, so a failure half way leaves nothing behind to clean up
+    now = timezone.now()
+    User = get_user_model()
+    igreja = Igreja.objects.create(nome="Bench", endereco="Rua A", telefone="1", email="b@iasd.local")
+    grupo = Grupos.objects.create(nome="Bench", descricao="", igreja=igreja)
+    first, second = (
+        Profile.objects.get(user=User.objects.create(username=f"bench-async-{suffix}-{n}@iasd.local"))
+        for n in (1, 2)
+    )
+    first.grupos.add(grupo)
+    first.igrejas.add(igreja)
+    Events.objects.bulk_create(
+        Events(titulo=f"Culto {i}", descricao="Louvor", data_inicio=now, data_fim=now + timedelta(hours=2), igreja=igreja)
+        for i in range(rows)
+    )
+    PostagensGrupos.objects.bulk_create(
+        PostagensGrupos(grupo=grupo, autor=second, conteudo=f"Ensaio {i}") for i in range(rows)
+    )
+    MensagensPrivadas.objects.bulk_create(
+        MensagensPrivadas(remetente=second, destinatario=first, conteudo="Bem-vindo") for _ in range(rows)
+    )
+    NotificacoesGrupos.objects.bulk_create(
+        NotificacoesGrupos(perfil=first, grupo=grupo, mensagem="Nova atividade") for _ in range(rows)
+    )
+    return igreja, (first, second), issue_token(first.user).key
+
+
+def summary(name, latencies, elapsed):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (
+        f"{name:<12} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the hot read endpoints as sync views under WSGI, sync views under "
+        "ASGI and native async views under ASGI, with concurrent clients."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=200, help="Per endpoint and mode.")
+        parser.add_argument("--concurrency", type=int, default=16)
+
+    def handle(self, *args, **options):
+        seeded = None
+        try:
+            # unique names, so a run never collides with real users or a leftover run
+            seeded = seed(options["rows"], uuid.uuid4().hex[:12])
+            self.authorization = f"Token {seeded[2]}"
+            with override_settings(RATE_LIMIT_BACKEND="off", ALLOWED_HOSTS=["localhost"]):
+                for endpoint in ENDPOINTS:
+                    self.stdout.write(endpoint)
+                    with override_settings(ROOT_URLCONF=urlconf(False)):
+                        self.stdout.write(summary("sync/wsgi", *self.run_wsgi(endpoint, options)))
+                        self.stdout.write(summary("sync/asgi", *self.run_asgi(endpoint, options)))
+                    with override_settings(ROOT_URLCONF=urlconf(True)):
+                        self.stdout.write(summary("async/asgi", *self.run_asgi(endpoint, options)))
+        finally:
+            if seeded is not None:
+                igreja, profiles, _ = seeded
+                for profile in profiles:
+                    profile.user.delete()
+                igreja.delete()
+
+    def run_wsgi(self, endpoint, options):
+        # one thread per concurrent client, like a threaded WSGI server
+        latencies = []
+        lock = threading.Lock()
+        per_thread = options["requests"] // options["concurrency"]
+
+        def worker():
+            client = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=self.authorization)
+            timings = []
+            try:
+                for _ in range(per_thread):
+                    started = time.perf_counter()
+                    client.get(endpoint)
+                    timings.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(timings)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, time.perf_counter() - started
+
+    def run_asgi(self, endpoint, options):
+        return asyncio.run(self.asgi_load(ASGIHandler(), endpoint, options))
+
+    async def asgi_load(self, application, endpoint, options):
+        latencies = []
+        per_client = options["requests"] // options["concurrency"]
+
+        async def client():
+            for _ in range(per_client):
+                started = time.perf_counter()
+                await self.asgi_get(application, endpoint)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options["concurrency"])))
+        return latencies, time.perf_counter() - started
+
+    async def asgi_get(self, application, endpoint):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": endpoint,
+            "raw_path": endpoint.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"authorization", self.authorization.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        disconnect = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        status = None
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif not message.get("more_body"):
+                disconnect.set()
+
+        await application(scope, receive, send)
+        if status != 200:
+            raise RuntimeError(f"{endpoint} answered {status}")
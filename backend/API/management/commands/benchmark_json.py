@@ -0,0 +1,135 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from API import encoders, views
+from API.models import (
+    Avisos,
+    ComentariosPostagens,
+    Comunicados,
+    Events,
+    Grupos,
+    Igreja,
+    MensagensPrivadas,
+    NotificacoesGrupos,
+    PostagensGrupos,
+    Profile,
+)
+
+
+def sample_rows(count):
+    # Unsaved instances wired together in memory: the benchmark measures
+    # payload building and encoding only, not the database.
+    now = timezone.now()
+    igreja = Igreja(id=1, nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local")
+    grupo = Grupos(id=1, nome="Musica", descricao="Louvor", igreja=igreja)
+    user = get_user_model()(id=1, username="membro@iasd.local", email="membro@iasd.local")
+    profile = Profile(id=1, user=user)
+    postagem = PostagensGrupos(
+        id=1, grupo=grupo, autor=profile, conteudo="Ensaio extra nesta semana!", data_postagem=now
+    )
+    return {
+        "event": (
+            views.event_payload,
+            [
+                Events(
+                    id=i,
+                    titulo=f"Culto {i}",
+                    descricao="Mensagem especial e louvor.",
+                    data_inicio=now + timedelta(hours=i),
+                    data_fim=now + timedelta(hours=i + 2),
+                    igreja=igreja,
+                )
+                for i in range(count)
+            ],
+        ),
+        "aviso": (
+            views.aviso_payload,
+            [
+                Avisos(id=i, titulo=f"Aviso {i}", mensagem="Sabado as 9h.", data_envio=now, igreja=igreja)
+                for i in range(count)
+            ],
+        ),
+        "comunicado": (
+            views.comunicado_payload,
+            [
+                Comunicados(
+                    id=i, titulo=f"Comunicado {i}", mensagem="Sexta as 20h.", data_envio=now, igreja=igreja
+                )
+                for i in range(count)
+            ],
+        ),
+        "notificacao": (
+            views.notificacao_payload,
+            [
+                NotificacoesGrupos(
+                    id=i, perfil=profile, grupo=grupo, mensagem="Nova atividade.", data_notificacao=now
+                )
+                for i in range(count)
+            ],
+        ),
+        "postagem": (
+            views.postagem_payload,
+            [
+                PostagensGrupos(
+                    id=i, grupo=grupo, autor=profile, conteudo="Ensaio extra!", data_postagem=now
+                )
+                for i in range(count)
+            ],
+        ),
+        "comentario": (
+            views.comentario_payload,
+            [
+                ComentariosPostagens(
+                    id=i, postagem=postagem, autor=profile, conteudo="Confirmado.", data_comentario=now
+                )
+                for i in range(count)
+            ],
+        ),
+        "mensagem": (
+            views.mensagem_payload,
+            [
+                MensagensPrivadas(
+                    id=i, remetente=profile, destinatario=profile, conteudo="Bem-vindo!", data_envio=now
+                )
+                for i in range(count)
+            ],
+        ),
+    }
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time API.encoders.dumps over the *_payload helpers with JSON_ENCODER_BACKEND=stdlib "
+        "(json + ApiJSONEncoder) and with the orjson path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if encoders.orjson is None:
+            self.stdout.write("orjson is not installed; only the stdlib encoder is available.")
+        for name, (payload, rows) in sample_rows(options["rows"]).items():
+            data = [payload(row) for row in rows]
+            with override_settings(JSON_ENCODER_BACKEND="stdlib"):
+                stdlib = best_of(options["repeat"], lambda: encoders.dumps(data))
+            fast = best_of(options["repeat"], lambda: encoders.dumps(data))
+            self.stdout.write(
+                f"{name:<12} stdlib {stdlib * 1000:8.2f} ms  fast {fast * 1000:8.2f} ms  "
+                f"x{stdlib / fast if fast else 0:.1f}"
+            )
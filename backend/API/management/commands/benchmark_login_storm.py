@@ -0,0 +1,106 @@
+import json
+import statistics
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+
+from API import hashing, views
+from API.resources import ResourceView
+
+
+USERNAME = "bench-login@iasd.local"
+PASSWORD = "StrongPass123!"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of a cheap endpoint while threads hammer /api/login/, "
+        "with hashing inline on the request thread and on the bounded pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--seconds", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        body = json.dumps({"username": USERNAME, "password": PASSWORD})
+        probe_view = ResourceView.as_view(resource=views.RESOURCES["igrejas"], action="list")
+        User = get_user_model()
+        User.objects.filter(username=USERNAME).delete()
+        user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        try:
+            baseline = self.probe(factory, probe_view, options["seconds"] / 2)
+            self.report("idle", baseline, None)
+            modes = {
+                "inline": hashing.HashPool(0, 0, None),
+                "pool": hashing.HashPool(
+                    settings.PASSWORD_HASH_WORKERS,
+                    settings.PASSWORD_HASH_QUEUE,
+                    settings.PASSWORD_HASH_TIMEOUT,
+                ),
+            }
+            for name, pool in modes.items():
+                with mock.patch.object(hashing, "_pool", pool):
+                    latencies, statuses = self.storm(factory, body, probe_view, options)
+                self.report(name, latencies, statuses)
+        finally:
+            user.auth_tokens.all().delete()
+            user.delete()
+
+    def storm(self, factory, body, probe_view, options):
+        stop = threading.Event()
+        statuses = {}
+        lock = threading.Lock()
+
+        def login():
+            try:
+                while not stop.is_set():
+                    request = factory.post("/api/login/", body, content_type="application/json")
+                    status = views.login_view(request).status_code
+                    with lock:
+                        statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=login) for _ in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(0.2)
+            latencies = self.probe(factory, probe_view, options["seconds"])
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return latencies, statuses
+
+    def probe(self, factory, probe_view, seconds):
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            probe_view(factory.get("/api/igrejas/"))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def report(self, name, latencies, statuses):
+        line = (
+            f"{name:<7} igrejas p50 {percentile(latencies, 0.5):7.2f} ms  "
+            f"p95 {percentile(latencies, 0.95):7.2f} ms  "
+            f"mean {statistics.mean(latencies) * 1000:7.2f} ms"
+        )
+        if statuses is not None:
+            line += "  logins " + ", ".join(f"{code}: {count}" for code, count in sorted(statuses.items()))
+        self.stdout.write(line)
@@ -0,0 +1,121 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from API import serializers, views
+from API.models import (
+    Avisos,
+    ComentariosPostagens,
+    Comunicados,
+    Events,
+    Grupos,
+    Igreja,
+    MensagensPrivadas,
+    NotificacoesGrupos,
+    PostagensGrupos,
+    Profile,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+# name -> (queryset the old helper path used, payload helper, projection)
+def cases():
+    return {
+        "event": (Events.objects.select_related("igreja"), views.event_payload, serializers.EVENT),
+        "comunicado": (
+            Comunicados.objects.select_related("igreja"),
+            views.comunicado_payload,
+            serializers.COMUNICADO,
+        ),
+        "aviso": (Avisos.objects.select_related("igreja"), views.aviso_payload, serializers.AVISO),
+        "notificacao": (
+            NotificacoesGrupos.objects.select_related("grupo"),
+            views.notificacao_payload,
+            serializers.NOTIFICACAO,
+        ),
+        "postagem": (
+            PostagensGrupos.objects.select_related("autor__user", "grupo"),
+            views.postagem_payload,
+            serializers.POSTAGEM,
+        ),
+        "comentario": (
+            ComentariosPostagens.objects.select_related("autor__user"),
+            views.comentario_payload,
+            serializers.COMENTARIO,
+        ),
+        "mensagem": (
+            MensagensPrivadas.objects.select_related("remetente__user", "destinatario__user"),
+            views.mensagem_payload,
+            serializers.MENSAGEM,
+        ),
+    }
+
+
+def seed(rows):
+    now = timezone.now()
+    User = get_user_model()
+    igreja = Igreja.objects.create(nome="Bench", endereco="Rua A", telefone="1", email="b@iasd.local")
+    grupo = Grupos.objects.create(nome="Bench", descricao="", igreja=igreja)
+    first = Profile.objects.get(user=User.objects.create(username="bench-1@iasd.local"))
+    second = Profile.objects.get(user=User.objects.create(username="bench-2@iasd.local"))
+    Events.objects.bulk_create(
+        Events(titulo=f"Culto {i}", descricao="Louvor", data_inicio=now, data_fim=now + timedelta(hours=2), igreja=igreja)
+        for i in range(rows)
+    )
+    Comunicados.objects.bulk_create(
+        Comunicados(titulo=f"Comunicado {i}", mensagem="Sexta as 20h", igreja=igreja) for i in range(rows)
+    )
+    Avisos.objects.bulk_create(
+        Avisos(titulo=f"Aviso {i}", mensagem="Sabado as 9h", igreja=igreja) for i in range(rows)
+    )
+    NotificacoesGrupos.objects.bulk_create(
+        NotificacoesGrupos(perfil=first, grupo=grupo, mensagem="Nova atividade") for _ in range(rows)
+    )
+    postagens = PostagensGrupos.objects.bulk_create(
+        PostagensGrupos(grupo=grupo, autor=first, conteudo="Ensaio extra") for _ in range(rows)
+    )
+    ComentariosPostagens.objects.bulk_create(
+        ComentariosPostagens(postagem=postagens[0], autor=second, conteudo="Confirmado") for _ in range(rows)
+    )
+    MensagensPrivadas.objects.bulk_create(
+        MensagensPrivadas(remetente=first, destinatario=second, conteudo="Bem-vindo") for _ in range(rows)
+    )
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Compare the instance-based *_payload helpers with the values() projections (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                seed(options["rows"])
+                for name, (queryset, payload, projection) in cases().items():
+                    helper = best_of(options["repeat"], lambda: [payload(obj) for obj in queryset.all()])
+                    values = best_of(options["repeat"], lambda: projection.many(queryset.all()))
+                    self.stdout.write(
+                        f"{name:<12} helpers {helper * 1000:8.2f} ms  "
+                        f"values() {values * 1000:8.2f} ms  x{helper / values if values else 0:.1f}"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
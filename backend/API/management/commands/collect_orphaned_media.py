@@ -0,0 +1,186 @@
+import heapq
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import FileField, TextField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Collate
+
+from API.images import IMAGE_SOURCES
+from API.models import StoredBlob, UploadSession
+from API.uploads import part_path
+
+
+DEFAULT_SKIP_PREFIXES = ["blobs/tmp/"]
+CHECKPOINT_NAME = ".media_gc_checkpoint"
+
+
+def walk_sorted(root, relative=""):
+    # Directories sort as "name/" so the walk yields full relative paths in
+    # plain string order, matching the ORDER BY on the reference side.
+    try:
+        entries = list(os.scandir(os.path.join(root, relative)))
+    except FileNotFoundError:
+        return
+    keyed = sorted(
+        (entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+        for entry in entries
+    )
+    for key, entry in keyed:
+        path = relative + key
+        if key.endswith("/"):
+            yield from walk_sorted(root, path)
+        else:
+            yield path, entry
+
+
+def ordered_values(queryset, lookup, after):
+    # Both sides of the merge must agree on plain string order; the walk sorts
+    # in Python, so PostgreSQL orders under the "C" collation to match.
+    queryset = queryset.exclude(**{lookup: ""}).exclude(**{f"{lookup}__isnull": True})
+    if after:
+        queryset = queryset.filter(**{f"{lookup}__gt": after})
+    ordering = lookup
+    if connection.vendor == "postgresql":
+        ordering = Collate(lookup, "C")
+    return queryset.order_by(ordering).values_list(lookup, flat=True).iterator(chunk_size=2000)
+
+
+def reference_streams(after=None):
+    streams = []
+    for model in apps.get_app_config("API").get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField):
+                streams.append(ordered_values(model._base_manager.all(), field.name, after))
+    streams.extend(derivative_references(after))
+    streams.append(upload_part_references(after))
+    return streams
+
+
+def derivative_references(after=None):
+    # one stream per derivative name, ordered by the database on the JSON key
+    streams = []
+    for model, (_, variants_field, names) in IMAGE_SOURCES.items():
+        for name in names:
+            # Cast so the filters compare plain text instead of JSON values
+            path = Cast(KT(f"{variants_field}__{name}"), TextField())
+            queryset = model._base_manager.annotate(derivative=path)
+            streams.append(ordered_values(queryset, "derivative", after))
+    return streams
+
+
+def upload_part_references(after=None):
+    # Part files of live sessions; parts of expired or finished ones are
+    # orphans. Every part shares one directory and suffix, so ordering by id
+    # orders the paths too.
+    root = Path(settings.MEDIA_ROOT)
+    sessions = UploadSession.objects.only("id").order_by("id").iterator(chunk_size=2000)
+    for session in sessions:
+        path = part_path(session).relative_to(root).as_posix()
+        if after is None or path > after:
+            yield path
+
+
+class Command(BaseCommand):
+    help = "Delete or quarantine files under MEDIA_ROOT that no database row references."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--quarantine",
+            help="Move orphans here (relative to MEDIA_ROOT or absolute) instead of deleting them.",
+        )
+        parser.add_argument(
+            "--min-age-minutes",
+            type=int,
+            default=60,
+            help="Ignore files modified more recently than this (uploads still being saved).",
+        )
+        parser.add_argument(
+            "--skip-prefix",
+            action="append",
+            default=None,
+            help=f"Relative path prefix to ignore (default: {', '.join(DEFAULT_SKIP_PREFIXES)}).",
+        )
+        parser.add_argument(
+            "--resume", action="store_true", help="Continue after the last saved checkpoint."
+        )
+
+    def handle(self, *args, **options):
+        root = Path(settings.MEDIA_ROOT)
+        checkpoint_path = root / CHECKPOINT_NAME
+        dry_run = options["dry_run"]
+        skip_prefixes = tuple(options["skip_prefix"] or DEFAULT_SKIP_PREFIXES) + (CHECKPOINT_NAME,)
+        quarantine = None
+        if options["quarantine"]:
+            quarantine = Path(options["quarantine"])
+            if not quarantine.is_absolute():
+                quarantine = root / quarantine
+            try:
+                skip_prefixes += (quarantine.relative_to(root).as_posix() + "/",)
+            except ValueError:
+                pass
+        cutoff = time.time() - options["min_age_minutes"] * 60
+
+        after = None
+        if options["resume"] and checkpoint_path.exists():
+            after = checkpoint_path.read_text().strip() or None
+            self.stdout.write(f"Resuming after {after}")
+
+        references = heapq.merge(*reference_streams(after))
+        current_reference = next(references, None)
+        scanned = orphans = reclaimed = 0
+        batch = []
+
+        for path, entry in walk_sorted(str(root)):
+            if after is not None and path <= after:
+                continue
+            scanned += 1
+            while current_reference is not None and current_reference < path:
+                current_reference = next(references, None)
+            if current_reference == path or path.startswith(skip_prefixes):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            batch.append((path, stat.st_size))
+            if len(batch) >= options["batch_size"]:
+                orphans, reclaimed = self.flush(batch, root, quarantine, dry_run, orphans, reclaimed)
+                if not dry_run:
+                    checkpoint_path.write_text(path)
+                batch = []
+
+        orphans, reclaimed = self.flush(batch, root, quarantine, dry_run, orphans, reclaimed)
+        if not dry_run:
+            checkpoint_path.unlink(missing_ok=True)
+
+        action = "Would reclaim" if dry_run else "Reclaimed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {scanned} files, {orphans} orphans. {action} {reclaimed} bytes."
+            )
+        )
+
+    def flush(self, batch, root, quarantine, dry_run, orphans, reclaimed):
+        for path, size in batch:
+            orphans += 1
+            reclaimed += size
+            if dry_run:
+                self.stdout.write(f"orphan: {path} ({size} bytes)")
+                continue
+            source = root / path
+            if quarantine is not None:
+                target = quarantine / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(source, target)
+            else:
+                source.unlink(missing_ok=True)
+            StoredBlob.objects.filter(nome=path).delete()
+        return orphans, reclaimed
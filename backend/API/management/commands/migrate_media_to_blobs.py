@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from API.models import ArquivosIgreja, RecursosEducacionais, StoredBlob
+from API.storage import BLOB_DIR, dedup_file_fields
+
+
+class Command(BaseCommand):
+    help = "Move existing ArquivosIgreja/RecursosEducacionais files into the deduplicated blob store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        migrated = missing = saved_bytes = 0
+        # old name -> blob name, for rows that shared a file before migrating
+        adopted = {}
+
+        for model in (ArquivosIgreja, RecursosEducacionais):
+            for field_name in dedup_file_fields(model):
+                storage = model._meta.get_field(field_name).storage
+                rows = (
+                    model.objects.exclude(**{f"{field_name}__startswith": f"{BLOB_DIR}/"})
+                    .exclude(**{field_name: ""})
+                    .order_by("pk")
+                    .values_list("pk", field_name)
+                )
+                for pk, name in rows.iterator():
+                    if name in adopted:
+                        blob_name = adopted[name]
+                        if not dry_run:
+                            storage.add_reference(blob_name)
+                    else:
+                        path = storage.path(name)
+                        if not os.path.exists(path):
+                            missing += 1
+                            self.stderr.write(f"Missing file for {model.__name__} {pk}: {name}")
+                            continue
+                        if dry_run:
+                            self.stdout.write(f"Would migrate {model.__name__} {pk}: {name}")
+                            migrated += 1
+                            continue
+                        size = os.path.getsize(path)
+                        blob_name = storage.adopt_file(path, name)
+                        if StoredBlob.objects.filter(nome=blob_name, referencias__gt=1).exists():
+                            saved_bytes += size
+                        adopted[name] = blob_name
+                    if not dry_run:
+                        model.objects.filter(pk=pk).update(**{field_name: blob_name})
+                    migrated += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Migrated {migrated} rows ({missing} missing files, "
+                f"{saved_bytes} bytes saved by deduplication)."
+            )
+        )
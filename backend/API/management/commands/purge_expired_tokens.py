@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from API import sweeper, uploads
+
+
+class Command(BaseCommand):
+    help = "Delete expired auth tokens, sessions and upload sessions in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause", type=float, default=0.05, help="Seconds to sleep between batches."
+        )
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            tokens = sweeper.expired_tokens().count()
+            sessions = sweeper.expired_sessions().count()
+            upload_sessions = uploads.expired_sessions().count()
+            self.stdout.write(
+                f"Would delete {tokens} tokens, {sessions} sessions and {upload_sessions} uploads."
+            )
+            return
+        counts = sweeper.sweep(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {counts['tokens']} expired tokens, {counts['sessions']} sessions "
+                f"and {counts['uploads']} uploads."
+            )
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from API import comments, rsvp
+
+
+class Command(BaseCommand):
+    help = "Recompute comentarios_count and participantes_count from their tables."
+
+    def handle(self, *args, **options):
+        postagens = comments.recount()
+        events = rsvp.recount()
+        self.stdout.write(
+            self.style.SUCCESS(f"Recounted {postagens} postagens and {events} events.")
+        )
@@ -0,0 +1,129 @@
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+REPORTED_PRAGMAS = [
+    "journal_mode",
+    "synchronous",
+    "mmap_size",
+    "cache_size",
+    "busy_timeout",
+    "foreign_keys",
+]
+
+
+def open_benchmark_connection(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def run_workload(path, pragmas, writes, readers):
+    setup = open_benchmark_connection(path, pragmas)
+    setup.execute(
+        "CREATE TABLE token (id INTEGER PRIMARY KEY, key TEXT UNIQUE, last_used_at REAL)"
+    )
+    setup.executemany(
+        "INSERT INTO token (key, last_used_at) VALUES (?, ?)",
+        [(f"key-{index}", 0.0) for index in range(1000)],
+    )
+    setup.close()
+
+    done = threading.Event()
+    counters = {"reads": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        conn = open_benchmark_connection(path, pragmas)
+        reads = errors = 0
+        while not done.is_set():
+            try:
+                conn.execute(
+                    "SELECT id, last_used_at FROM token WHERE key = ?",
+                    (f"key-{reads % 1000}",),
+                ).fetchone()
+                reads += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        conn.close()
+        with lock:
+            counters["reads"] += reads
+            counters["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    writer = open_benchmark_connection(path, pragmas)
+    started = time.perf_counter()
+    for index in range(writes):
+        try:
+            writer.execute("BEGIN IMMEDIATE")
+            writer.execute(
+                "UPDATE token SET last_used_at = ? WHERE key = ?",
+                (time.time(), f"key-{index % 1000}"),
+            )
+            writer.execute("COMMIT")
+        except sqlite3.OperationalError:
+            counters["errors"] += 1
+    elapsed = time.perf_counter() - started
+    done.set()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    return {
+        "elapsed": elapsed,
+        "writes_per_second": writes / elapsed if elapsed else 0,
+        "reads_per_second": counters["reads"] / elapsed if elapsed else 0,
+        "errors": counters["errors"],
+    }
+
+
+class Command(BaseCommand):
+    help = "Report the effective SQLite pragmas and optionally benchmark default vs. tuned settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--benchmark", action="store_true")
+        parser.add_argument("--writes", type=int, default=500)
+        parser.add_argument("--readers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError(f"Database '{options['database']}' is not SQLite.")
+
+        connection.ensure_connection()
+        self.stdout.write(
+            f"SQLite tuning: {'enabled' if settings.SQLITE_TUNING else 'disabled'}"
+        )
+        with connection.cursor() as cursor:
+            for name in REPORTED_PRAGMAS:
+                cursor.execute(f"PRAGMA {name}")
+                row = cursor.fetchone()
+                self.stdout.write(f"{name} = {row[0] if row else ''}")
+
+        if options["benchmark"]:
+            self.run_benchmark(options["writes"], options["readers"])
+
+    def run_benchmark(self, writes, readers):
+        profiles = [("default", {}), ("tuned", settings.SQLITE_PRAGMAS)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for label, pragmas in profiles:
+                result = run_workload(
+                    str(Path(tmpdir) / f"{label}.sqlite3"), pragmas, writes, readers
+                )
+                self.stdout.write(
+                    f"{label}: {result['writes_per_second']:.0f} writes/s, "
+                    f"{result['reads_per_second']:.0f} reads/s, "
+                    f"{result['errors']} lock errors in {result['elapsed']:.2f}s"
+                )
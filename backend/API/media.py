@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from .images import current_variants
+
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+READ_SIZE = 64 * 1024
+UNSATISFIABLE = "unsatisfiable"
+
+
+def download_url(kind, pk, variant=None):
+    # files are always linked through MediaDownload, which checks access
+    if variant is None:
+        return reverse("media-download", args=[kind, pk])
+    return reverse("media-variant", args=[kind, pk, variant])
+
+
+def variant_urls(kind, pk, source_name, variants):
+    return {name: download_url(kind, pk, name) for name in current_variants(source_name, variants)}
+
+
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    # (start, end) of a single satisfiable range, UNSATISFIABLE, or None when
+    # the header is ignored and the full body is sent: multi-range and
+    # malformed headers fall under the latter, as RFC 9110 allows.
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return UNSATISFIABLE
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and start > int(last):
+        return None
+    if start >= size:
+        return UNSATISFIABLE
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request, etag, mtime):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def iter_range(handle, start, length):
+    try:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(READ_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def accel_response(field_file, content_type):
+    mode = getattr(settings, "MEDIA_ACCEL_REDIRECT", "")
+    response = HttpResponse(content_type=content_type)
+    if mode == "x-accel-redirect":
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + field_file.name
+    elif mode == "x-sendfile":
+        response["X-Sendfile"] = field_file.path
+    else:
+        return None
+    return response
+
+
+def serve_field_file(request, field_file):
+    try:
+        path = field_file.path
+        stat = os.stat(path)
+    except (NotImplementedError, FileNotFoundError, ValueError):
+        return None
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    etag = file_etag(stat)
+    last_modified = http_date(stat.st_mtime)
+
+    def finish(response):
+        response["ETag"] = etag
+        response["Last-Modified"] = last_modified
+        response["Accept-Ranges"] = "bytes"
+        patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+        return response
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if not_modified is not None:
+        return finish(not_modified)
+
+    handoff = accel_response(field_file, content_type)
+    if handoff is not None:
+        # the front-end server applies Range and conditional handling itself
+        return finish(handoff)
+
+    size = stat.st_size
+    range_header = request.META.get("HTTP_RANGE")
+    byte_range = None
+    if range_header and if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(range_header, size)
+    if byte_range is not None:
+        if byte_range == UNSATISFIABLE:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return finish(response)
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_range(open(path, "rb"), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+        return finish(response)
+
+    # FileResponse lets the WSGI server use wsgi.file_wrapper (sendfile)
+    return finish(FileResponse(open(path, "rb"), content_type=content_type))
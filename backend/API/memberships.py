@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import Profile
+
+
+def cache_key(profile_id):
+    return f"memberships:{profile_id}"
+
+
+def load(profile):
+    # Group and church ids of a profile, memoized on the instance (one request)
+    # and in the cache for MEMBERSHIP_CACHE_SECONDS across requests.
+    memberships = profile.__dict__.get("_memberships")
+    if memberships is not None:
+        return memberships
+    timeout = settings.MEMBERSHIP_CACHE_SECONDS
+    cached = cache.get(cache_key(profile.pk)) if timeout > 0 else None
+    if cached is None:
+        cached = (
+            list(group_rows(profile.pk)),
+            list(igreja_rows(profile.pk)),
+        )
+        if timeout > 0:
+            cache.set(cache_key(profile.pk), cached, timeout)
+    return remember(profile, cached)
+
+
+async def aload(profile):
+    # load() for async views; afterwards the sync helpers read the memo
+    # without touching the database.
+    memberships = profile.__dict__.get("_memberships")
+    if memberships is not None:
+        return memberships
+    timeout = settings.MEMBERSHIP_CACHE_SECONDS
+    cached = await cache.aget(cache_key(profile.pk)) if timeout > 0 else None
+    if cached is None:
+        cached = (
+            [pk async for pk in group_rows(profile.pk)],
+            [pk async for pk in igreja_rows(profile.pk)],
+        )
+        if timeout > 0:
+            await cache.aset(cache_key(profile.pk), cached, timeout)
+    return remember(profile, cached)
+
+
+def group_rows(profile_id):
+    return Profile.grupos.through.objects.filter(profile_id=profile_id).values_list(
+        "grupos_id", flat=True
+    )
+
+
+def igreja_rows(profile_id):
+    return Profile.igrejas.through.objects.filter(profile_id=profile_id).values_list(
+        "igreja_id", flat=True
+    )
+
+
+def remember(profile, cached):
+    memberships = (frozenset(cached[0]), frozenset(cached[1]))
+    profile.__dict__["_memberships"] = memberships
+    return memberships
+
+
+def group_ids(profile):
+    return load(profile)[0]
+
+
+def igreja_ids(profile):
+    return load(profile)[1]
+
+
+def invalidate(profile_id):
+    cache.delete(cache_key(profile_id))
+    # a concurrent request may re-cache the old rows before we commit
+    transaction.on_commit(lambda: cache.delete(cache_key(profile_id)))
+
+
+def memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+    if not reverse:
+        instance.__dict__.pop("_memberships", None)
+        invalidate(instance.pk)
+    elif pk_set:
+        for profile_id in pk_set:
+            invalidate(profile_id)
+    elif action == "pre_clear":
+        # grupo.profile_set.clear(): the profiles are only known before the delete
+        relation = "grupos" if sender is Profile.grupos.through else "igrejas"
+        profiles = Profile.objects.filter(**{relation: instance}).values_list("id", flat=True)
+        for profile_id in profiles:
+            invalidate(profile_id)
+
+
+def profile_saved(sender, instance, created, **kwargs):
+    # SQLite may hand a deleted profile's id to a new row
+    if created:
+        invalidate(instance.pk)
+
+
+def profile_deleted(sender, instance, **kwargs):
+    invalidate(instance.pk)
+
+
+def connect_signals():
+    for through in (Profile.grupos.through, Profile.igrejas.through):
+        m2m_changed.connect(
+            memberships_changed,
+            sender=through,
+            dispatch_uid=f"memberships-{through._meta.model_name}",
+        )
+    post_save.connect(profile_saved, sender=Profile, dispatch_uid="memberships-profile-created")
+    post_delete.connect(profile_deleted, sender=Profile, dispatch_uid="memberships-profile")
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE "API_searchentry_fts" USING fts5(
+        titulo, conteudo, content='API_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER "API_searchentry_ai" AFTER INSERT ON "API_searchentry" BEGIN
+        INSERT INTO "API_searchentry_fts" (rowid, titulo, conteudo)
+        VALUES (new.id, new.titulo, new.conteudo);
+    END
+    """,
+    """
+    CREATE TRIGGER "API_searchentry_ad" AFTER DELETE ON "API_searchentry" BEGIN
+        INSERT INTO "API_searchentry_fts" ("API_searchentry_fts", rowid, titulo, conteudo)
+        VALUES ('delete', old.id, old.titulo, old.conteudo);
+    END
+    """,
+    """
+    CREATE TRIGGER "API_searchentry_au" AFTER UPDATE ON "API_searchentry" BEGIN
+        INSERT INTO "API_searchentry_fts" ("API_searchentry_fts", rowid, titulo, conteudo)
+        VALUES ('delete', old.id, old.titulo, old.conteudo);
+        INSERT INTO "API_searchentry_fts" (rowid, titulo, conteudo)
+        VALUES (new.id, new.titulo, new.conteudo);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS "API_searchentry_au"',
+    'DROP TRIGGER IF EXISTS "API_searchentry_ad"',
+    'DROP TRIGGER IF EXISTS "API_searchentry_ai"',
+    'DROP TABLE IF EXISTS "API_searchentry_fts"',
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE "API_searchentry" ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(titulo, '')), 'A')
+        || setweight(to_tsvector('portuguese', coalesce(conteudo, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX "API_searchentry_vector_idx" ON "API_searchentry" USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS "API_searchentry_vector_idx"',
+    'ALTER TABLE "API_searchentry" DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_vendor_sql(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0007_remove_event_church_remove_churchstaff_church_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=32)),
+                ('objeto_id', models.BigIntegerField()),
+                ('titulo', models.CharField(blank=True, max_length=255)),
+                ('conteudo', models.TextField(blank=True)),
+                ('data', models.DateTimeField(blank=True, null=True)),
+                ('grupo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='API.grupos')),
+                ('igreja', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='API.igreja')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_vendor_sql({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
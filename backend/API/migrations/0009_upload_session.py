@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:24
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0008_search_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('destino', models.CharField(max_length=32)),
+                ('nome_arquivo', models.CharField(max_length=255)),
+                ('tamanho', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('recebido', models.BigIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('perfil', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.profile')),
+            ],
+        ),
+    ]
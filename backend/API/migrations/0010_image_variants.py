@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0009_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postagensgrupos',
+            name='arquivo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
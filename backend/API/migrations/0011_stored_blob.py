@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:28
+
+import API.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0010_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('tamanho', models.BigIntegerField()),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='arquivosigreja',
+            name='arquivo',
+            field=models.FileField(storage=API.storage.dedup_storage, upload_to='arquivos_igreja/'),
+        ),
+        migrations.AlterField(
+            model_name='recursoseducacionais',
+            name='arquivo',
+            field=models.FileField(storage=API.storage.dedup_storage, upload_to='recursos_educacionais/'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Events = apps.get_model("API", "Events")
+    Participantes = Events.participantes.through
+    counts = (
+        Participantes.objects.filter(events_id=OuterRef("pk"))
+        .values("events_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Events.objects.update(participantes_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0011_stored_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='events',
+            name='capacidade',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='events',
+            name='participantes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
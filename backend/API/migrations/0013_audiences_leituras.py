@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0012_events_participantes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avisos',
+            name='grupos',
+            field=models.ManyToManyField(blank=True, to='API.grupos'),
+        ),
+        migrations.AddField(
+            model_name='avisos',
+            name='publico',
+            field=models.CharField(choices=[('igreja', 'Igreja inteira'), ('grupos', 'Grupos'), ('perfis', 'Perfis')], default='igreja', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='comunicados',
+            name='grupos',
+            field=models.ManyToManyField(blank=True, to='API.grupos'),
+        ),
+        migrations.AddField(
+            model_name='comunicados',
+            name='publico',
+            field=models.CharField(choices=[('igreja', 'Igreja inteira'), ('grupos', 'Grupos'), ('perfis', 'Perfis')], default='igreja', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='Leituras',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('lido_em', models.DateTimeField(auto_now_add=True)),
+                ('perfil', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.profile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('perfil', 'tipo', 'objeto_id'), name='unique_leitura')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_options(apps, schema_editor):
+    # Old polls kept their options (and any tallies) inside the JSON.
+    PostagensGrupos = apps.get_model("API", "PostagensGrupos")
+    OpcoesEnquete = apps.get_model("API", "OpcoesEnquete")
+    batch = []
+    for postagem in PostagensGrupos.objects.exclude(enquete__isnull=True).iterator():
+        enquete = postagem.enquete
+        if not isinstance(enquete, dict) or not isinstance(enquete.get("opcoes"), list):
+            continue
+        ordem = 0
+        for opcao in enquete["opcoes"]:
+            texto = opcao.get("texto") if isinstance(opcao, dict) else opcao
+            if texto in (None, ""):
+                continue
+            votos = opcao.get("votos") if isinstance(opcao, dict) else 0
+            batch.append(
+                OpcoesEnquete(
+                    postagem_id=postagem.pk,
+                    ordem=ordem,
+                    texto=str(texto)[:255],
+                    votos=votos if isinstance(votos, int) and votos > 0 else 0,
+                )
+            )
+            ordem += 1
+    OpcoesEnquete.objects.bulk_create(batch, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0013_audiences_leituras'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpcoesEnquete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordem', models.PositiveSmallIntegerField()),
+                ('texto', models.CharField(max_length=255)),
+                ('votos', models.PositiveIntegerField(default=0)),
+                ('postagem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opcoes', to='API.postagensgrupos')),
+            ],
+            options={
+                'ordering': ['ordem'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VotosEnquete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_voto', models.DateTimeField(auto_now=True)),
+                ('opcao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.opcoesenquete')),
+                ('perfil', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.profile')),
+                ('postagem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.postagensgrupos')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='opcoesenquete',
+            constraint=models.UniqueConstraint(fields=('postagem', 'ordem'), name='unique_opcao_enquete'),
+        ),
+        migrations.AddConstraint(
+            model_name='votosenquete',
+            constraint=models.UniqueConstraint(fields=('postagem', 'perfil'), name='unique_voto_enquete'),
+        ),
+        migrations.RunPython(create_options, migrations.RunPython.noop),
+    ]
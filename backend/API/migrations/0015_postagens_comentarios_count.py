@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    PostagensGrupos = apps.get_model("API", "PostagensGrupos")
+    ComentariosPostagens = apps.get_model("API", "ComentariosPostagens")
+    counts = (
+        ComentariosPostagens.objects.filter(postagem_id=OuterRef("pk"))
+        .values("postagem_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    PostagensGrupos.objects.update(comentarios_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0014_poll_options_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postagensgrupos',
+            name='comentarios_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
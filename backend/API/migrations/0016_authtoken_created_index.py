@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0015_postagens_comentarios_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['created_at'], name='authtoken_created_idx'),
+        ),
+    ]
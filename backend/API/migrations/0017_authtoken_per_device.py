@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_last_used(apps, schema_editor):
+    # sliding expiry reads last_used_at; tokens never used start from created_at
+    AuthToken = apps.get_model("API", "AuthToken")
+    AuthToken.objects.filter(last_used_at__isnull=True).update(last_used_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0016_authtoken_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authtoken',
+            name='device',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='authtoken',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auth_tokens', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['last_used_at'], name='authtoken_last_used_idx'),
+        ),
+        migrations.RunPython(backfill_last_used, migrations.RunPython.noop),
+    ]
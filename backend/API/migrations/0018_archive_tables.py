@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0017_authtoken_per_device'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MensagensArquivadas',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('conteudo', models.TextField()),
+                ('data_envio', models.DateTimeField()),
+                ('lida', models.BooleanField(default=False)),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+                ('destinatario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='API.profile')),
+                ('remetente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='API.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['remetente', '-data_envio'], name='msg_arquivada_remetente_idx'), models.Index(fields=['destinatario', '-data_envio'], name='msg_arquivada_dest_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacoesArquivadas',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('mensagem', models.TextField()),
+                ('data_notificacao', models.DateTimeField()),
+                ('lida', models.BooleanField(default=True)),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.grupos')),
+                ('perfil', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='API.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['perfil', '-data_notificacao'], name='notif_arquivada_perfil_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+
+# tipo -> (model, SearchEntry field -> source lookup); mirrors the entry
+# builders in API.search as they stood when the index was introduced.
+SOURCES = {
+    "comunicado": (
+        "Comunicados",
+        {"igreja_id": "igreja_id", "titulo": "titulo", "conteudo": "mensagem", "data": "data_envio"},
+    ),
+    "aviso": (
+        "Avisos",
+        {"igreja_id": "igreja_id", "titulo": "titulo", "conteudo": "mensagem", "data": "data_envio"},
+    ),
+    "recurso": (
+        "RecursosEducacionais",
+        {"igreja_id": "igreja_id", "titulo": "titulo", "conteudo": "descricao", "data": "data_upload"},
+    ),
+    "postagem": (
+        "PostagensGrupos",
+        {
+            "igreja_id": "grupo__igreja_id",
+            "grupo_id": "grupo_id",
+            "conteudo": "conteudo",
+            "data": "data_postagem",
+        },
+    ),
+    "comentario": (
+        "ComentariosPostagens",
+        {
+            "igreja_id": "postagem__grupo__igreja_id",
+            "grupo_id": "postagem__grupo_id",
+            "conteudo": "conteudo",
+            "data": "data_comentario",
+        },
+    ),
+}
+BATCH_SIZE = 500
+
+
+def backfill_entries(apps, schema_editor):
+    # Rows written before 0008 never went through the post_save signal; the
+    # FTS triggers index each inserted entry. Entries already indexed since
+    # then are left alone through the (tipo, objeto_id) constraint.
+    SearchEntry = apps.get_model("API", "SearchEntry")
+    for tipo, (model_name, fields) in SOURCES.items():
+        model = apps.get_model("API", model_name)
+        rows = model.objects.values_list("pk", *fields.values()).order_by("pk")
+        batch = []
+        for pk, *values in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(SearchEntry(tipo=tipo, objeto_id=pk, **dict(zip(fields, values))))
+            if len(batch) >= BATCH_SIZE:
+                SearchEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        SearchEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0018_archive_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_entries, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .storage import dedup_storage
+
 class Igreja(models.Model):
     nome = models.CharField(max_length=255)
     endereco = models.CharField(max_length=255)
@@ -26,6 +30,8 @@ class Profile(models.Model):
     igrejas = models.ManyToManyField(Igreja, blank=True) #para aparecer as igrejas que quer ser notificado
     telefone = models.CharField(max_length=20, null=True, blank=True)
     image = models.ImageField(upload_to='profile_images/', null=True, blank=True)
+    # derivadas geradas em background (avatar, thumbnail), ver API/images.py
+    image_variants = models.JSONField(default=dict, blank=True)
     bio = models.TextField(null=True, blank=True)
 
     is_admin = models.BooleanField(default=False)
@@ -40,13 +46,18 @@ class Profile(models.Model):
 class AuthToken(models.Model):
     key = models.CharField(max_length=40, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    last_used_at = models.DateTimeField(null=True, blank=True)
-    user = models.OneToOneField(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="auth_token"
+    last_used_at = models.DateTimeField(null=True, blank=True) #expiracao deslizante
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="auth_tokens"
     )
+    device = models.CharField(max_length=100, blank=True) #um token por aparelho
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at"], name="authtoken_created_idx"), #varredura de expirados
+            models.Index(fields=["last_used_at"], name="authtoken_last_used_idx"),
+        ]
 
     def __str__(self):
         return f"Token for {self.user_id}"
@@ -65,6 +76,8 @@ class Events(models.Model):
     igreja = models.ForeignKey(Igreja, on_delete=models.CASCADE)
     
     participantes = models.ManyToManyField(Profile, blank=True)
+    participantes_count = models.PositiveIntegerField(default=0) #mantido junto com a tabela de participantes
+    capacidade = models.PositiveIntegerField(null=True, blank=True) #vazio = sem limite
 
     def __str__(self):
         return self.titulo
@@ -78,13 +91,21 @@ class Atividades(models.Model):
     def __str__(self):
         return self.nome
     
+PUBLICOS = [
+    ("igreja", "Igreja inteira"),
+    ("grupos", "Grupos"),
+    ("perfis", "Perfis"),
+]
+
 class Comunicados(models.Model):
     titulo = models.CharField(max_length=255)
     mensagem = models.TextField()
     data_envio = models.DateTimeField(auto_now_add=True)
     igreja = models.ForeignKey(Igreja, on_delete=models.CASCADE)
+    publico = models.CharField(max_length=10, choices=PUBLICOS, default="igreja") #quem recebe
     
-    destinatarios = models.ManyToManyField(Profile, blank=True)
+    grupos = models.ManyToManyField(Grupos, blank=True) #usado quando publico = grupos
+    destinatarios = models.ManyToManyField(Profile, blank=True) #usado quando publico = perfis
 
     def __str__(self):
         return self.titulo
@@ -94,8 +115,10 @@ class Avisos(models.Model):
     mensagem = models.TextField()
     data_envio = models.DateTimeField(auto_now_add=True)
     igreja = models.ForeignKey(Igreja, on_delete=models.CASCADE)
+    publico = models.CharField(max_length=10, choices=PUBLICOS, default="igreja") #quem recebe
     
-    destinatarios = models.ManyToManyField(Profile, blank=True)
+    grupos = models.ManyToManyField(Grupos, blank=True) #usado quando publico = grupos
+    destinatarios = models.ManyToManyField(Profile, blank=True) #usado quando publico = perfis
 
     def __str__(self):
         return self.titulo
@@ -106,15 +129,50 @@ class PostagensGrupos(models.Model):
     conteudo = models.TextField()
     #pode ser imagem ou video
     arquivo = models.FileField(upload_to='postagens/', null=True, blank=True)
+    arquivo_variants = models.JSONField(default=dict, blank=True)
     # pode ser enquete
     enquete = models.JSONField(null=True, blank=True)
     # pode ser link
     link = models.URLField(null=True, blank=True)
 
     data_postagem = models.DateTimeField(auto_now_add=True)
+    comentarios_count = models.PositiveIntegerField(default=0) #mantido pelos sinais de API/comments.py
 
     def __str__(self):
         return f"Postagem de {self.autor} no grupo {self.grupo}"
+
+
+class OpcoesEnquete(models.Model):
+    # opcoes de enquete.opcoes; votos e o contador atualizado com F()
+    postagem = models.ForeignKey(PostagensGrupos, on_delete=models.CASCADE, related_name="opcoes")
+    ordem = models.PositiveSmallIntegerField()
+    texto = models.CharField(max_length=255)
+    votos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["ordem"]
+        constraints = [
+            models.UniqueConstraint(fields=["postagem", "ordem"], name="unique_opcao_enquete"),
+        ]
+
+    def __str__(self):
+        return self.texto
+
+
+class VotosEnquete(models.Model):
+    # um voto por perfil em cada enquete
+    postagem = models.ForeignKey(PostagensGrupos, on_delete=models.CASCADE)
+    opcao = models.ForeignKey(OpcoesEnquete, on_delete=models.CASCADE)
+    perfil = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    data_voto = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["postagem", "perfil"], name="unique_voto_enquete"),
+        ]
+
+    def __str__(self):
+        return f"{self.perfil_id} votou em {self.opcao_id}"
     
 class ComentariosPostagens(models.Model):
     postagem = models.ForeignKey(PostagensGrupos, on_delete=models.CASCADE)
@@ -127,7 +185,7 @@ class ComentariosPostagens(models.Model):
     
 
 class NotificacoesGrupos(models.Model):
-   # ao ser visto pelo usuario é deletado
+   # depois de lida vai para NotificacoesArquivadas (ver API/retention.py)
     perfil = models.ForeignKey(Profile, on_delete=models.CASCADE)
     grupo = models.ForeignKey(Grupos, on_delete=models.CASCADE)
     mensagem = models.TextField()
@@ -150,7 +208,7 @@ class MensagensPrivadas(models.Model):
 class ArquivosIgreja(models.Model):
     igreja = models.ForeignKey(Igreja, on_delete=models.CASCADE)
     nome_arquivo = models.CharField(max_length=255)
-    arquivo = models.FileField(upload_to='arquivos_igreja/')
+    arquivo = models.FileField(upload_to='arquivos_igreja/', storage=dedup_storage)
     data_upload = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -159,10 +217,110 @@ class ArquivosIgreja(models.Model):
 class RecursosEducacionais(models.Model):
     titulo = models.CharField(max_length=255)
     descricao = models.TextField()
-    arquivo = models.FileField(upload_to='recursos_educacionais/')
+    arquivo = models.FileField(upload_to='recursos_educacionais/', storage=dedup_storage)
     data_upload = models.DateTimeField(auto_now_add=True)
     igreja = models.ForeignKey(Igreja, on_delete=models.CASCADE)
 
     def __str__(self):
         return self.titulo
     
+
+
+class SearchEntry(models.Model):
+    # linha do indice de busca; o texto e indexado por FTS5 (sqlite) ou tsvector (postgres)
+    tipo = models.CharField(max_length=32)
+    objeto_id = models.BigIntegerField()
+    igreja = models.ForeignKey(Igreja, on_delete=models.CASCADE, null=True, blank=True)
+    grupo = models.ForeignKey(Grupos, on_delete=models.CASCADE, null=True, blank=True)
+    titulo = models.CharField(max_length=255, blank=True)
+    conteudo = models.TextField(blank=True)
+    data = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tipo", "objeto_id"], name="unique_search_entry"),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.objeto_id}"
+
+
+class UploadSession(models.Model):
+    # upload em partes: init -> PUT com offsets -> finalize
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    perfil = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    destino = models.CharField(max_length=32)
+    nome_arquivo = models.CharField(max_length=255)
+    tamanho = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    recebido = models.BigIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.recebido}/{self.tamanho})"
+
+
+class StoredBlob(models.Model):
+    # conteudo armazenado uma unica vez por hash (ver API/storage.py)
+    sha256 = models.CharField(max_length=64, unique=True)
+    nome = models.CharField(max_length=255, unique=True)
+    tamanho = models.BigIntegerField()
+    referencias = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias} refs)"
+
+
+class Leituras(models.Model):
+    # confirmacao de leitura de comunicados/avisos: uma linha por perfil e anuncio lido
+    perfil = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=10)
+    objeto_id = models.BigIntegerField()
+    lido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["perfil", "tipo", "objeto_id"], name="unique_leitura"),
+        ]
+
+    def __str__(self):
+        return f"{self.perfil_id} leu {self.tipo} {self.objeto_id}"
+
+
+class NotificacoesArquivadas(models.Model):
+    # notificacoes lidas ha mais de NOTIFICACOES_RETENCAO_DIAS; o id e o original
+    id = models.BigIntegerField(primary_key=True)
+    perfil = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    grupo = models.ForeignKey(Grupos, on_delete=models.CASCADE)
+    mensagem = models.TextField()
+    data_notificacao = models.DateTimeField()
+    lida = models.BooleanField(default=True)
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["perfil", "-data_notificacao"], name="notif_arquivada_perfil_idx")]
+
+    def __str__(self):
+        return f"Notificação arquivada para {self.perfil_id}"
+
+
+class MensagensArquivadas(models.Model):
+    # mensagens com mais de MENSAGENS_RETENCAO_MESES; o id e o original
+    id = models.BigIntegerField(primary_key=True)
+    remetente = models.ForeignKey(Profile, related_name="+", on_delete=models.CASCADE)
+    destinatario = models.ForeignKey(Profile, related_name="+", on_delete=models.CASCADE)
+    conteudo = models.TextField()
+    data_envio = models.DateTimeField()
+    lida = models.BooleanField(default=False)
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["remetente", "-data_envio"], name="msg_arquivada_remetente_idx"),
+            models.Index(fields=["destinatario", "-data_envio"], name="msg_arquivada_dest_idx"),
+        ]
+
+    def __str__(self):
+        return f"Mensagem arquivada de {self.remetente_id} para {self.destinatario_id}"
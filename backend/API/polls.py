@@ -0,0 +1,171 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+
+from . import caching
+from .models import OpcoesEnquete, PostagensGrupos, VotosEnquete
+
+
+VOTED = "voted"
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"
+
+RESULTS_TIMEOUT = 300
+
+
+def option_texts(enquete):
+    # enquete = {"pergunta": "...", "opcoes": ["Sim", "Nao"]}; options may
+    # also be {"texto": "..."} objects.
+    if not isinstance(enquete, dict) or not isinstance(enquete.get("opcoes"), list):
+        return []
+    texts = []
+    for opcao in enquete["opcoes"]:
+        texto = opcao.get("texto") if isinstance(opcao, dict) else opcao
+        if texto not in (None, ""):
+            texts.append(str(texto)[:255])
+    return texts
+
+
+def sync_options(postagem):
+    # Options follow enquete.opcoes by text, so reordering keeps each option's
+    # votes. An option whose text is edited or removed is dropped with its
+    # votes, so the counters stay equal to the vote rows.
+    texts = option_texts(postagem.enquete)
+    existing = {}
+    for opcao in postagem.opcoes.all():
+        existing.setdefault(opcao.texto, []).append(opcao)
+    if not texts and not existing:
+        return
+    with transaction.atomic():
+        kept, created = [], []
+        for ordem, texto in enumerate(texts):
+            matches = existing.get(texto)
+            if matches:
+                kept.append((ordem, matches.pop(0)))
+            else:
+                created.append(OpcoesEnquete(postagem=postagem, ordem=ordem, texto=texto))
+        removed = [opcao.pk for matches in existing.values() for opcao in matches]
+        if removed:
+            OpcoesEnquete.objects.filter(pk__in=removed).delete()
+        moved = [(ordem, opcao) for ordem, opcao in kept if opcao.ordem != ordem]
+        if moved:
+            # park the moved rows past every position first so the
+            # (postagem, ordem) constraint never sees two rows on one slot
+            offset = len(texts) + len(removed) + len(kept)
+            OpcoesEnquete.objects.filter(pk__in=[opcao.pk for _, opcao in moved]).update(
+                ordem=F("ordem") + offset
+            )
+            for ordem, opcao in moved:
+                OpcoesEnquete.objects.filter(pk=opcao.pk).update(ordem=ordem)
+        if created:
+            OpcoesEnquete.objects.bulk_create(created)
+    invalidate_on_commit(postagem.pk)
+
+
+def vote(postagem_id, opcao_id, profile_id, retry=True):
+    try:
+        with transaction.atomic():
+            if not OpcoesEnquete.objects.filter(pk=opcao_id, postagem_id=postagem_id).exists():
+                return NOT_FOUND
+            current = (
+                VotosEnquete.objects.select_for_update()
+                .filter(postagem_id=postagem_id, perfil_id=profile_id)
+                .first()
+            )
+            if current is not None and current.opcao_id == opcao_id:
+                return UNCHANGED
+            if current is None:
+                VotosEnquete.objects.create(
+                    postagem_id=postagem_id, opcao_id=opcao_id, perfil_id=profile_id
+                )
+            else:
+                OpcoesEnquete.objects.filter(pk=current.opcao_id).update(votos=F("votos") - 1)
+                current.opcao_id = opcao_id
+                current.save(update_fields=["opcao", "data_voto"])
+            OpcoesEnquete.objects.filter(pk=opcao_id).update(votos=F("votos") + 1)
+    except IntegrityError:
+        # first votes of the same profile raced; the loser becomes a change of vote
+        if not retry:
+            raise
+        return vote(postagem_id, opcao_id, profile_id, retry=False)
+    invalidate_on_commit(postagem_id)
+    return VOTED
+
+
+def unvote(postagem_id, profile_id):
+    with transaction.atomic():
+        current = (
+            VotosEnquete.objects.select_for_update()
+            .filter(postagem_id=postagem_id, perfil_id=profile_id)
+            .first()
+        )
+        if current is None:
+            return False
+        current.delete()
+        OpcoesEnquete.objects.filter(pk=current.opcao_id).update(votos=F("votos") - 1)
+    invalidate_on_commit(postagem_id)
+    return True
+
+
+def cache_key(postagem_id):
+    return f"enquete:{postagem_id}"
+
+
+def invalidate(postagem_id):
+    cache.delete(cache_key(postagem_id))
+
+
+def invalidate_on_commit(postagem_id):
+    # again after commit: a reader may re-cache the old counters in between
+    invalidate(postagem_id)
+    transaction.on_commit(lambda: invalidate(postagem_id))
+
+
+def results(postagem_ids):
+    # Tallies straight from the option counters, loaded together in one
+    # query. They are cached per postagem only when the cache is shared:
+    # invalidation has to reach every process that may have cached a tally.
+    postagem_ids = list(postagem_ids)
+    shared = caching.is_shared("default")
+    found = cache.get_many([cache_key(pk) for pk in postagem_ids]) if shared else {}
+    tallies = {pk: found[cache_key(pk)] for pk in postagem_ids if cache_key(pk) in found}
+    missing = [pk for pk in postagem_ids if pk not in tallies]
+    if missing:
+        loaded = {pk: None for pk in missing}
+        options = OpcoesEnquete.objects.filter(postagem_id__in=missing).values_list(
+            "postagem_id", "id", "texto", "votos"
+        )
+        for postagem_id, opcao_id, texto, votos in options.order_by("postagem_id", "ordem"):
+            tally = loaded[postagem_id] or {"total": 0, "opcoes": []}
+            tally["opcoes"].append({"id": opcao_id, "texto": texto, "votos": votos})
+            tally["total"] += votos
+            loaded[postagem_id] = tally
+        if shared:
+            cache.set_many({cache_key(pk): tally for pk, tally in loaded.items()}, RESULTS_TIMEOUT)
+        tallies.update(loaded)
+    return tallies
+
+
+def attach_results(rows):
+    # enquete may be a raw JSON fragment here; postagens without options
+    # simply get no tally back
+    tallies = results(row["id"] for row in rows if row["enquete"] is not None)
+    for row in rows:
+        row["enquete_resultados"] = tallies.get(row["id"])
+
+
+def postagem_results(postagem):
+    if not option_texts(postagem.enquete):
+        return None
+    return results([postagem.pk])[postagem.pk]
+
+
+def postagem_saved(sender, instance, created, **kwargs):
+    if created and not option_texts(instance.enquete):
+        return
+    sync_options(instance)
+
+
+def connect_signals():
+    post_save.connect(postagem_saved, sender=PostagensGrupos, dispatch_uid="enquete-options")
@@ -0,0 +1,395 @@
+import json
+
+from django.conf import settings
+from django.urls import path
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import memberships
+from .encoders import JsonResponse
+from .helpers import (
+    aget_authenticated_profile,
+    aprojection_response,
+    extract_token_key,
+    get_authenticated_profile,
+    get_list_value,
+    get_request_data,
+    has_staff_access,
+    json_error,
+    parse_bool,
+    parse_datetime_value,
+    parse_int,
+    projection_response,
+    require_fields,
+)
+
+
+PUBLIC = "public"
+AUTHENTICATED = "authenticated"
+STAFF = "staff"
+
+UNCHANGED = object()
+
+# action -> (url suffix, http method)
+ROUTES = {
+    "list": ("", "get"),
+    "detail": ("<int:pk>/", "get"),
+    "create": ("create/", "post"),
+    "update": ("<int:pk>/update/", "post"),
+    "delete": ("<int:pk>/delete/", "post"),
+}
+
+
+class Field:
+    # One request field of a resource. kind is text, int, datetime, bool, json,
+    # fk, ids (many-to-many, set after save) or file. blank decides what an update
+    # with an empty value does: keep the current value, clear it to "" or
+    # assign it as sent (raw).
+    def __init__(
+        self,
+        name,
+        kind="text",
+        required=False,
+        default="",
+        blank="keep",
+        queryset=None,
+        attname=None,
+        label=None,
+        choices=None,
+        creatable=True,
+        updatable=None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.blank = blank
+        self.queryset = queryset
+        self.attname = attname or name
+        self.label = label
+        self.choices = choices
+        self.creatable = creatable
+        self.updatable = kind != "fk" if updatable is None else updatable
+
+    def parse(self, request, data, current=UNCHANGED):
+        creating = current is UNCHANGED
+        if self.kind == "file":
+            upload = request.FILES.get(self.name)
+            return (upload if upload else UNCHANGED), None
+        if self.kind == "ids":
+            return self.parse_ids(request, data, creating)
+        if not creating and self.name not in data:
+            return UNCHANGED, None
+        value = data.get(self.name, self.default)
+        if self.choices and value not in self.choices and (value or creating):
+            return None, json_error(f"Invalid {self.name}", status=400, choices=list(self.choices))
+
+        if self.kind == "fk":
+            pk, error = parse_int(value, self.name, required=self.required)
+            if error or pk is None:
+                return None, error
+            try:
+                return self.queryset.get(pk=pk), None
+            except self.queryset.model.DoesNotExist:
+                return None, json_error(f"{self.label} not found", status=404)
+        if self.kind == "datetime":
+            parsed, error = parse_datetime_value(
+                value, self.name, required=creating and self.required
+            )
+            if error:
+                return None, error
+            return (UNCHANGED if parsed is None and not creating else parsed), None
+        if self.kind == "int":
+            return parse_int(value, self.name, required=creating and self.required)
+        if self.kind == "bool":
+            return parse_bool(value), None
+        if self.kind == "json" and isinstance(value, str):
+            # multipart forms send JSON fields as text
+            if not value:
+                return None, None
+            try:
+                return json.loads(value), None
+            except json.JSONDecodeError:
+                return None, json_error(f"Invalid {self.name}", status=400)
+        if creating or self.blank == "raw":
+            return value, None
+        if self.blank == "clear":
+            return value or "", None
+        return value or current, None
+
+    def parse_ids(self, request, data, creating):
+        if not creating and self.name not in data and not request.POST.getlist(self.name):
+            return UNCHANGED, None
+        ids = []
+        for value in get_list_value(data, self.name, request=request):
+            parsed, error = parse_int(value, self.name)
+            if error:
+                return None, error
+            ids.append(parsed)
+        objects = list(self.queryset.filter(pk__in=ids))
+        if len(objects) != len(set(ids)):
+            return None, json_error(f"One or more {self.label} not found", status=400)
+        return objects, None
+
+
+class Resource:
+    # Declarative CRUD endpoint set. Subclasses describe the model, its
+    # payloads, filters and fields; permission rules go in the hooks below.
+    model = None
+    prefix = ""
+    url_name = None
+    label = ""
+    id_key = None
+    actions = ("list", "detail", "create", "update", "delete")
+    access = {}
+    projection = None
+    payload = None
+    related = ()
+    ordering = None
+    filters = {}
+    fields = ()
+    async_actions = ()
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def scope(self, request, queryset, params):
+        return queryset, None
+
+    def can_view(self, request, obj):
+        return True
+
+    def can_change(self, request, obj):
+        return True
+
+    def defaults(self, request):
+        return {}
+
+    def authorize_create(self, request, obj):
+        return None
+
+    def check_update(self, request, obj, data):
+        return None
+
+    def updatable_fields(self, request, obj):
+        return [field for field in self.fields if field.updatable]
+
+    def clean(self, obj):
+        return None
+
+    def get_object(self, pk):
+        try:
+            return self.get_queryset().select_related(*self.related).get(pk=pk), None
+        except self.model.DoesNotExist:
+            return None, json_error(f"{self.label} not found", status=404)
+
+    def list_queryset(self, request):
+        queryset = self.get_queryset()
+        params = {}
+        for param, lookup in self.filters.items():
+            value, error = parse_int(request.GET.get(param), param, required=False)
+            if error:
+                return None, error
+            if value is not None:
+                params[param] = value
+                queryset = queryset.filter(**{lookup: value})
+        queryset, error = self.scope(request, queryset, params)
+        if error:
+            return None, error
+        if self.ordering:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset, None
+
+    def list(self, request):
+        queryset, error = self.list_queryset(request)
+        if error:
+            return error
+        return projection_response(request, queryset, self.projection)
+
+    def detail(self, request, pk):
+        obj, error = self.get_object(pk)
+        if error:
+            return error
+        if not self.can_view(request, obj):
+            return json_error("Forbidden", status=403)
+        return JsonResponse(self.payload(obj))
+
+    # Async variants of the read actions, served by AsyncResourceView for the
+    # actions in async_actions when ASYNC_VIEWS is on. The caller's memberships
+    # are loaded up front, so scope() and can_view() must not query; payloads
+    # that do override apayload().
+    async def alist(self, request):
+        queryset, error = self.list_queryset(request)
+        if error:
+            return error
+        return await aprojection_response(request, queryset, self.projection)
+
+    async def adetail(self, request, pk):
+        try:
+            obj = await self.get_queryset().select_related(*self.related).aget(pk=pk)
+        except self.model.DoesNotExist:
+            return json_error(f"{self.label} not found", status=404)
+        if not self.can_view(request, obj):
+            return json_error("Forbidden", status=403)
+        return JsonResponse(await self.apayload(obj))
+
+    async def apayload(self, obj):
+        return self.payload(obj)
+
+    def build(self, request, data):
+        # Unsaved instance from the non-file fields; also used by chunked
+        # uploads, which attach the file themselves.
+        missing = require_fields(
+            data, [field.name for field in self.fields if field.required and field.kind != "file"]
+        )
+        if missing:
+            return None, missing
+        obj = self.model(**self.defaults(request))
+        obj._pending_related = {}
+        for field in self.fields:
+            if field.kind == "file" or not field.creatable:
+                continue
+            value, error = field.parse(request, data)
+            if error:
+                return None, error
+            if field.kind == "ids":
+                obj._pending_related[field.attname] = value
+            else:
+                setattr(obj, field.attname, value)
+        return obj, self.authorize_create(request, obj)
+
+    def save(self, obj):
+        obj.save()
+        for attname, values in getattr(obj, "_pending_related", {}).items():
+            getattr(obj, attname).set(values)
+
+    def create(self, request):
+        data, error = get_request_data(request)
+        if error:
+            return error
+        obj, error = self.build(request, data)
+        if error:
+            return error
+        for field in self.fields:
+            if field.kind != "file":
+                continue
+            upload = request.FILES.get(field.name)
+            if upload:
+                setattr(obj, field.attname, upload)
+            elif field.required:
+                return json_error(f"{field.name} is required", status=400)
+        error = self.clean(obj)
+        if error:
+            return error
+        self.save(obj)
+        return JsonResponse(
+            {"message": f"{self.label} created successfully", self.id_key: obj.id}, status=201
+        )
+
+    def update(self, request, pk):
+        obj, error = self.get_object(pk)
+        if error:
+            return error
+        if not self.can_change(request, obj):
+            return json_error("Forbidden", status=403)
+        data, error = get_request_data(request)
+        if error:
+            return error
+        error = self.check_update(request, obj, data)
+        if error:
+            return error
+        obj._pending_related = {}
+        for field in self.updatable_fields(request, obj):
+            current = None if field.kind == "ids" else getattr(obj, field.attname)
+            value, error = field.parse(request, data, current)
+            if error:
+                return error
+            if value is UNCHANGED:
+                continue
+            if field.kind == "ids":
+                obj._pending_related[field.attname] = value
+            else:
+                setattr(obj, field.attname, value)
+        error = self.clean(obj)
+        if error:
+            return error
+        self.save(obj)
+        return JsonResponse({"message": f"{self.label} updated successfully"})
+
+    def delete(self, request, pk):
+        obj, error = self.get_object(pk)
+        if error:
+            return error
+        if not self.can_change(request, obj):
+            return json_error("Forbidden", status=403)
+        obj.delete()
+        return JsonResponse({"message": f"{self.label} deleted successfully"})
+
+    def view(self, action, asynchronous=False):
+        view_class = AsyncResourceView if asynchronous else ResourceView
+        method = ROUTES[action][1]
+        methods = [method, "head", "options"] if method == "get" else [method, "options"]
+        return view_class.as_view(resource=self, action=action, http_method_names=methods)
+
+    def urls(self, async_views=None):
+        if async_views is None:
+            async_views = getattr(settings, "ASYNC_VIEWS", False)
+        name = self.url_name or self.prefix
+        patterns = []
+        for action in self.actions:
+            suffix = ROUTES[action][0]
+            view = self.view(action, async_views and action in self.async_actions)
+            patterns.append(path(f"{self.prefix}/{suffix}", view, name=f"{name}-{action}"))
+        return patterns
+
+
+class ResourceView(View):
+    resource = None
+    action = None
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        access = self.resource.access.get(self.action, AUTHENTICATED)
+        request.profile = None
+        if access == PUBLIC and extract_token_key(request):
+            # public endpoints still personalize for callers with a valid token
+            request.profile, _ = get_authenticated_profile(request)
+        elif access != PUBLIC:
+            profile, error = get_authenticated_profile(request)
+            if error:
+                return error
+            if access == STAFF and not has_staff_access(profile):
+                return json_error("Forbidden", status=403)
+            request.profile = profile
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        return getattr(self.resource, self.action)(request, *args, **kwargs)
+
+    post = get
+
+
+class AsyncResourceView(View):
+    resource = None
+    action = None
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        access = self.resource.access.get(self.action, AUTHENTICATED)
+        request.profile = None
+        if access == PUBLIC and extract_token_key(request):
+            request.profile, _ = await aget_authenticated_profile(request)
+        elif access != PUBLIC:
+            profile, error = await aget_authenticated_profile(request)
+            if error:
+                return error
+            if access == STAFF and not has_staff_access(profile):
+                return json_error("Forbidden", status=403)
+            request.profile = profile
+        if request.profile is not None:
+            await memberships.aload(request.profile)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        return await getattr(self.resource, f"a{self.action}")(request, *args, **kwargs)
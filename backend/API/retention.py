@@ -0,0 +1,76 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    MensagensArquivadas,
+    MensagensPrivadas,
+    NotificacoesArquivadas,
+    NotificacoesGrupos,
+)
+
+
+NOTIFICACAO_FIELDS = ("id", "perfil_id", "grupo_id", "mensagem", "data_notificacao", "lida")
+MENSAGEM_FIELDS = ("id", "remetente_id", "destinatario_id", "conteudo", "data_envio", "lida")
+
+
+def expired_notificacoes(now=None):
+    # read notifications older than NOTIFICACOES_RETENCAO_DIAS (0 keeps them)
+    days = getattr(settings, "NOTIFICACOES_RETENCAO_DIAS", 30)
+    if days <= 0:
+        return NotificacoesGrupos.objects.none()
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return NotificacoesGrupos.objects.filter(lida=True, data_notificacao__lt=cutoff)
+
+
+def expired_mensagens(now=None):
+    # messages older than MENSAGENS_RETENCAO_MESES 30-day months (0 keeps them)
+    months = getattr(settings, "MENSAGENS_RETENCAO_MESES", 12)
+    if months <= 0:
+        return MensagensPrivadas.objects.none()
+    cutoff = (now or timezone.now()) - timedelta(days=30 * months)
+    return MensagensPrivadas.objects.filter(data_envio__lt=cutoff)
+
+
+def archive(queryset, archive_model, fields, batch_size=500, pause=0.0, max_batches=None):
+    # Moves rows in primary key order, one short transaction per batch: the
+    # batch is read under select_for_update, so a row cannot change (e.g. be
+    # marked unread) between its copy and its delete, and the delete keeps
+    # the retention filter. An interrupted run resumes from whatever is still
+    # left; ignore_conflicts covers rows archived by a run that died after
+    # its insert.
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update().order_by("pk").values(*fields)[:batch_size]
+            )
+            if not rows:
+                break
+            archive_model.objects.bulk_create(
+                [archive_model(**row) for row in rows], ignore_conflicts=True
+            )
+            queryset.filter(pk__in=[row["id"] for row in rows]).delete()
+        moved += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def run(batch_size=500, pause=0.0, max_batches=None, only=None):
+    now = timezone.now()
+    jobs = {
+        "notificacoes": (expired_notificacoes(now), NotificacoesArquivadas, NOTIFICACAO_FIELDS),
+        "mensagens": (expired_mensagens(now), MensagensArquivadas, MENSAGEM_FIELDS),
+    }
+    return {
+        name: archive(queryset, archive_model, fields, batch_size, pause, max_batches)
+        for name, (queryset, archive_model, fields) in jobs.items()
+        if only is None or name in only
+    }
@@ -0,0 +1,92 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+
+from .models import Events, Profile
+
+
+Participantes = Events.participantes.through
+
+JOINED = "joined"
+ALREADY = "already"
+FULL = "full"
+NOT_FOUND = "not_found"
+
+
+def join(event_id, profile_id):
+    # The seat is taken with a conditional UPDATE, so the capacity check and
+    # the increment happen in one statement and hold under concurrent RSVPs;
+    # the through row is inserted in the same transaction.
+    if Participantes.objects.filter(events_id=event_id, profile_id=profile_id).exists():
+        return ALREADY
+    try:
+        with transaction.atomic():
+            reserved = Events.objects.filter(pk=event_id).filter(
+                Q(capacidade__isnull=True) | Q(participantes_count__lt=F("capacidade"))
+            ).update(participantes_count=F("participantes_count") + 1)
+            if not reserved:
+                return FULL if Events.objects.filter(pk=event_id).exists() else NOT_FOUND
+            Participantes.objects.create(events_id=event_id, profile_id=profile_id)
+    except IntegrityError:
+        # a concurrent request for the same profile won; its seat is the one kept
+        return ALREADY
+    return JOINED
+
+
+def leave(event_id, profile_id):
+    with transaction.atomic():
+        deleted, _ = Participantes.objects.filter(
+            events_id=event_id, profile_id=profile_id
+        ).delete()
+        if deleted:
+            Events.objects.filter(pk=event_id).update(
+                participantes_count=F("participantes_count") - deleted
+            )
+    return bool(deleted)
+
+
+def recount(event_ids=None):
+    counts = (
+        Participantes.objects.filter(events_id=OuterRef("pk"))
+        .values("events_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    events = Events.objects.all() if event_ids is None else Events.objects.filter(pk__in=event_ids)
+    return events.update(participantes_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def participantes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # join()/leave() write the through table directly; this keeps the count
+    # right for .add()/.remove() from the admin or the shell.
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        recount([instance.pk])
+    elif pk_set:
+        recount(pk_set)
+    else:
+        recount()
+
+
+def profile_deleting(sender, instance, **kwargs):
+    # Deleting a profile (or its user) cascades through the through table
+    # without m2m_changed, so the events are noted here and recounted below.
+    instance._rsvp_event_ids = list(
+        Participantes.objects.filter(profile_id=instance.pk).values_list("events_id", flat=True)
+    )
+
+
+def profile_deleted(sender, instance, **kwargs):
+    event_ids = getattr(instance, "_rsvp_event_ids", None)
+    if event_ids:
+        recount(event_ids)
+
+
+def connect_signals():
+    m2m_changed.connect(
+        participantes_changed, sender=Participantes, dispatch_uid="events-participantes-count"
+    )
+    pre_delete.connect(profile_deleting, sender=Profile, dispatch_uid="events-participantes-deleting")
+    post_delete.connect(profile_deleted, sender=Profile, dispatch_uid="events-participantes-deleted")
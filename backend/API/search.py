@@ -0,0 +1,168 @@
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+from . import audiences, memberships
+from .helpers import has_staff_access
+from .models import (
+    Avisos,
+    ComentariosPostagens,
+    Comunicados,
+    PostagensGrupos,
+    RecursosEducacionais,
+    SearchEntry,
+)
+
+
+def comunicado_entry(comunicado):
+    return {
+        "igreja_id": comunicado.igreja_id,
+        "grupo_id": None,
+        "titulo": comunicado.titulo,
+        "conteudo": comunicado.mensagem,
+        "data": comunicado.data_envio,
+    }
+
+
+def aviso_entry(aviso):
+    return {
+        "igreja_id": aviso.igreja_id,
+        "grupo_id": None,
+        "titulo": aviso.titulo,
+        "conteudo": aviso.mensagem,
+        "data": aviso.data_envio,
+    }
+
+
+def recurso_entry(recurso):
+    return {
+        "igreja_id": recurso.igreja_id,
+        "grupo_id": None,
+        "titulo": recurso.titulo,
+        "conteudo": recurso.descricao,
+        "data": recurso.data_upload,
+    }
+
+
+def postagem_entry(postagem):
+    return {
+        "igreja_id": postagem.grupo.igreja_id,
+        "grupo_id": postagem.grupo_id,
+        "titulo": "",
+        "conteudo": postagem.conteudo,
+        "data": postagem.data_postagem,
+    }
+
+
+def comentario_entry(comentario):
+    return {
+        "igreja_id": comentario.postagem.grupo.igreja_id,
+        "grupo_id": comentario.postagem.grupo_id,
+        "titulo": "",
+        "conteudo": comentario.conteudo,
+        "data": comentario.data_comentario,
+    }
+
+
+# tipo -> (model, select_related for bulk rebuilds, entry builder)
+SEARCH_SOURCES = {
+    "comunicado": (Comunicados, (), comunicado_entry),
+    "aviso": (Avisos, (), aviso_entry),
+    "recurso": (RecursosEducacionais, (), recurso_entry),
+    "postagem": (PostagensGrupos, ("grupo",), postagem_entry),
+    "comentario": (ComentariosPostagens, ("postagem__grupo",), comentario_entry),
+}
+
+MODEL_TIPOS = {model: tipo for tipo, (model, _, _) in SEARCH_SOURCES.items()}
+
+
+def index_instance(sender, instance, **kwargs):
+    tipo = MODEL_TIPOS[sender]
+    build_entry = SEARCH_SOURCES[tipo][2]
+    SearchEntry.objects.update_or_create(
+        tipo=tipo, objeto_id=instance.pk, defaults=build_entry(instance)
+    )
+
+
+def unindex_instance(sender, instance, **kwargs):
+    SearchEntry.objects.filter(tipo=MODEL_TIPOS[sender], objeto_id=instance.pk).delete()
+
+
+def connect_signals():
+    for model, tipo in MODEL_TIPOS.items():
+        post_save.connect(index_instance, sender=model, dispatch_uid=f"search-index-{tipo}")
+        post_delete.connect(unindex_instance, sender=model, dispatch_uid=f"search-unindex-{tipo}")
+
+
+def rebuild_index(batch_size=500):
+    SearchEntry.objects.all().delete()
+    total = 0
+    for tipo, (model, related, build_entry) in SEARCH_SOURCES.items():
+        batch = []
+        for instance in model.objects.select_related(*related).iterator(chunk_size=batch_size):
+            batch.append(SearchEntry(tipo=tipo, objeto_id=instance.pk, **build_entry(instance)))
+            if len(batch) >= batch_size:
+                SearchEntry.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def visible_entries(queryset, profile):
+    # Group content follows the caller's memberships; comunicados and avisos
+    # follow their audience, the same rule as their own list and detail views.
+    if has_staff_access(profile):
+        return queryset
+    condition = ~Q(tipo__in=list(audiences.ANUNCIOS)) & (
+        Q(grupo__isnull=True) | Q(grupo_id__in=memberships.group_ids(profile))
+    )
+    for tipo, model in audiences.ANUNCIOS.items():
+        visible = audiences.visible(model.objects.all(), profile).values("pk")
+        condition |= Q(tipo=tipo, objeto_id__in=visible)
+    return queryset.filter(condition)
+
+
+def fts5_query(text):
+    terms = re.findall(r"\w+", text)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_entries(queryset, text):
+    if connection.vendor == "sqlite":
+        match = fts5_query(text)
+        if not match:
+            return queryset.none()
+        # Join the FTS table once so bm25() scores each match in the same
+        # scan instead of re-running MATCH per candidate row.
+        return queryset.extra(
+            tables=["API_searchentry_fts"],
+            where=[
+                '"API_searchentry_fts".rowid = "API_searchentry"."id"',
+                '"API_searchentry_fts" MATCH %s',
+            ],
+            params=[match],
+            select={"rank": 'bm25("API_searchentry_fts", 10.0, 1.0)'},
+        ).order_by("rank", "-data")
+    if connection.vendor == "postgresql":
+        return queryset.filter(
+            id__in=RawSQL(
+                'SELECT id FROM "API_searchentry" '
+                "WHERE search_vector @@ websearch_to_tsquery('portuguese', %s)",
+                (text,),
+            )
+        ).annotate(
+            rank=RawSQL(
+                "-ts_rank(search_vector, websearch_to_tsquery('portuguese', %s))", (text,)
+            )
+        ).order_by("rank", "-data")
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return queryset.none()
+    for term in terms:
+        queryset = queryset.filter(Q(titulo__icontains=term) | Q(conteudo__icontains=term))
+    return queryset.annotate(rank=Value(0.0)).order_by("-data")
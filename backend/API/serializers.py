@@ -0,0 +1,346 @@
+from asgiref.sync import sync_to_async
+from django.db.models import F, TextField
+from django.db.models.functions import Cast
+
+from . import comments, polls
+from .encoders import json_fragment
+from .media import download_url, variant_urls
+from .models import (
+    ArquivosIgreja,
+    Atividades,
+    Avisos,
+    ComentariosPostagens,
+    Comunicados,
+    Events,
+    Grupos,
+    Igreja,
+    MensagensArquivadas,
+    MensagensPrivadas,
+    NotificacoesArquivadas,
+    NotificacoesGrupos,
+    PostagensGrupos,
+    Profile,
+    RecursosEducacionais,
+)
+
+
+class Projection:
+    # Declarative payload: output key -> ORM lookup, read with values() so
+    # list views get dicts straight from the cursor without model instances.
+    # converters rewrite a single value; derived maps a key to (source keys,
+    # func) and sets it to func(*sources), in order, for dict and tuple rows
+    # alike; extend(rows) adds the extra keys to a whole page at once.
+    def __init__(self, fields, converters=None, derived=None, extend=None, extra=()):
+        self.fields = fields
+        self.converters = converters or {}
+        self.derived = derived or {}
+        self.extend = extend
+        self.extra = tuple(extra)
+        # a lookup is an ORM path or an expression (e.g. a Cast); expressions
+        # are selected under an alias since their key may name a model field
+        self.plain = [name for name, lookup in fields.items() if name == lookup]
+        self.aliased = {
+            name: f"_{name}" for name, lookup in fields.items() if not isinstance(lookup, str)
+        }
+        self.renamed = {
+            self.aliased.get(name, name): F(lookup) if isinstance(lookup, str) else lookup
+            for name, lookup in fields.items()
+            if name != lookup
+        }
+
+    def rows(self, queryset, chunk_size=2000):
+        for row in self.values(queryset).iterator(chunk_size=chunk_size):
+            yield self.convert(row)
+
+    def values(self, queryset):
+        return queryset.values(*self.plain, **self.renamed)
+
+    def convert(self, row):
+        for name, alias in self.aliased.items():
+            row[name] = row.pop(alias)
+        for name, convert in self.converters.items():
+            row[name] = convert(row[name])
+        for name, (sources, func) in self.derived.items():
+            row[name] = func(*[row[source] for source in sources])
+        return row
+
+    def many(self, queryset):
+        rows = list(self.rows(queryset))
+        if self.extend is not None:
+            self.extend(rows)
+        return rows
+
+    async def amany(self, queryset, chunk_size=2000):
+        # async ORM read; extend() may query, so it runs on the sync thread
+        rows = [
+            self.convert(row)
+            async for row in self.values(queryset).aiterator(chunk_size=chunk_size)
+        ]
+        if self.extend is not None:
+            await sync_to_async(self.extend)(rows)
+        return rows
+
+    def columns(self, queryset):
+        if self.extend is not None:
+            return self.as_columns(self.many(queryset))
+        return self.convert_columns(queryset.values_list(*self.fields.values()))
+
+    async def acolumns(self, queryset):
+        if self.extend is not None:
+            return self.as_columns(await self.amany(queryset))
+        return self.convert_columns(
+            [row async for row in queryset.values_list(*self.fields.values())]
+        )
+
+    def as_columns(self, rows):
+        names = list(self.fields) + list(self.extra)
+        return {"columns": names, "rows": [[row[name] for name in names] for row in rows]}
+
+    def convert_columns(self, rows):
+        names = list(self.fields) + list(self.extra)
+        index = {name: position for position, name in enumerate(names)}
+        converters = [
+            (index[name], convert) for name, convert in self.converters.items() if name in index
+        ]
+        derived = [
+            (index[name], [index[source] for source in sources], func)
+            for name, (sources, func) in self.derived.items()
+        ]
+        if converters or derived:
+            converted = []
+            for row in rows:
+                row = list(row)
+                for position, convert in converters:
+                    row[position] = convert(row[position])
+                for position, sources, func in derived:
+                    row[position] = func(*[row[source] for source in sources])
+                converted.append(row)
+            rows = converted
+        return {"columns": names, "rows": list(rows)}
+
+
+def media_link(kind, url_key):
+    # the stored file name becomes the API download URL of the row
+    def url(pk, name):
+        return download_url(kind, pk) if name else None
+
+    return {url_key: (("id", url_key), url)}
+
+
+def image_links(kind, url_key, variants_key):
+    # variants first: they are checked against the stored name
+    def variants(pk, name, stored):
+        return variant_urls(kind, pk, name, stored)
+
+    return {
+        variants_key: (("id", url_key, variants_key), variants),
+        **media_link(kind, url_key),
+    }
+
+
+IGREJA = Projection(
+    {
+        "id": "id",
+        "nome": "nome",
+        "endereco": "endereco",
+        "telefone": "telefone",
+        "email": "email",
+    }
+)
+
+GRUPO = Projection(
+    {
+        "id": "id",
+        "nome": "nome",
+        "descricao": "descricao",
+        "igreja_id": "igreja_id",
+        "igreja_nome": "igreja__nome",
+    }
+)
+
+PROFILE_SUMMARY = Projection(
+    {
+        "id": "id",
+        "user_id": "user_id",
+        "username": "user__username",
+        "email": "user__email",
+        "telefone": "telefone",
+        "is_admin": "is_admin",
+        "is_elder": "is_elder",
+        "image_url": "image",
+        "image_variants": "image_variants",
+    },
+    derived=image_links("profiles", "image_url", "image_variants"),
+)
+
+PARTICIPANTE = Projection(
+    {
+        "id": "id",
+        "username": "user__username",
+        "image_url": "image",
+        "image_variants": "image_variants",
+    },
+    derived=image_links("profiles", "image_url", "image_variants"),
+)
+
+EVENT = Projection(
+    {
+        "id": "id",
+        "titulo": "titulo",
+        "descricao": "descricao",
+        "data_inicio": "data_inicio",
+        "data_fim": "data_fim",
+        "igreja_id": "igreja_id",
+        "igreja_nome": "igreja__nome",
+        "participantes_count": "participantes_count",
+        "capacidade": "capacidade",
+    }
+)
+
+ATIVIDADE = Projection(
+    {
+        "id": "id",
+        "nome": "nome",
+        "descricao": "descricao",
+        "data": "data",
+        "grupo_id": "Grupo_id",
+        "grupo_nome": "Grupo__nome",
+    }
+)
+
+COMUNICADO = Projection(
+    {
+        "id": "id",
+        "titulo": "titulo",
+        "mensagem": "mensagem",
+        "data_envio": "data_envio",
+        "igreja_id": "igreja_id",
+        "igreja_nome": "igreja__nome",
+        "publico": "publico",
+    }
+)
+
+AVISO = Projection(dict(COMUNICADO.fields))
+
+NOTIFICACAO = Projection(
+    {
+        "id": "id",
+        "perfil_id": "perfil_id",
+        "grupo_id": "grupo_id",
+        "grupo_nome": "grupo__nome",
+        "mensagem": "mensagem",
+        "data_notificacao": "data_notificacao",
+        "lida": "lida",
+    }
+)
+
+RECURSO = Projection(
+    {
+        "id": "id",
+        "titulo": "titulo",
+        "descricao": "descricao",
+        "arquivo_url": "arquivo",
+        "data_upload": "data_upload",
+        "igreja_id": "igreja_id",
+        "igreja_nome": "igreja__nome",
+    },
+    derived=media_link("recursos-educacionais", "arquivo_url"),
+)
+
+ARQUIVO = Projection(
+    {
+        "id": "id",
+        "nome_arquivo": "nome_arquivo",
+        "arquivo_url": "arquivo",
+        "data_upload": "data_upload",
+        "igreja_id": "igreja_id",
+        "igreja_nome": "igreja__nome",
+    },
+    derived=media_link("arquivos-igreja", "arquivo_url"),
+)
+
+
+# COMENTARIO is defined below; both run only when a page is serialized
+def latest_comentarios(postagem_ids):
+    postagem_ids = list(postagem_ids)
+    latest = {pk: [] for pk in postagem_ids}
+    for row in COMENTARIO.rows(comments.latest(postagem_ids)):
+        latest[row["postagem_id"]].append(row)
+    return latest
+
+
+def attach_postagem_extras(rows):
+    # poll tallies and the comment preview for a whole page: two queries at most
+    polls.attach_results(rows)
+    latest = latest_comentarios(row["id"] for row in rows)
+    for row in rows:
+        row["comentarios_recentes"] = latest[row["id"]]
+
+
+POSTAGEM = Projection(
+    {
+        "id": "id",
+        "autor_id": "autor_id",
+        "autor_nome": "autor__user__username",
+        "grupo_id": "grupo_id",
+        "grupo_nome": "grupo__nome",
+        "conteudo": "conteudo",
+        "arquivo_url": "arquivo",
+        "arquivo_variants": "arquivo_variants",
+        "enquete": Cast("enquete", TextField()),
+        "link": "link",
+        "data_postagem": "data_postagem",
+        "comentarios_count": "comentarios_count",
+    },
+    converters={"enquete": json_fragment},
+    derived=image_links("postagens-grupos", "arquivo_url", "arquivo_variants"),
+    extend=attach_postagem_extras,
+    extra=("enquete_resultados", "comentarios_recentes"),
+)
+
+COMENTARIO = Projection(
+    {
+        "id": "id",
+        "postagem_id": "postagem_id",
+        "autor_id": "autor_id",
+        "autor_nome": "autor__user__username",
+        "conteudo": "conteudo",
+        "data_comentario": "data_comentario",
+    }
+)
+
+MENSAGEM = Projection(
+    {
+        "id": "id",
+        "remetente_id": "remetente_id",
+        "remetente_nome": "remetente__user__username",
+        "destinatario_id": "destinatario_id",
+        "destinatario_nome": "destinatario__user__username",
+        "conteudo": "conteudo",
+        "data_envio": "data_envio",
+        "lida": "lida",
+    }
+)
+
+NOTIFICACAO_ARQUIVADA = Projection({**NOTIFICACAO.fields, "arquivada_em": "arquivada_em"})
+
+MENSAGEM_ARQUIVADA = Projection({**MENSAGEM.fields, "arquivada_em": "arquivada_em"})
+
+# model -> projection, used by the benchmark and kept next to the payloads it mirrors
+PROJECTIONS = {
+    Igreja: IGREJA,
+    Grupos: GRUPO,
+    Profile: PROFILE_SUMMARY,
+    Events: EVENT,
+    Atividades: ATIVIDADE,
+    Comunicados: COMUNICADO,
+    Avisos: AVISO,
+    NotificacoesGrupos: NOTIFICACAO,
+    RecursosEducacionais: RECURSO,
+    ArquivosIgreja: ARQUIVO,
+    PostagensGrupos: POSTAGEM,
+    ComentariosPostagens: COMENTARIO,
+    MensagensPrivadas: MENSAGEM,
+    NotificacoesArquivadas: NOTIFICACAO_ARQUIVADA,
+    MensagensArquivadas: MENSAGEM_ARQUIVADA,
+}
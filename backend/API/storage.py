@@ -0,0 +1,137 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, pre_save
+
+
+BLOB_DIR = "blobs"
+READ_SIZE = 64 * 1024
+
+
+def dedup_storage():
+    return storages["dedup"]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DeduplicatingStorage(FileSystemStorage):
+    # Each distinct content is stored once under blobs/ by sha256; StoredBlob
+    # keeps the reference count and delete() only removes the last reference.
+
+    def blob_name(self, sha256, name):
+        extension = Path(name).suffix.lower()
+        return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+    def _save(self, name, content):
+        spool_dir = Path(self.location) / BLOB_DIR / "tmp"
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        fd, spool_path = tempfile.mkstemp(dir=spool_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as spool:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    spool.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(spool_path)
+            raise
+        return self.adopt_file(spool_path, name, sha256=digest.hexdigest(), size=size)
+
+    def adopt_file(self, path, name, sha256=None, size=None):
+        # Takes ownership of a local file on the same filesystem: it is either
+        # moved into place as a new blob or discarded as a duplicate.
+        from .models import StoredBlob
+
+        if sha256 is None:
+            sha256 = file_sha256(path)
+        if size is None:
+            size = os.path.getsize(path)
+        with transaction.atomic():
+            blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                sha256=sha256,
+                defaults={"nome": self.blob_name(sha256, name), "tamanho": size},
+            )
+            if created or not self.exists(blob.nome):
+                target = Path(self.path(blob.nome))
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, target)
+            else:
+                os.unlink(path)
+            StoredBlob.objects.filter(pk=blob.pk).update(referencias=F("referencias") + 1)
+        return blob.nome
+
+    def add_reference(self, name):
+        from .models import StoredBlob
+
+        StoredBlob.objects.filter(nome=name).update(referencias=F("referencias") + 1)
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        # The file goes while the row lock is held: a concurrent adopt_file()
+        # of the same content waits, then recreates both row and file.
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(nome=name).first()
+            if blob is not None:
+                if blob.referencias > 1:
+                    StoredBlob.objects.filter(pk=blob.pk).update(
+                        referencias=F("referencias") - 1
+                    )
+                    return
+                blob.delete()
+            super().delete(name)
+
+
+def dedup_file_fields(model):
+    return [
+        field.name
+        for field in model._meta.get_fields()
+        if getattr(field, "storage", None) is not None
+        and isinstance(field.storage, DeduplicatingStorage)
+    ]
+
+
+def release_on_commit(storage, name):
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+def release_replaced_files(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    fields = dedup_file_fields(sender)
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if previous is None:
+        return
+    for field_name in fields:
+        old_name = previous[field_name]
+        if old_name and old_name != getattr(instance, field_name).name:
+            release_on_commit(getattr(instance, field_name).storage, old_name)
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    for field_name in dedup_file_fields(sender):
+        field_file = getattr(instance, field_name)
+        if field_file:
+            release_on_commit(field_file.storage, field_file.name)
+
+
+def connect_signals(models):
+    for model in models:
+        label = model._meta.model_name
+        pre_save.connect(release_replaced_files, sender=model, dispatch_uid=f"dedup-replace-{label}")
+        post_delete.connect(release_deleted_files, sender=model, dispatch_uid=f"dedup-delete-{label}")
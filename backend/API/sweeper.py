@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import uploads
+from .helpers import expired_tokens_filter
+from .models import AuthToken
+
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def expired_tokens(now=None):
+    return AuthToken.objects.filter(expired_tokens_filter(now))
+
+
+def expired_sessions(now=None):
+    return Session.objects.filter(expire_date__lt=now or timezone.now())
+
+
+def purge(queryset, batch_size=500, pause=0.0, max_batches=None, after_delete=None):
+    # Deletes by primary key in small batches, each in its own short
+    # transaction, so writers are never blocked for the whole sweep.
+    # after_delete(pks) runs once each batch has committed.
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            # re-applies the expiry filter: a token re-issued meanwhile keeps its row
+            count, _ = queryset.filter(pk__in=pks).delete()
+        if after_delete is not None:
+            after_delete(pks)
+        deleted += count
+        batches += 1
+        if len(pks) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def sweep(batch_size=500, pause=0.0, max_batches=None):
+    now = timezone.now()
+    return {
+        "tokens": purge(expired_tokens(now), batch_size, pause, max_batches),
+        "sessions": purge(expired_sessions(now), batch_size, pause, max_batches),
+        "uploads": purge(
+            uploads.expired_sessions(now), batch_size, pause, max_batches, uploads.remove_parts
+        ),
+    }
+
+
+def run_scheduler(interval, stop):
+    while not stop.wait(interval):
+        try:
+            counts = sweep(
+                batch_size=settings.AUTH_TOKEN_SWEEP_BATCH_SIZE,
+                pause=settings.AUTH_TOKEN_SWEEP_PAUSE,
+            )
+            if any(counts.values()):
+                logger.info(
+                    "Purged %(tokens)s expired tokens, %(sessions)s sessions, %(uploads)s uploads",
+                    counts,
+                )
+        except Exception:
+            logger.exception("Expired token sweep failed")
+        finally:
+            connections.close_all()
+
+
+def start_scheduler():
+    # Optional in-process sweeper; deployments with cron can run
+    # `manage.py purge_expired_tokens` instead and leave the interval at 0.
+    global _scheduler
+    interval = getattr(settings, "AUTH_TOKEN_SWEEP_INTERVAL", 0)
+    if interval <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            stop = threading.Event()
+            thread = threading.Thread(
+                target=run_scheduler, args=(interval, stop), name="token-sweeper", daemon=True
+            )
+            thread.start()
+            _scheduler = (thread, stop)
+    return _scheduler
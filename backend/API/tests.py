@@ -1,11 +1,80 @@
+import gzip
+import hashlib
+import importlib
 import json
+import os
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.http import JsonResponse
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from PIL import Image
 
-from API.models import Igreja, Grupos, Profile
+from API.models import (
+    ArquivosIgreja,
+    Atividades,
+    AuthToken,
+    Avisos,
+    ComentariosPostagens,
+    Comunicados,
+    Events,
+    Igreja,
+    Grupos,
+    Leituras,
+    MensagensPrivadas,
+    NotificacoesGrupos,
+    PostagensGrupos,
+    Profile,
+    SearchEntry,
+    StoredBlob,
+    UploadSession,
+    VotosEnquete,
+)
+from API.encoders import JsonResponse as FastJsonResponse, dumps, json_fragment
+from API import (
+    access_tokens,
+    caching,
+    hashing,
+    polls,
+    retention,
+    serializers,
+    sweeper,
+    uploads,
+    views,
+)
+from API import urls as api_urls
+from API.views import issue_token
+from backend.middleware import ReplicaRoutingMiddleware
+from backend.ratelimit import CacheBackend, RateLimiter
+from backend.routers import PrimaryReplicaRouter, replica_reads
 
 
+# Logins authenticate on the hash pool, whose threads open their own database
+# connections and cannot see a TestCase's uncommitted rows; run them inline.
+inline_hashing = mock.patch.object(hashing, "_pool", hashing.HashPool(0, 0, 0))
+
+
+@inline_hashing
 class AuthFlowTests(TestCase):
     def setUp(self):
         self.igreja = Igreja.objects.create(
@@ -77,3 +146,1250 @@ class AuthFlowTests(TestCase):
         authed_response = self.client.get("/api/grupos/", HTTP_AUTHORIZATION=f"Token {token}")
         self.assertEqual(authed_response.status_code, 200)
         self.assertEqual(len(authed_response.json()), 1)
+
+
+class SqlitePragmasCommandTests(TestCase):
+    def test_reports_pragmas_and_benchmarks(self):
+        out = StringIO()
+        call_command("sqlite_pragmas", "--benchmark", "--writes", "20", "--readers", "1", stdout=out)
+        output = out.getvalue()
+        self.assertIn("journal_mode = ", output)
+        self.assertIn("busy_timeout = ", output)
+        self.assertIn("default: ", output)
+        self.assertIn("tuned: ", output)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.seen = []
+
+        def get_response(request):
+            self.seen.append(self.router.db_for_read(Igreja))
+            return JsonResponse({})
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+    def test_safe_reads_use_replica_until_the_client_writes(self):
+        self.middleware(self.factory.get("/api/igrejas/", HTTP_AUTHORIZATION="Token abc"))
+        self.middleware(self.factory.post("/api/events/create/", HTTP_AUTHORIZATION="Token abc"))
+        self.middleware(self.factory.get("/api/igrejas/", HTTP_AUTHORIZATION="Token abc"))
+        self.assertEqual(self.seen, ["replica_1", None, None])
+
+    def test_tokens_are_always_read_from_primary(self):
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(AuthToken), "default")
+            self.assertEqual(self.router.db_for_read(Igreja), "replica_1")
+        finally:
+            replica_reads.reset(token)
+        self.assertFalse(self.router.allow_migrate("replica_1", "API"))
+
+    def test_check_requires_a_shared_cache_for_stickiness(self):
+        self.assertEqual([error.id for error in caching.check_replica_cache(None)], ["API.E002"])
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(caching.check_replica_cache(None), [])
+
+
+def create_member(username, **flags):
+    user = get_user_model().objects.create_user(username=username, password="StrongPass123!")
+    profile = Profile.objects.get(user=user)
+    for name, value in flags.items():
+        setattr(profile, name, value)
+    profile.save()
+    return profile, issue_token(user).key
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.musica = Grupos.objects.create(nome="Musica", descricao="", igreja=self.igreja)
+        self.midia = Grupos.objects.create(nome="Midia", descricao="", igreja=self.igreja)
+        self.profile, self.token = create_member("busca@iasd.local")
+        self.profile.grupos.add(self.musica)
+
+    def search(self, query):
+        response = self.client.get(
+            "/api/search/", {"q": query}, HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_finds_comunicados_and_tracks_deletes(self):
+        comunicado = Comunicados.objects.create(
+            titulo="Reunião de líderes", mensagem="Sexta-feira", igreja=self.igreja
+        )
+        results = self.search("reuniao")["results"]
+        self.assertEqual([(r["tipo"], r["id"]) for r in results], [("comunicado", comunicado.id)])
+
+        comunicado.delete()
+        self.assertEqual(self.search("reuniao")["results"], [])
+
+    def test_group_posts_are_filtered_by_membership(self):
+        PostagensGrupos.objects.create(grupo=self.musica, autor=self.profile, conteudo="ensaio coral")
+        PostagensGrupos.objects.create(grupo=self.midia, autor=self.profile, conteudo="ensaio camera")
+        results = self.search("ensaio")["results"]
+        self.assertEqual([r["grupo_id"] for r in results], [self.musica.id])
+
+    def test_avisos_follow_their_audience(self):
+        outsider, outsider_token = create_member("fora@iasd.local")
+        recipient, recipient_token = create_member("alvo@iasd.local")
+        pessoal = Avisos.objects.create(
+            titulo="Confidencial pessoal", mensagem="x", igreja=self.igreja, publico="perfis"
+        )
+        pessoal.destinatarios.add(recipient)
+        grupo = Avisos.objects.create(
+            titulo="Confidencial musica", mensagem="x", igreja=self.igreja, publico="grupos"
+        )
+        grupo.grupos.add(self.musica)
+        Comunicados.objects.create(titulo="Confidencial geral", mensagem="x", igreja=self.igreja)
+
+        def titulos(token):
+            response = self.client.get(
+                "/api/search/", {"q": "confidencial"}, HTTP_AUTHORIZATION=f"Token {token}"
+            )
+            return sorted(r["titulo"] for r in response.json()["results"])
+
+        self.assertEqual(titulos(outsider_token), ["Confidencial geral"])
+        self.assertEqual(titulos(self.token), ["Confidencial geral", "Confidencial musica"])
+        self.assertEqual(titulos(recipient_token), ["Confidencial geral", "Confidencial pessoal"])
+
+    def test_title_matches_rank_first(self):
+        corpo = Comunicados.objects.create(titulo="Aviso", mensagem="jejum", igreja=self.igreja)
+        titulo = Comunicados.objects.create(titulo="Jejum", mensagem="semana", igreja=self.igreja)
+        results = self.search("jejum")["results"]
+        self.assertEqual([r["id"] for r in results], [titulo.id, corpo.id])
+
+    def test_migration_backfills_existing_rows(self):
+        comunicado = Comunicados.objects.create(
+            titulo="Batismo", mensagem="Sabado", igreja=self.igreja
+        )
+        postagem = PostagensGrupos.objects.create(
+            grupo=self.musica, autor=self.profile, conteudo="batismo no rio"
+        )
+        SearchEntry.objects.all().delete()
+        migration = importlib.import_module("API.migrations.0019_backfill_search_entries")
+        migration.backfill_entries(django_apps, None)
+        results = self.search("batismo")["results"]
+        self.assertEqual(
+            sorted((r["tipo"], r["id"]) for r in results),
+            [("comunicado", comunicado.id), ("postagem", postagem.id)],
+        )
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.profile, token = create_member("upload@iasd.local", is_admin=True)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+
+    def put_chunk(self, upload_id, content, start, total):
+        return self.client.put(
+            f"/api/uploads/{upload_id}/",
+            data=content,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(content) - 1}/{total}",
+            **self.auth,
+        )
+
+    def test_expired_sessions_are_refused_and_swept(self):
+        sessions = [
+            UploadSession.objects.create(
+                perfil=self.profile, destino="arquivos-igreja", nome_arquivo="a.mp3",
+                tamanho=10, sha256="0" * 64,
+            )
+            for _ in range(2)
+        ]
+        for session in sessions:
+            self.put_chunk(session.id, b"01234", 0, 10)
+        old = timezone.now() - timedelta(hours=25)
+        UploadSession.objects.filter(pk__in=[s.pk for s in sessions]).update(criado_em=old)
+
+        response = self.client.get(f"/api/uploads/{sessions[0].id}/", **self.auth)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(sweeper.sweep()["uploads"], 1)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root.name, "uploads", "partes")), [])
+
+    def test_stale_chunk_leaves_committed_bytes_alone(self):
+        session = UploadSession.objects.create(
+            perfil=self.profile, destino="arquivos-igreja", nome_arquivo="a.mp3",
+            tamanho=10, sha256="0" * 64,
+        )
+        # a second request that passed the offset check before the first committed
+        stale = UploadSession.objects.get(pk=session.pk)
+        self.assertEqual(uploads.write_chunk(session, BytesIO(b"01234"), 0, 5), 5)
+        self.assertIsNone(uploads.write_chunk(stale, BytesIO(b"abc"), 0, 3))
+        self.assertEqual(stale.recebido, 5)
+        self.assertEqual(uploads.part_path(session).read_bytes(), b"01234")
+
+    def test_resumable_upload_attaches_file(self):
+        content = b"sermao " * 1000
+        response = self.client.post(
+            "/api/uploads/",
+            data=json.dumps(
+                {
+                    "destino": "arquivos-igreja",
+                    "nome_arquivo": "sermao.mp3",
+                    "tamanho": len(content),
+                    "sha256": hashlib.sha256(content).hexdigest(),
+                }
+            ),
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()["upload_id"]
+
+        self.assertEqual(self.put_chunk(upload_id, content[:4000], 0, len(content)).status_code, 200)
+        retry = self.put_chunk(upload_id, content[:4000], 0, len(content))
+        self.assertEqual(retry.status_code, 409)
+        self.assertEqual(retry.json()["recebido"], 4000)
+        status = self.client.get(f"/api/uploads/{upload_id}/", **self.auth).json()
+        self.assertEqual(status["recebido"], 4000)
+        self.assertEqual(self.put_chunk(upload_id, content[4000:], 4000, len(content)).status_code, 200)
+
+        response = self.client.post(
+            f"/api/uploads/{upload_id}/finalize/",
+            data=json.dumps({"nome_arquivo": "Sermao", "igreja_id": self.igreja.id}),
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        arquivo = ArquivosIgreja.objects.get(pk=response.json()["id"])
+        self.assertEqual(
+            arquivo.arquivo.name.rsplit("/", 1)[-1], hashlib.sha256(content).hexdigest() + ".mp3"
+        )
+        with arquivo.arquivo.open("rb") as handle:
+            self.assertEqual(handle.read(), content)
+        self.assertFalse(UploadSession.objects.exists())
+
+
+class MediaDownloadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.arquivo = ArquivosIgreja.objects.create(
+            igreja=self.igreja,
+            nome_arquivo="Hino",
+            arquivo=ContentFile(b"0123456789", name="hino.txt"),
+        )
+        self.url = f"/api/media/arquivos-igreja/{self.arquivo.id}/"
+
+    def test_range_and_conditional_requests(self):
+        full = self.client.get(self.url)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(b"".join(full.streaming_content), b"0123456789")
+        self.assertEqual(full["Accept-Ranges"], "bytes")
+
+        partial = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(partial.streaming_content), b"2345")
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=full["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE="bytes=20-").status_code, 416)
+        multi = self.client.get(self.url, HTTP_RANGE="bytes=0-1,4-5")
+        self.assertEqual(multi.status_code, 200)
+        self.assertEqual(b"".join(multi.streaming_content), b"0123456789")
+
+    def test_group_attachments_require_membership(self):
+        grupo = Grupos.objects.create(nome="Musica", descricao="", igreja=self.igreja)
+        autor, _ = create_member("autor@iasd.local", is_admin=True)
+        postagem = PostagensGrupos.objects.create(
+            grupo=grupo, autor=autor, arquivo=ContentFile(b"x", name="foto.txt")
+        )
+        _, token = create_member("outsider@iasd.local")
+        url = f"/api/media/postagens-grupos/{postagem.id}/"
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f"Token {token}").status_code, 403)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT="x-accel-redirect", MEDIA_ACCEL_PREFIX="/protected/")
+    def test_accel_redirect_handoff(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/" + self.arquivo.arquivo.name)
+
+
+@override_settings(IMAGE_DERIVATIVE_WORKERS=0)
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def png(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buffer, "PNG")
+        return ContentFile(buffer.getvalue(), name="foto.png")
+
+    def test_profile_payload_returns_shared_derivatives(self):
+        first, token = create_member("foto1@iasd.local")
+        second, _ = create_member("foto2@iasd.local")
+        with self.captureOnCommitCallbacks(execute=True):
+            first.image = self.png()
+            first.save()
+            second.image = self.png()
+            second.save()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image_variants["avatar"], second.image_variants["avatar"])
+
+        payload = self.client.get(
+            f"/api/profiles/{first.id}/", HTTP_AUTHORIZATION=f"Token {token}"
+        ).json()
+        self.assertEqual(set(payload["image_variants"]), {"avatar", "thumbnail"})
+        self.assertEqual(payload["image_url"], f"/api/media/profiles/{first.id}/")
+        avatar_url = payload["image_variants"]["avatar"]
+        avatar = self.client.get(avatar_url, HTTP_AUTHORIZATION=f"Token {token}")
+        self.assertEqual(avatar.status_code, 200)
+        self.assertEqual(self.client.get(avatar_url).status_code, 401)
+        _, other_token = create_member("vizinho@iasd.local")
+        other = {"HTTP_AUTHORIZATION": f"Token {other_token}"}
+        self.assertEqual(self.client.get(avatar_url, **other).status_code, 200)
+        self.assertEqual(self.client.get(payload["image_url"], **other).status_code, 200)
+        with first.image.storage.open(first.image_variants["avatar"]) as handle:
+            self.assertEqual(Image.open(handle).size, (96, 96))
+
+    def test_broken_image_is_logged_and_keeps_no_variants(self):
+        profile, _ = create_member("quebrada@iasd.local")
+        with self.assertLogs("API.images", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.image = ContentFile(b"not an image", name="foto.png")
+                profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.image_variants, {})
+
+
+class DeduplicatingStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+
+    def create_arquivo(self, content, name="hino.pdf"):
+        return ArquivosIgreja.objects.create(
+            igreja=self.igreja, nome_arquivo=name, arquivo=ContentFile(content, name=name)
+        )
+
+    def test_identical_uploads_share_one_blob_until_last_delete(self):
+        first = self.create_arquivo(b"hinario")
+        second = self.create_arquivo(b"hinario", name="copia.pdf")
+        self.assertEqual(first.arquivo.name, second.arquivo.name)
+        blob = StoredBlob.objects.get(nome=first.arquivo.name)
+        self.assertEqual(blob.referencias, 2)
+
+        path = first.arquivo.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_migrate_command_moves_legacy_files(self):
+        legacy = self.create_arquivo(b"placeholder")
+        legacy_name = default_storage.save("arquivos_igreja/antigo.pdf", ContentFile(b"antigo"))
+        ArquivosIgreja.objects.filter(pk=legacy.pk).update(arquivo=legacy_name)
+
+        call_command("migrate_media_to_blobs", stdout=StringIO())
+        legacy.refresh_from_db()
+        self.assertTrue(legacy.arquivo.name.startswith("blobs/"))
+        self.assertFalse(default_storage.exists(legacy_name))
+        with legacy.arquivo.open("rb") as handle:
+            self.assertEqual(handle.read(), b"antigo")
+
+
+class OrphanedMediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.kept = ArquivosIgreja.objects.create(
+            igreja=igreja, nome_arquivo="Hino", arquivo=ContentFile(b"hino", name="hino.pdf")
+        )
+        self.orphan = default_storage.save("postagens/velho.jpg", ContentFile(b"12345"))
+        self.recent = default_storage.save("postagens/novo.jpg", ContentFile(b"123"))
+        profile, _ = create_member("midia@iasd.local")
+        self.derivative = default_storage.save("derivatives/ab/abc-avatar.webp", ContentFile(b"d"))
+        Profile.objects.filter(pk=profile.pk).update(
+            image_variants={"source": "perfis/a.jpg", "avatar": self.derivative}
+        )
+        self.stale_derivative = default_storage.save(
+            "derivatives/cd/cde-avatar.webp", ContentFile(b"dd")
+        )
+        session = UploadSession.objects.create(
+            perfil=profile, destino="postagem", nome_arquivo="a.bin", tamanho=1, sha256="0" * 64
+        )
+        self.live_part = default_storage.save(
+            f"{settings.CHUNKED_UPLOAD_DIR}/{session.id}.part", ContentFile(b"p")
+        )
+        self.dead_part = default_storage.save(
+            f"{settings.CHUNKED_UPLOAD_DIR}/00000000-0000-0000-0000-000000000000.part",
+            ContentFile(b"ppp"),
+        )
+        old = time.time() - 7200
+        for name in (
+            self.orphan, self.kept.arquivo.name, self.derivative, self.stale_derivative,
+            self.live_part, self.dead_part,
+        ):
+            os.utime(default_storage.path(name), (old, old))
+
+    def test_dry_run_then_quarantine(self):
+        out = StringIO()
+        call_command("collect_orphaned_media", "--dry-run", stdout=out)
+        self.assertIn("orphan: postagens/velho.jpg (5 bytes)", out.getvalue())
+        self.assertTrue(default_storage.exists(self.orphan))
+
+        out = StringIO()
+        call_command("collect_orphaned_media", "--quarantine", "quarentena", stdout=out)
+        self.assertIn("3 orphans. Reclaimed 10 bytes", out.getvalue())
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertFalse(default_storage.exists(self.stale_derivative))
+        self.assertFalse(default_storage.exists(self.dead_part))
+        self.assertTrue(default_storage.exists(self.derivative))
+        self.assertTrue(default_storage.exists(self.live_part))
+        self.assertTrue(default_storage.exists("quarentena/postagens/velho.jpg"))
+        self.assertTrue(default_storage.exists(self.recent))
+        self.assertTrue(default_storage.exists(self.kept.arquivo.name))
+
+    def test_streams_json_and_part_references_in_path_order(self):
+        # derivatives are inserted out of path order and parts get random ids,
+        # so only database ordering keeps the merge from missing a reference
+        for index, prefix in enumerate(("ff", "11", "99")):
+            profile, _ = create_member(f"ordem{index}@iasd.local")
+            name = default_storage.save(f"derivatives/{prefix}/x-avatar.webp", ContentFile(b"d"))
+            Profile.objects.filter(pk=profile.pk).update(image_variants={"avatar": name})
+            session = UploadSession.objects.create(
+                perfil=profile, destino="postagem", nome_arquivo="a.bin", tamanho=1, sha256="0" * 64
+            )
+            default_storage.save(f"{settings.CHUNKED_UPLOAD_DIR}/{session.id}.part", ContentFile(b"p"))
+        old = time.time() - 7200
+        for root, _, files in os.walk(default_storage.location):
+            for name in files:
+                os.utime(os.path.join(root, name), (old, old))
+
+        out = StringIO()
+        call_command("collect_orphaned_media", "--dry-run", stdout=out)
+        self.assertIn("Scanned 13 files, 4 orphans.", out.getvalue())
+
+
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        for index in range(40):
+            Igreja.objects.create(
+                nome=f"IASD {index}", endereco="Rua Esperanca, 120", telefone="1", email="a@iasd.local"
+            )
+
+    def test_gzip_negotiation_and_threshold(self):
+        plain = self.client.get("/api/igrejas/")
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        response = self.client.get("/api/igrejas/", HTTP_ACCEPT_ENCODING="gzip;q=1.0, identity;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+
+        refused = self.client.get("/api/igrejas/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertNotIn("Content-Encoding", refused)
+
+        small = self.client.get("/api/igrejas/999/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", small)
+
+    def test_public_responses_reuse_cached_compressed_body(self):
+        first = self.client.get("/api/igrejas/", HTTP_ACCEPT_ENCODING="gzip")
+        with mock.patch("backend.middleware.compress_bytes") as compress:
+            second = self.client.get("/api/igrejas/", HTTP_ACCEPT_ENCODING="gzip")
+        compress.assert_not_called()
+        self.assertEqual(first.content, second.content)
+
+
+class JsonEncoderTests(TestCase):
+    def test_fast_and_stdlib_backends_agree(self):
+        data = {
+            "id": 1,
+            "data": datetime(2025, 5, 1, 18, 30, 0, 123456, tzinfo=dt_timezone.utc),
+            "redonda": datetime(2025, 5, 1, 18, 30, tzinfo=dt_timezone.utc),
+            "local": datetime(2025, 5, 1, 18, 30, 0, 999999),
+            "dia": datetime(2025, 5, 1).date(),
+            "valor": Decimal("10.50"),
+            "enquete": json_fragment('{"opcoes": ["sim", "n\\u00e3o"]}'),
+            "vazia": json_fragment(None),
+        }
+        expected = {
+            "id": 1,
+            "data": "2025-05-01T18:30:00.123456Z",
+            "redonda": "2025-05-01T18:30:00Z",
+            "local": "2025-05-01T18:30:00.999999",
+            "dia": "2025-05-01",
+            "valor": "10.50",
+            "enquete": {"opcoes": ["sim", "não"]},
+            "vazia": None,
+        }
+        fast = dumps(data)
+        self.assertEqual(json.loads(fast), expected)
+        self.assertIn(b'"n\\u00e3o"', fast)
+        with override_settings(JSON_ENCODER_BACKEND="stdlib"):
+            self.assertEqual(json.loads(dumps(data)), expected)
+        with self.assertRaises(TypeError):
+            FastJsonResponse([1, 2])
+
+
+class ColumnsFormatTests(TestCase):
+    def test_columns_match_object_payload(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        grupo = Grupos.objects.create(nome="Musica", descricao="", igreja=igreja)
+        profile, token = create_member("colunas@iasd.local", is_admin=True)
+        postagem = PostagensGrupos.objects.create(grupo=grupo, autor=profile, conteudo="Ensaio")
+        ComentariosPostagens.objects.create(postagem=postagem, autor=profile, conteudo="Ok")
+        auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+
+        Profile.objects.filter(pk=profile.pk).update(
+            image="perfis/a.jpg", image_variants={"source": "perfis/a.jpg", "avatar": "d/a.webp"}
+        )
+        for url in ("/api/comentarios-postagens/", "/api/profiles/"):
+            objects = self.client.get(url, **auth).json()
+            # tuples from values_list are converted in place, never as dicts
+            with mock.patch.object(serializers.Projection, "many", side_effect=AssertionError):
+                table = self.client.get(url, {"format": "columns"}, **auth).json()
+            rows = [dict(zip(table["columns"], row)) for row in table["rows"]]
+            self.assertEqual(
+                rows, [{key: obj[key] for key in table["columns"]} for obj in objects]
+            )
+        mine = next(row for row in rows if row["id"] == profile.id)
+        self.assertEqual(mine["image_variants"], {"avatar": f"/api/media/profiles/{profile.id}/avatar/"})
+
+
+class ProjectionTests(TestCase):
+    def test_projections_match_payload_helpers(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        grupo = Grupos.objects.create(nome="Musica", descricao="", igreja=igreja)
+        profile, _ = create_member("projecao@iasd.local")
+        Events.objects.create(
+            titulo="Culto", descricao="", igreja=igreja,
+            data_inicio=datetime(2026, 1, 1, 19, tzinfo=dt_timezone.utc),
+            data_fim=datetime(2026, 1, 1, 21, tzinfo=dt_timezone.utc),
+        )
+        Comunicados.objects.create(titulo="Reuniao", mensagem="Sexta", igreja=igreja)
+        postagem = PostagensGrupos.objects.create(
+            grupo=grupo, autor=profile, conteudo="Ensaio", enquete={"pergunta": "Sabado?"}
+        )
+        ComentariosPostagens.objects.create(postagem=postagem, autor=profile, conteudo="Ok")
+
+        # postagens add one windowed query for the comment preview and, with an
+        # enquete on the page, one for the poll tallies
+        cases = [
+            (Events.objects.all(), views.event_payload, serializers.EVENT, 1),
+            (Comunicados.objects.all(), views.comunicado_payload, serializers.COMUNICADO, 1),
+            (PostagensGrupos.objects.all(), views.postagem_payload, serializers.POSTAGEM, 3),
+            (ComentariosPostagens.objects.all(), views.comentario_payload, serializers.COMENTARIO, 1),
+        ]
+        for queryset, payload, projection, queries in cases:
+            with self.assertNumQueries(queries):
+                rows = projection.many(queryset)
+            # enquete comes through as a raw JSON fragment, so compare encoded
+            self.assertEqual(
+                json.loads(dumps(rows)), json.loads(dumps([payload(obj) for obj in queryset]))
+            )
+
+
+class ResourceTests(TestCase):
+    def setUp(self):
+        self.igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.grupo = Grupos.objects.create(nome="Musica", descricao="", igreja=self.igreja)
+        _, staff_token = create_member("anciao@iasd.local", is_elder=True)
+        self.member, member_token = create_member("membro@iasd.local")
+        self.staff = {"HTTP_AUTHORIZATION": f"Token {staff_token}"}
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {member_token}"}
+
+    def post(self, url, data, **headers):
+        return self.client.post(url, json.dumps(data), content_type="application/json", **headers)
+
+    def test_get_actions_answer_head(self):
+        head = self.client.head("/api/igrejas/")
+        self.assertEqual((head.status_code, head.content), (200, b""))
+        self.assertEqual(self.client.head("/api/events/create/", **self.staff).status_code, 405)
+
+    def test_event_lifecycle(self):
+        payload = {
+            "titulo": "Culto",
+            "data_inicio": "2026-01-01T19:00:00Z",
+            "data_fim": "2026-01-01T21:00:00Z",
+            "igreja_id": self.igreja.id,
+        }
+        self.assertEqual(self.post("/api/events/create/", payload, **self.auth).status_code, 403)
+        response = self.post("/api/events/create/", payload, **self.staff)
+        self.assertEqual(response.status_code, 201)
+        event_id = response.json()["event_id"]
+
+        response = self.post(
+            f"/api/events/{event_id}/update/", {"data_fim": "2025-12-31T00:00:00Z"}, **self.staff
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.post(
+            f"/api/events/{event_id}/update/", {"titulo": "", "descricao": "Santa ceia"}, **self.staff
+        )
+        self.assertEqual(response.status_code, 200)
+        event = self.client.get(f"/api/events/{event_id}/").json()
+        self.assertEqual((event["titulo"], event["descricao"]), ("Culto", "Santa ceia"))
+        self.assertEqual(self.client.get("/api/events/", {"igreja_id": "x"}).status_code, 400)
+
+        response = self.post(f"/api/events/{event_id}/delete/", {}, **self.staff)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f"/api/events/{event_id}/").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/events/{event_id}/delete/").status_code, 401)
+
+    def test_member_rules(self):
+        url = "/api/postagens-grupos/create/"
+        postagem = {"grupo_id": self.grupo.id, "conteudo": "Oi"}
+        self.assertEqual(self.post(url, postagem, **self.auth).status_code, 403)
+        self.member.grupos.add(self.grupo)
+        self.assertEqual(self.post(url, {"grupo_id": self.grupo.id}, **self.auth).status_code, 400)
+        self.assertEqual(self.post(url, postagem, **self.auth).status_code, 201)
+        self.assertEqual(len(self.client.get("/api/postagens-grupos/", **self.auth).json()), 1)
+
+        notificacao = NotificacoesGrupos.objects.create(
+            perfil=self.member, grupo=self.grupo, mensagem="Ensaio"
+        )
+        url = f"/api/notificacoes-grupos/{notificacao.id}/update/"
+        self.assertEqual(self.post(url, {"mensagem": "Outra", "lida": True}, **self.auth).status_code, 200)
+        notificacao.refresh_from_db()
+        self.assertEqual((notificacao.mensagem, notificacao.lida), ("Ensaio", True))
+        self.assertEqual(self.client.get("/api/notificacoes-grupos/", **self.auth).status_code, 403)
+
+        mensagem = {"destinatario_id": self.member.id, "conteudo": "Oi"}
+        response = self.post("/api/mensagens-privadas/create/", mensagem, **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_new_projections_match_payload_helpers(self):
+        Atividades.objects.create(
+            nome="Ensaio", descricao="", Grupo=self.grupo,
+            data=datetime(2026, 1, 1, 19, tzinfo=dt_timezone.utc),
+        )
+        cases = [
+            (Igreja.objects.all(), views.igreja_payload, serializers.IGREJA),
+            (Grupos.objects.all(), views.grupo_payload, serializers.GRUPO),
+            (Atividades.objects.all(), views.atividade_payload, serializers.ATIVIDADE),
+        ]
+        for queryset, payload, projection in cases:
+            self.assertEqual(projection.many(queryset), [payload(obj) for obj in queryset])
+
+
+@override_settings(MEMBERSHIP_CACHE_SECONDS=60)
+class MembershipCacheTests(TestCase):
+    def test_detail_skips_membership_queries_and_updates_evict(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        grupo = Grupos.objects.create(nome="Jovens", descricao="", igreja=igreja)
+        outro = Grupos.objects.create(nome="Coral", descricao="", igreja=igreja)
+        profile, token = create_member("jovem@iasd.local")
+        profile.grupos.add(grupo)
+        _, staff_token = create_member("pastor@iasd.local", is_admin=True)
+        postagem = PostagensGrupos.objects.create(grupo=grupo, autor=profile, conteudo="Oi")
+        auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+        url = f"/api/postagens-grupos/{postagem.id}/"
+
+        self.assertEqual(self.client.get(url, **auth).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, **auth).status_code, 200)
+            self.assertEqual(len(self.client.get("/api/grupos/", **auth).json()), 1)
+        self.assertFalse([q for q in queries if "profile_grupos" in q["sql"]])
+
+        response = self.client.post(
+            f"/api/profiles/{profile.id}/update/",
+            {"grupo_ids": str(outro.id)},
+            HTTP_AUTHORIZATION=f"Token {staff_token}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, **auth).status_code, 403)
+        grupos = self.client.get("/api/grupos/", **auth).json()
+        self.assertEqual([g["id"] for g in grupos], [outro.id])
+
+
+class RateLimitTests(TestCase):
+    @override_settings(RATE_LIMITS={"login": ("2/m", 2, "ip")})
+    def test_login_is_throttled_per_ip(self):
+        body = json.dumps({"username": "x@iasd.local", "password": "errada"})
+        statuses = [
+            self.client.post("/api/login/", body, content_type="application/json").status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [401, 401, 429])
+        response = self.client.post("/api/login/", body, content_type="application/json")
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        other_ip = self.client.post(
+            "/api/login/", body, content_type="application/json", REMOTE_ADDR="10.0.0.2"
+        )
+        self.assertEqual(other_ip.status_code, 401)
+        self.assertEqual(self.client.get("/api/igrejas/").status_code, 200)
+
+    @override_settings(RATE_LIMITS={"*": ("2/m", 2, "token")})
+    def test_unverified_tokens_share_the_ip_bucket(self):
+        token = create_member("limite@iasd.local")[1]
+        self.assertEqual(
+            self.client.get("/api/igrejas/", HTTP_AUTHORIZATION=f"Token {token}").status_code, 200
+        )
+        statuses = [
+            self.client.get("/api/igrejas/", HTTP_AUTHORIZATION=f"Token bogus{i}").status_code
+            for i in range(2)
+        ]
+        self.assertEqual(statuses[-1], 429)
+        # the verified token now has its own bucket
+        self.assertEqual(
+            self.client.get("/api/igrejas/", HTTP_AUTHORIZATION=f"Token {token}").status_code, 200
+        )
+
+    def test_cache_backend_refills(self):
+        limiter = RateLimiter({"*": ("1/s", 2, "token")}, CacheBackend("default"))
+        request = RequestFactory().get("/api/events/", HTTP_AUTHORIZATION="Token abc")
+        with mock.patch("backend.ratelimit.time.time", return_value=1000.0):
+            self.assertEqual([limiter.hit("events-list", request) for _ in range(3)], [0, 0, 1.0])
+        with mock.patch("backend.ratelimit.time.time", return_value=1001.0):
+            self.assertEqual(limiter.hit("events-list", request), 0)
+
+
+class EventRsvpTests(TestCase):
+    def setUp(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.event = Events.objects.create(
+            titulo="Retiro", descricao="", igreja=igreja, capacidade=2,
+            data_inicio=datetime(2026, 1, 1, 19, tzinfo=dt_timezone.utc),
+            data_fim=datetime(2026, 1, 1, 21, tzinfo=dt_timezone.utc),
+        )
+        self.tokens = [create_member(f"membro{i}@iasd.local")[1] for i in range(3)]
+
+    def rsvp(self, action, index):
+        return self.client.post(
+            f"/api/events/{self.event.id}/{action}/",
+            HTTP_AUTHORIZATION=f"Token {self.tokens[index]}",
+        )
+
+    def test_join_leave_and_capacity(self):
+        self.assertEqual(self.rsvp("participar", 0).status_code, 201)
+        self.assertEqual(self.rsvp("participar", 0).status_code, 200)
+        self.assertEqual(self.rsvp("participar", 1).json()["participantes_count"], 2)
+        self.assertEqual(self.rsvp("participar", 2).status_code, 409)
+        self.assertEqual(self.rsvp("sair", 0).json()["participantes_count"], 1)
+        self.assertEqual(self.rsvp("participar", 2).status_code, 201)
+
+        with self.assertNumQueries(1):
+            events = serializers.EVENT.many(Events.objects.all())
+        self.assertEqual(events[0]["participantes_count"], 2)
+        self.assertEqual(self.event.participantes.count(), 2)
+
+        response = self.client.get(
+            f"/api/events/{self.event.id}/participantes/",
+            {"page_size": 1},
+            HTTP_AUTHORIZATION=f"Token {self.tokens[0]}",
+        )
+        data = response.json()
+        self.assertEqual((data["count"], data["has_next"]), (2, True))
+        self.assertEqual(data["results"][0]["username"], "membro1@iasd.local")
+
+    def test_m2m_changes_keep_count(self):
+        profile = Profile.objects.get(user__username="membro0@iasd.local")
+        self.event.participantes.add(profile)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participantes_count, 1)
+        profile.events_set.clear()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participantes_count, 0)
+
+    def test_deleting_an_attendee_recounts(self):
+        self.assertEqual(self.rsvp("participar", 0).status_code, 201)
+        self.assertEqual(self.rsvp("participar", 1).status_code, 201)
+        Profile.objects.get(user__username="membro0@iasd.local").delete()
+        get_user_model().objects.get(username="membro1@iasd.local").delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participantes_count, 0)
+
+
+class AudienceTests(TestCase):
+    def setUp(self):
+        self.igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        outra = Igreja.objects.create(
+            nome="IASD Norte", endereco="Rua B", telefone="2", email="b@iasd.local"
+        )
+        self.jovens = Grupos.objects.create(nome="Jovens", descricao="", igreja=self.igreja)
+        self.membro, token = create_member("membro@iasd.local")
+        self.membro.igrejas.add(self.igreja)
+        self.membro.grupos.add(self.jovens)
+        self.outro, outro_token = create_member("outro@iasd.local")
+        _, staff_token = create_member("anciao@iasd.local", is_elder=True)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+        self.outro_auth = {"HTTP_AUTHORIZATION": f"Token {outro_token}"}
+        self.staff = {"HTTP_AUTHORIZATION": f"Token {staff_token}"}
+
+        def create(url, **data):
+            data.setdefault("mensagem", "Detalhes")
+            response = self.client.post(
+                url, json.dumps(data), content_type="application/json", **self.staff
+            )
+            self.assertEqual(response.status_code, 201, response.content)
+            return response.json()
+
+        create("/api/comunicados/create/", titulo="Geral", igreja_id=self.igreja.id)
+        create("/api/comunicados/create/", titulo="Norte", igreja_id=outra.id)
+        create(
+            "/api/avisos/create/", titulo="Ensaio", igreja_id=self.igreja.id,
+            publico="grupos", grupo_ids=[self.jovens.id],
+        )
+        self.pessoal = create(
+            "/api/avisos/create/", titulo="Pessoal", igreja_id=self.igreja.id,
+            publico="perfis", destinatario_ids=[self.membro.id],
+        )["aviso_id"]
+
+    def titulos(self, url, **auth):
+        return sorted(row["titulo"] for row in self.client.get(url, **auth).json())
+
+    def test_lists_follow_audience(self):
+        titulos = self.titulos
+        self.assertEqual(titulos("/api/avisos/"), [])
+        self.assertEqual(titulos("/api/avisos/", **self.auth), ["Ensaio", "Pessoal"])
+        self.assertEqual(titulos("/api/avisos/", **self.outro_auth), [])
+        self.assertEqual(titulos("/api/avisos/", **self.staff), ["Ensaio", "Pessoal"])
+        self.assertEqual(titulos("/api/comunicados/", **self.outro_auth), ["Geral", "Norte"])
+        response = self.client.get(f"/api/avisos/{self.pessoal}/", **self.outro_auth)
+        self.assertEqual(response.status_code, 403)
+        invalid = {"titulo": "X", "mensagem": "Y", "igreja_id": self.igreja.id, "publico": "todos"}
+        response = self.client.post(
+            "/api/avisos/create/",
+            json.dumps(invalid),
+            content_type="application/json",
+            **self.staff,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_unread_inbox_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get("/api/anuncios/nao-lidos/", **self.auth).json()["results"]
+        self.assertEqual([(r["tipo"], r["titulo"]) for r in rows], [
+            ("aviso", "Pessoal"), ("aviso", "Ensaio"), ("comunicado", "Geral"),
+        ])
+        self.assertEqual(len([q for q in queries if "UNION" in q["sql"]]), 1)
+
+        response = self.client.post(
+            "/api/anuncios/lidos/",
+            json.dumps({"aviso_ids": [self.pessoal], "comunicado_ids": [rows[2]["id"]]}),
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.json()["marcados"], 2)
+        for auth in (self.auth, self.outro_auth):
+            response = self.client.post(
+                "/api/anuncios/lidos/",
+                json.dumps({"aviso_ids": [self.pessoal, 999999]}),
+                content_type="application/json",
+                **auth,
+            )
+            self.assertEqual(response.json()["marcados"], 0)
+        rows = self.client.get("/api/anuncios/nao-lidos/", **self.auth).json()["results"]
+        self.assertEqual([r["titulo"] for r in rows], ["Ensaio"])
+        self.assertEqual(Leituras.objects.count(), 2)
+        Avisos.objects.filter(pk=self.pessoal).delete()
+        self.assertEqual(Leituras.objects.count(), 1)
+
+
+class PollTests(TestCase):
+    def setUp(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.grupo = Grupos.objects.create(nome="Jovens", descricao="", igreja=igreja)
+        self.membros = []
+        for i in range(2):
+            profile, token = create_member(f"jovem{i}@iasd.local")
+            profile.grupos.add(self.grupo)
+            self.membros.append({"HTTP_AUTHORIZATION": f"Token {token}"})
+        response = self.client.post(
+            "/api/postagens-grupos/create/",
+            {
+                "grupo_id": self.grupo.id,
+                "enquete": json.dumps({"pergunta": "Quando?", "opcoes": ["Sabado", "Domingo"]}),
+            },
+            **self.membros[0],
+        )
+        self.postagem = PostagensGrupos.objects.get(pk=response.json()["postagem_id"])
+        self.sabado, self.domingo = self.postagem.opcoes.values_list("id", flat=True)
+
+    def vote(self, index, opcao_id):
+        return self.client.post(
+            f"/api/postagens-grupos/{self.postagem.id}/votar/",
+            json.dumps({"opcao_id": opcao_id}),
+            content_type="application/json",
+            **self.membros[index],
+        )
+
+    def test_votes_update_counters(self):
+        self.vote(0, self.sabado)
+        self.vote(0, self.sabado)
+        self.vote(1, self.sabado)
+        data = self.vote(1, self.domingo).json()
+        self.assertEqual(
+            (data["total"], [o["votos"] for o in data["opcoes"]], data["meu_voto"]),
+            (2, [1, 1], self.domingo),
+        )
+        self.assertEqual(VotosEnquete.objects.count(), 2)
+        self.assertEqual(self.vote(0, 999).status_code, 404)
+
+        posts = self.client.get("/api/postagens-grupos/", **self.membros[1]).json()
+        self.assertEqual(posts[0]["enquete_resultados"]["total"], 2)
+        with self.assertNumQueries(1):
+            polls.results([self.postagem.id])
+        with mock.patch.object(polls.caching, "is_shared", return_value=True):
+            polls.results([self.postagem.id])
+            with self.assertNumQueries(0):
+                polls.results([self.postagem.id])
+        cache.clear()
+
+        self.client.post(
+            f"/api/postagens-grupos/{self.postagem.id}/retirar-voto/", **self.membros[0]
+        )
+        response = self.client.get(
+            f"/api/postagens-grupos/{self.postagem.id}/resultados/", **self.membros[0]
+        )
+        self.assertEqual([o["votos"] for o in response.json()["opcoes"]], [0, 1])
+
+    def test_editing_options_keeps_counters_consistent(self):
+        self.vote(0, self.sabado)
+        self.vote(1, self.domingo)
+        self.postagem.enquete = {"pergunta": "Quando?", "opcoes": ["Domingo", "Sabado"]}
+        self.postagem.save()
+        tally = polls.results([self.postagem.id])[self.postagem.id]
+        self.assertEqual(
+            [(o["id"], o["texto"], o["votos"]) for o in tally["opcoes"]],
+            [(self.domingo, "Domingo", 1), (self.sabado, "Sabado", 1)],
+        )
+
+        self.postagem.enquete = {"pergunta": "Quando?", "opcoes": ["Sabado a tarde", "Domingo"]}
+        self.postagem.save()
+        tally = polls.results([self.postagem.id])[self.postagem.id]
+        self.assertEqual(
+            [(o["texto"], o["votos"]) for o in tally["opcoes"]],
+            [("Sabado a tarde", 0), ("Domingo", 1)],
+        )
+        self.assertEqual(tally["total"], 1)
+        self.assertEqual(VotosEnquete.objects.count(), 1)
+
+
+class ComentariosPreviewTests(TestCase):
+    def setUp(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        self.grupo = Grupos.objects.create(nome="Jovens", descricao="", igreja=igreja)
+        self.profile, token = create_member("jovem@iasd.local")
+        self.profile.grupos.add(self.grupo)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+
+    def comment(self, postagem, conteudo):
+        return self.client.post(
+            "/api/comentarios-postagens/create/",
+            {"postagem_id": postagem.id, "conteudo": conteudo},
+            **self.auth,
+        ).json()["comentario_id"]
+
+    def feed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            posts = self.client.get(
+                f"/api/postagens-grupos/?grupo_id={self.grupo.id}", **self.auth
+            ).json()
+        return posts, len(queries)
+
+    def test_feed_embeds_count_and_latest_comments(self):
+        postagem = PostagensGrupos.objects.create(grupo=self.grupo, autor=self.profile, conteudo="a")
+        ids = [self.comment(postagem, f"c{i}") for i in range(5)]
+        self.client.post(f"/api/comentarios-postagens/{ids[-1]}/delete/", **self.auth)
+
+        posts, queries = self.feed_queries()
+        self.assertEqual(posts[0]["comentarios_count"], 4)
+        self.assertEqual(
+            [c["conteudo"] for c in posts[0]["comentarios_recentes"]], ["c3", "c2", "c1"]
+        )
+        detail = self.client.get(f"/api/postagens-grupos/{postagem.id}/", **self.auth).json()
+        self.assertEqual(detail["comentarios_recentes"], posts[0]["comentarios_recentes"])
+
+        for i in range(3):
+            extra = PostagensGrupos.objects.create(grupo=self.grupo, autor=self.profile, conteudo="b")
+            self.comment(extra, "x")
+        posts, more_queries = self.feed_queries()
+        self.assertEqual(len(posts), 4)
+        self.assertEqual(more_queries, queries)
+
+    def test_recount_command_repairs_drifted_counters(self):
+        postagem = PostagensGrupos.objects.create(grupo=self.grupo, autor=self.profile, conteudo="a")
+        self.comment(postagem, "c")
+        PostagensGrupos.objects.filter(pk=postagem.pk).update(comentarios_count=7)
+        out = StringIO()
+        call_command("recount_counters", stdout=out)
+        self.assertIn("Recounted 1 postagens", out.getvalue())
+        postagem.refresh_from_db()
+        self.assertEqual(postagem.comentarios_count, 1)
+
+
+class TokenSweeperTests(TestCase):
+    def test_purges_expired_tokens_in_batches(self):
+        old = timezone.now() - timedelta(days=30)
+        for i in range(5):
+            create_member(f"antigo{i}@iasd.local")
+        AuthToken.objects.update(created_at=old, last_used_at=old)
+        _, fresh = create_member("novo@iasd.local")
+        Session.objects.create(session_key="x" * 32, session_data="", expire_date=old)
+
+        with CaptureQueriesContext(connection) as queries:
+            counts = sweeper.sweep(batch_size=2)
+        self.assertEqual(counts, {"tokens": 5, "sessions": 1, "uploads": 0})
+        deletes = [q for q in queries if q["sql"].startswith('DELETE FROM "API_authtoken"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(list(AuthToken.objects.values_list("key", flat=True)), [fresh])
+
+        out = StringIO()
+        call_command("purge_expired_tokens", stdout=out)
+        self.assertIn("Deleted 0 expired tokens", out.getvalue())
+
+
+@inline_hashing
+class TokenDeviceTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username="irmao", password="StrongPass123!")
+
+    def login(self, device):
+        response = self.client.post(
+            "/api/login/",
+            json.dumps({"username": "irmao", "password": "StrongPass123!", "device": device}),
+            content_type="application/json",
+        )
+        return {"HTTP_AUTHORIZATION": f"Token {response.json()['token']}"}
+
+    def status(self, auth):
+        return self.client.get("/api/grupos/", **auth).status_code
+
+    def test_devices_keep_their_tokens_and_refresh_rotates(self):
+        phone = self.login("celular")
+        tablet = self.login("tablet")
+        self.login("tablet")
+        self.assertEqual(AuthToken.objects.count(), 2)
+        self.assertEqual((self.status(phone), self.status(tablet)), (200, 401))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.status(phone)
+        self.assertFalse([q for q in queries if q["sql"].startswith('UPDATE "API_authtoken"')])
+
+        AuthToken.objects.update(last_used_at=timezone.now() - timedelta(days=29))
+        self.status(phone)
+        token = AuthToken.objects.get(device="celular")
+        self.assertGreater(token.last_used_at, timezone.now() - timedelta(minutes=1))
+
+        new_key = self.client.post("/api/token/refresh/", **phone).json()["token"]
+        self.assertEqual(self.client.post("/api/token/refresh/", **phone).status_code, 401)
+        self.assertEqual(self.status({"HTTP_AUTHORIZATION": f"Token {new_key}"}), 200)
+
+
+@override_settings(AUTH_ACCESS_TOKENS=True)
+@inline_hashing
+class AccessTokenTests(TestCase):
+    def test_access_token_skips_database_and_is_revoked_on_logout(self):
+        grupo = Grupos.objects.create(
+            nome="Jovens", descricao="", igreja=Igreja.objects.create(
+                nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+            )
+        )
+        user = get_user_model().objects.create_user(username="irmao", password="StrongPass123!")
+        Profile.objects.get(user=user).grupos.add(grupo)
+        data = self.client.post(
+            "/api/login/",
+            json.dumps({"username": "irmao", "password": "StrongPass123!"}),
+            content_type="application/json",
+        ).json()
+        access = {"HTTP_AUTHORIZATION": f"Bearer {data['access_token']}"}
+        refresh = {"HTTP_AUTHORIZATION": f"Token {data['token']}"}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/grupos/{grupo.id}/", **access)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if "API_authtoken" in q["sql"]])
+
+        tampered = {"HTTP_AUTHORIZATION": f"Bearer {data['access_token'][:-2]}xx"}
+        self.assertEqual(self.client.get("/api/grupos/", **tampered).status_code, 401)
+        self.assertEqual(self.client.post("/api/token/refresh/", **access).status_code, 401)
+        self.assertIn("access_token", self.client.post("/api/token/access/", **refresh).json())
+
+        self.client.post("/api/logout/", **refresh)
+        response = self.client.get("/api/grupos/", **access)
+        self.assertEqual(response.json()["error"], "Token revoked")
+
+    def test_refresh_revokes_access_tokens_of_the_old_key(self):
+        user = get_user_model().objects.create_user(username="irmao", password="StrongPass123!")
+        token = issue_token(user)
+        old = access_tokens.issue(token, user.profile)
+        refreshed = self.client.post(
+            "/api/token/refresh/", HTTP_AUTHORIZATION=f"Token {token.key}"
+        ).json()
+        status = lambda value: self.client.get(
+            "/api/grupos/", HTTP_AUTHORIZATION=f"Bearer {value}"
+        ).status_code
+        self.assertEqual(status(old), 401)
+        self.assertEqual(status(refreshed["access_token"]), 200)
+
+    def test_check_requires_a_shared_revocation_cache(self):
+        self.assertEqual(
+            [error.id for error in access_tokens.check_revocation_cache(None)], ["API.E001"]
+        )
+        with override_settings(AUTH_ACCESS_TOKENS=False):
+            self.assertEqual(access_tokens.check_revocation_cache(None), [])
+
+
+class PasswordHashPoolTests(TransactionTestCase):
+    def login(self, password="StrongPass123!"):
+        return self.client.post(
+            "/api/login/",
+            json.dumps({"username": "irmao", "password": password}),
+            content_type="application/json",
+        )
+
+    def test_pool_runs_django_authenticate(self):
+        user = get_user_model().objects.create_user(username="irmao", password="StrongPass123!")
+        failed = []
+        handler = lambda sender, credentials, **kwargs: failed.append(credentials["username"])
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+
+        self.assertEqual(self.login("errada").status_code, 401)
+        self.assertEqual(failed, ["irmao"])
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_login_gets_503_when_the_hash_queue_is_full(self):
+        get_user_model().objects.create_user(username="irmao", password="StrongPass123!")
+        pool = hashing.HashPool(workers=1, queue=0, timeout=5)
+        release = threading.Event()
+        pool.submit(release.wait)
+        with mock.patch.object(hashing, "_pool", pool):
+            response = self.login()
+            self.assertEqual((response.status_code, response["Retry-After"]), (503, "1"))
+            release.set()
+            self.assertTrue(pool.slots.acquire(timeout=5))
+            pool.slots.release()
+            self.assertEqual(self.login().status_code, 200)
+
+
+async_urls = types.ModuleType("async_urls")
+async_urls.urlpatterns = [path("api/", include(api_urls.build(async_views=True)))]
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        grupo = Grupos.objects.create(nome="Jovens", descricao="", igreja=igreja)
+        self.profile, token = create_member("jovem@iasd.local")
+        self.profile.grupos.add(grupo)
+        self.profile.igrejas.add(igreja)
+        outro, _ = create_member("outro@iasd.local")
+        self.postagem = PostagensGrupos.objects.create(grupo=grupo, autor=outro, conteudo="Ensaio")
+        ComentariosPostagens.objects.create(postagem=self.postagem, autor=outro, conteudo="Ok")
+        MensagensPrivadas.objects.create(remetente=outro, destinatario=self.profile, conteudo="Oi")
+        NotificacoesGrupos.objects.create(perfil=self.profile, grupo=grupo, mensagem="Nova")
+        Comunicados.objects.create(titulo="Reuniao", mensagem="Sexta", igreja=igreja)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+
+    def test_async_views_match_sync_views(self):
+        urls = [
+            "/api/postagens-grupos/",
+            f"/api/postagens-grupos/{self.postagem.id}/",
+            "/api/postagens-grupos/?format=columns",
+            "/api/mensagens-privadas/?kind=recebidas",
+            "/api/events/",
+            "/api/profiles/notify/",
+            "/api/profiles/resumo/",
+        ]
+        expected = [self.client.get(url, **self.auth) for url in urls]
+        with override_settings(ROOT_URLCONF=async_urls):
+            headers = {"Authorization": self.auth["HTTP_AUTHORIZATION"]}
+            actual = [async_to_sync(self.async_client.get)(url, headers=headers) for url in urls]
+        for url, sync_response, async_response in zip(urls, expected, actual):
+            self.assertEqual(async_response.status_code, 200, url)
+            self.assertEqual(async_response.json(), sync_response.json(), url)
+        with override_settings(ROOT_URLCONF=async_urls):
+            head = async_to_sync(self.async_client.head)("/api/postagens-grupos/", headers=headers)
+        self.assertEqual((head.status_code, head.content), (200, b""))
+        resumo = actual[-1].json()
+        self.assertEqual(
+            [resumo[key] for key in ("mensagens_nao_lidas", "notificacoes_nao_lidas", "anuncios_nao_lidos")],
+            [1, 1, 1],
+        )
+
+
+class RetentionTests(TestCase):
+    def test_archives_in_batches_and_serves_archived_rows(self):
+        igreja = Igreja.objects.create(
+            nome="IASD Central", endereco="Rua A", telefone="1", email="a@iasd.local"
+        )
+        grupo = Grupos.objects.create(nome="Jovens", descricao="", igreja=igreja)
+        profile, token = create_member("jovem@iasd.local")
+        outro, _ = create_member("outro@iasd.local")
+        for lida in (True, True, True, False):
+            NotificacoesGrupos.objects.create(perfil=profile, grupo=grupo, mensagem="Nova", lida=lida)
+        recente = NotificacoesGrupos.objects.create(perfil=profile, grupo=grupo, mensagem="Hoje", lida=True)
+        MensagensPrivadas.objects.create(remetente=outro, destinatario=profile, conteudo="Antiga")
+        MensagensPrivadas.objects.create(remetente=profile, destinatario=outro, conteudo="Nova")
+        old = timezone.now() - timedelta(days=400)
+        NotificacoesGrupos.objects.exclude(pk=recente.pk).update(data_notificacao=old)
+        MensagensPrivadas.objects.filter(conteudo="Antiga").update(data_envio=old)
+
+        self.assertEqual(retention.run(batch_size=2), {"notificacoes": 3, "mensagens": 1})
+        self.assertEqual(NotificacoesGrupos.objects.count(), 2)
+        self.assertEqual(list(MensagensPrivadas.objects.values_list("conteudo", flat=True)), ["Nova"])
+        self.assertEqual(retention.run(), {"notificacoes": 0, "mensagens": 0})
+
+        auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+        page = self.client.get("/api/notificacoes-grupos/arquivadas/?page_size=2", **auth).json()
+        self.assertEqual((len(page["results"]), page["has_next"]), (2, True))
+        mensagens = self.client.get("/api/mensagens-privadas/arquivadas/?kind=recebidas", **auth).json()
+        self.assertEqual([m["conteudo"] for m in mensagens["results"]], ["Antiga"])
@@ -0,0 +1,105 @@
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArquivosIgreja, PostagensGrupos, RecursosEducacionais, UploadSession
+from .storage import file_sha256
+
+
+UPLOAD_TARGETS = {
+    "arquivos-igreja": ArquivosIgreja,
+    "recursos-educacionais": RecursosEducacionais,
+    "postagens-grupos": PostagensGrupos,
+}
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+READ_SIZE = 64 * 1024
+
+
+def part_path(session):
+    return Path(settings.MEDIA_ROOT) / settings.CHUNKED_UPLOAD_DIR / f"{session.id}.part"
+
+
+def upload_ttl():
+    return timedelta(hours=getattr(settings, "CHUNKED_UPLOAD_TTL_HOURS", 24))
+
+
+def expires_at(session):
+    return session.criado_em + upload_ttl()
+
+
+def is_expired(session, now=None):
+    return expires_at(session) <= (now or timezone.now())
+
+
+def expired_sessions(now=None):
+    return UploadSession.objects.filter(criado_em__lte=(now or timezone.now()) - upload_ttl())
+
+
+def remove_parts(session_ids):
+    root = Path(settings.MEDIA_ROOT) / settings.CHUNKED_UPLOAD_DIR
+    for session_id in session_ids:
+        (root / f"{session_id}.part").unlink(missing_ok=True)
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        return None
+    return start, end
+
+
+def write_chunk(session, stream, start, length):
+    # The row lock serializes chunks for one session: the offset check, the
+    # write and the recebido update happen as one step, so a retried or
+    # concurrent chunk can never rewrite bytes that are already committed.
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        session.recebido = locked.recebido
+        if start != locked.recebido:
+            return None
+        path = part_path(session)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "r+b" if path.exists() else "wb") as handle:
+            handle.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = stream.read(min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                handle.write(chunk)
+                remaining -= len(chunk)
+            handle.truncate()
+            handle.flush()
+            os.fsync(handle.fileno())
+        written = length - remaining
+        session.recebido = start + written
+        UploadSession.objects.filter(pk=session.pk).update(recebido=session.recebido)
+    return written
+
+
+def attach_file(instance, field_name, path, filename, sha256=None):
+    field = instance._meta.get_field(field_name)
+    if hasattr(field.storage, "adopt_file"):
+        name = field.storage.adopt_file(path, filename, sha256=sha256)
+        setattr(instance, field_name, name)
+        return name
+    name = field.storage.get_available_name(field.generate_filename(instance, filename))
+    target = Path(field.storage.path(name))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, target)
+    setattr(instance, field_name, name)
+    return name
+
+
+def discard_session(session):
+    part_path(session).unlink(missing_ok=True)
+    session.delete()
@@ -1,15 +1,12 @@
-import json
-import secrets
-from datetime import timedelta
+import asyncio
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.contrib.auth.password_validation import validate_password
 from django.db.models import Q
-from django.http import JsonResponse
-from django.utils import timezone
-from django.utils.dateparse import parse_datetime
+from django.db.models.fields.files import FieldFile
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
@@ -30,141 +27,43 @@ from .models import (
     PostagensGrupos,
     ComentariosPostagens,
     MensagensPrivadas,
+    MensagensArquivadas,
+    NotificacoesArquivadas,
+    SearchEntry,
+    UploadSession,
+    VotosEnquete,
 )
-
-
-def json_error(message, status=400, **extra):
-    payload = {"error": message}
-    payload.update(extra)
-    return JsonResponse(payload, status=status)
-
-
-def parse_json_body(request):
-    if not request.body:
-        return {}, None
-    try:
-        return json.loads(request.body), None
-    except json.JSONDecodeError:
-        return None, json_error("Invalid JSON body", status=400)
-
-
-def get_request_data(request):
-    content_type = request.content_type or ""
-    if content_type.startswith("application/json"):
-        return parse_json_body(request)
-    if request.POST:
-        return request.POST.dict(), None
-    if not request.body:
-        return {}, None
-    return parse_json_body(request)
-
-
-def get_list_value(data, name, request=None):
-    if name in data:
-        value = data.get(name)
-        if isinstance(value, list):
-            return value
-        if isinstance(value, str):
-            return [item.strip() for item in value.split(",") if item.strip()]
-        return [value]
-    if request is not None:
-        values = request.POST.getlist(name)
-        if values:
-            return values
-    return []
-
-
-def require_fields(data, fields):
-    missing = [field for field in fields if data.get(field) in (None, "")]
-    if missing:
-        return json_error("Missing required fields", status=400, fields=missing)
-    return None
-
-
-def parse_int(value, field_name, required=True):
-    if value in (None, ""):
-        if required:
-            return None, json_error(f"{field_name} is required", status=400)
-        return None, None
-    try:
-        return int(value), None
-    except (TypeError, ValueError):
-        return None, json_error(f"Invalid {field_name}", status=400)
-
-
-def parse_datetime_value(value, field_name, required=True):
-    if value in (None, ""):
-        if required:
-            return None, json_error(f"{field_name} is required", status=400)
-        return None, None
-    parsed = parse_datetime(value)
-    if parsed is None:
-        return None, json_error(f"Invalid datetime for {field_name}", status=400)
-    if timezone.is_naive(parsed):
-        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
-    return parsed, None
-
-
-def parse_bool(value):
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, str):
-        return value.strip().lower() in ("1", "true", "yes", "y", "sim")
-    return bool(value)
-
-
-def extract_token_key(request):
-    auth_header = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth_header:
-        return None
-    parts = auth_header.split()
-    if len(parts) == 2 and parts[0].lower() in ("token", "bearer"):
-        return parts[1]
-    return auth_header
-
-
-def token_is_expired(token):
-    ttl_days = getattr(settings, "AUTH_TOKEN_TTL_DAYS", 7)
-    if not ttl_days or ttl_days <= 0:
-        return False
-    return token.created_at < timezone.now() - timedelta(days=ttl_days)
-
-
-def issue_token(user):
-    token, _ = AuthToken.objects.get_or_create(user=user)
-    now = timezone.now()
-    token.key = secrets.token_hex(20)
-    token.created_at = now
-    token.last_used_at = now
-    token.save()
-    return token
-
-
-def get_authenticated_profile(request):
-    token_key = extract_token_key(request)
-    if not token_key:
-        return None, json_error("Authorization header missing", status=401)
-    try:
-        token = AuthToken.objects.select_related("user").get(key=token_key)
-    except AuthToken.DoesNotExist:
-        return None, json_error("Invalid token", status=401)
-    if token_is_expired(token):
-        token.delete()
-        return None, json_error("Token expired", status=401)
-    token.last_used_at = timezone.now()
-    token.save(update_fields=["last_used_at"])
-    profile, _ = Profile.objects.get_or_create(user=token.user)
-    return profile, None
-
-
-def has_staff_access(profile):
-    return profile.is_admin or profile.is_elder
-
-
-def is_group_member(profile, grupo):
-    if has_staff_access(profile):
-        return True
-    return profile.grupos.filter(pk=grupo.pk).exists()
+from .encoders import JsonResponse
+from .helpers import (
+    aget_authenticated_profile,
+    aprojection_response,
+    extract_token_key,
+    get_authenticated_profile,
+    get_list_value,
+    get_request_data,
+    has_staff_access,
+    is_group_member,
+    issue_token,
+    json_error,
+    parse_int,
+    parse_json_body,
+    parse_page,
+    projection_response,
+    refresh_token,
+    require_fields,
+)
+from .images import IMAGE_SOURCES, current_variants
+from .media import download_url, serve_field_file, variant_urls
+from .resources import AUTHENTICATED, PUBLIC, STAFF, Field, Resource
+from .search import search_entries, visible_entries
+from . import access_tokens
+from . import audiences
+from . import hashing
+from . import memberships
+from . import polls
+from . import rsvp
+from . import serializers
+from . import uploads
 
 
 def igreja_payload(igreja):
@@ -196,7 +95,10 @@ def profile_summary_payload(profile):
         "telefone": profile.telefone,
         "is_admin": profile.is_admin,
         "is_elder": profile.is_elder,
-        "image_url": profile.image.url if profile.image else None,
+        "image_url": download_url("profiles", profile.id) if profile.image else None,
+        "image_variants": variant_urls(
+            "profiles", profile.id, profile.image.name, profile.image_variants
+        ),
     }
 
 
@@ -218,6 +120,8 @@ def event_payload(event):
         "data_fim": event.data_fim,
         "igreja_id": event.igreja_id,
         "igreja_nome": event.igreja.nome if event.igreja_id else None,
+        "participantes_count": event.participantes_count,
+        "capacidade": event.capacidade,
     }
 
 
@@ -240,6 +144,7 @@ def comunicado_payload(comunicado):
         "data_envio": comunicado.data_envio,
         "igreja_id": comunicado.igreja_id,
         "igreja_nome": comunicado.igreja.nome if comunicado.igreja_id else None,
+        "publico": comunicado.publico,
     }
 
 
@@ -251,6 +156,7 @@ def aviso_payload(aviso):
         "data_envio": aviso.data_envio,
         "igreja_id": aviso.igreja_id,
         "igreja_nome": aviso.igreja.nome if aviso.igreja_id else None,
+        "publico": aviso.publico,
     }
 
 
@@ -271,7 +177,9 @@ def recurso_payload(recurso):
         "id": recurso.id,
         "titulo": recurso.titulo,
         "descricao": recurso.descricao,
-        "arquivo_url": recurso.arquivo.url if recurso.arquivo else None,
+        "arquivo_url": (
+            download_url("recursos-educacionais", recurso.id) if recurso.arquivo else None
+        ),
         "data_upload": recurso.data_upload,
         "igreja_id": recurso.igreja_id,
         "igreja_nome": recurso.igreja.nome if recurso.igreja_id else None,
@@ -282,7 +190,7 @@ def arquivo_payload(arquivo):
     return {
         "id": arquivo.id,
         "nome_arquivo": arquivo.nome_arquivo,
-        "arquivo_url": arquivo.arquivo.url if arquivo.arquivo else None,
+        "arquivo_url": download_url("arquivos-igreja", arquivo.id) if arquivo.arquivo else None,
         "data_upload": arquivo.data_upload,
         "igreja_id": arquivo.igreja_id,
         "igreja_nome": arquivo.igreja.nome if arquivo.igreja_id else None,
@@ -297,10 +205,18 @@ def postagem_payload(postagem):
         "grupo_id": postagem.grupo_id,
         "grupo_nome": postagem.grupo.nome if postagem.grupo_id else None,
         "conteudo": postagem.conteudo,
-        "arquivo_url": postagem.arquivo.url if postagem.arquivo else None,
+        "arquivo_url": (
+            download_url("postagens-grupos", postagem.id) if postagem.arquivo else None
+        ),
+        "arquivo_variants": variant_urls(
+            "postagens-grupos", postagem.id, postagem.arquivo.name, postagem.arquivo_variants
+        ),
         "enquete": postagem.enquete,
         "link": postagem.link,
         "data_postagem": postagem.data_postagem,
+        "enquete_resultados": polls.postagem_results(postagem),
+        "comentarios_count": postagem.comentarios_count,
+        "comentarios_recentes": serializers.latest_comentarios([postagem.pk])[postagem.pk],
     }
 
 
@@ -328,6 +244,18 @@ def mensagem_payload(mensagem):
     }
 
 
+def search_entry_payload(entry):
+    return {
+        "tipo": entry.tipo,
+        "id": entry.objeto_id,
+        "igreja_id": entry.igreja_id,
+        "grupo_id": entry.grupo_id,
+        "titulo": entry.titulo,
+        "trecho": entry.conteudo[:200],
+        "data": entry.data,
+    }
+
+
 class AuthenticatedView(View):
     require_staff = False
 
@@ -346,6 +274,30 @@ class StaffView(AuthenticatedView):
     require_staff = True
 
 
+class AsyncAuthenticatedView(View):
+    # AuthenticatedView for async handlers (ASYNC_VIEWS under ASGI); the
+    # caller's memberships are preloaded so the sync permission helpers
+    # do not query.
+    require_staff = False
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        profile, error = await aget_authenticated_profile(request)
+        if error:
+            return error
+        if self.require_staff and not has_staff_access(profile):
+            return json_error("Forbidden", status=403)
+        request.profile = profile
+        await memberships.aload(profile)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+def busy_response():
+    response = json_error("Server busy, try again shortly", status=503)
+    response["Retry-After"] = "1"
+    return response
+
+
 @csrf_exempt
 @require_POST
 def login_view(request):
@@ -356,11 +308,14 @@ def login_view(request):
     if missing:
         return missing
 
-    user = authenticate(request, username=data.get("username"), password=data.get("password"))
+    try:
+        user = hashing.authenticate_user(request, data.get("username"), data.get("password"))
+    except hashing.Busy:
+        return busy_response()
     if user is None:
         return json_error("Invalid credentials", status=401)
 
-    token = issue_token(user)
+    token = issue_token(user, data.get("device"))
     profile, _ = Profile.objects.get_or_create(user=user)
     payload = {
         "token": token.key,
@@ -370,6 +325,7 @@ def login_view(request):
             "email": user.email,
         },
         "profile": profile_detail_payload(profile),
+        **access_tokens.grant(token, profile),
     }
     return JsonResponse(payload)
 
@@ -388,6 +344,29 @@ def logout_view(request):
     return JsonResponse({"message": "Logged out successfully"})
 
 
+class TokenRefresh(AuthenticatedView):
+    # rotates the stored (refresh) token; access tokens cannot call it
+    def post(self, request):
+        if request.auth_token is None:
+            return json_error("Refresh token required", status=401)
+        token = refresh_token(request.auth_token)
+        if token is None:
+            return json_error("Invalid token", status=401)
+        payload = {"token": token.key, "device": token.device}
+        payload.update(access_tokens.grant(token, request.profile))
+        return JsonResponse(payload)
+
+
+class TokenAccess(AuthenticatedView):
+    # a new access token for the same refresh token, without rotating it
+    def post(self, request):
+        if not access_tokens.enabled():
+            return json_error("Access tokens are disabled", status=404)
+        if request.auth_token is None:
+            return json_error("Refresh token required", status=401)
+        return JsonResponse(access_tokens.grant(request.auth_token, request.profile))
+
+
 @csrf_exempt
 @require_POST
 def register_view(request):
@@ -412,7 +391,17 @@ def register_view(request):
     except ValidationError as exc:
         return json_error("Invalid password", status=400, details=exc.messages)
 
-    user = User.objects.create_user(username=username, password=password, email=email)
+    try:
+        encoded = hashing.hash_password(password)
+    except hashing.Busy:
+        return busy_response()
+    # what create_user does, with the hash computed on the pool above
+    user = User(
+        username=User.normalize_username(username),
+        email=User.objects.normalize_email(email),
+        password=encoded,
+    )
+    user.save()
     profile, _ = Profile.objects.get_or_create(user=user)
     if telefone:
         profile.telefone = telefone
@@ -433,74 +422,74 @@ def register_view(request):
         profile.igrejas.add(*igrejas)
 
     profile.save()
-    token = issue_token(user)
+    token = issue_token(user, data.get("device"))
     payload = {
         "message": "User registered successfully",
         "token": token.key,
         "user": {"id": user.id, "username": user.username, "email": user.email},
         "profile": profile_detail_payload(profile),
+        **access_tokens.grant(token, profile),
     }
     return JsonResponse(payload, status=201)
 
 
-class IgrejaList(View):
+class ProfileList(StaffView):
     def get(self, request):
-        igrejas = Igreja.objects.all().order_by("nome")
-        data = [igreja_payload(igreja) for igreja in igrejas]
-        return JsonResponse(data, safe=False)
+        profiles = Profile.objects.all()
+        return projection_response(request, profiles, serializers.PROFILE_SUMMARY)
 
 
-class IgrejaDetail(View):
-    def get(self, request, pk):
-        try:
-            igreja = Igreja.objects.get(pk=pk)
-        except Igreja.DoesNotExist:
-            return json_error("Igreja not found", status=404)
-        return JsonResponse(igreja_payload(igreja))
+def notificacoes_for(request):
+    include_read = request.GET.get("include_read") in ("1", "true", "yes")
+    notificacoes = NotificacoesGrupos.objects.filter(perfil_id=request.profile.id)
+    if not include_read:
+        notificacoes = notificacoes.filter(lida=False)
+    return notificacoes
 
 
-class GruposList(AuthenticatedView):
+class ProfileNotify(AuthenticatedView):
     def get(self, request):
-        grupos = Grupos.objects.select_related("igreja").all()
-        igreja_id, error = parse_int(request.GET.get("igreja_id"), "igreja_id", required=False)
-        if error:
-            return error
-        if igreja_id is not None:
-            grupos = grupos.filter(igreja_id=igreja_id)
-        if not has_staff_access(request.profile):
-            grupos = grupos.filter(id__in=request.profile.grupos.values_list("id", flat=True))
-        data = [grupo_payload(grupo) for grupo in grupos]
-        return JsonResponse(data, safe=False)
+        return projection_response(request, notificacoes_for(request), serializers.NOTIFICACAO)
 
 
-class GruposDetail(AuthenticatedView):
-    def get(self, request, pk):
-        try:
-            grupo = Grupos.objects.select_related("igreja").get(pk=pk)
-        except Grupos.DoesNotExist:
-            return json_error("Grupo not found", status=404)
-        if not is_group_member(request.profile, grupo):
-            return json_error("Forbidden", status=403)
-        return JsonResponse(grupo_payload(grupo))
+class AsyncProfileNotify(AsyncAuthenticatedView):
+    async def get(self, request):
+        return await aprojection_response(
+            request, notificacoes_for(request), serializers.NOTIFICACAO
+        )
 
 
-class ProfileList(StaffView):
-    def get(self, request):
-        profiles = Profile.objects.select_related("user").all()
-        data = [profile_summary_payload(profile) for profile in profiles]
-        return JsonResponse(data, safe=False)
+def unread_counts(profile):
+    # name -> queryset counted for the profile summary
+    return {
+        "mensagens_nao_lidas": MensagensPrivadas.objects.filter(
+            destinatario_id=profile.id, lida=False
+        ),
+        "notificacoes_nao_lidas": NotificacoesGrupos.objects.filter(
+            perfil_id=profile.id, lida=False
+        ),
+        "anuncios_nao_lidos": audiences.unread(profile),
+    }
 
 
-class ProfileNotify(AuthenticatedView):
+class ProfileResumo(AuthenticatedView):
+    # the caller's profile with its unread counters, for the app's home screen
     def get(self, request):
-        include_read = request.GET.get("include_read") in ("1", "true", "yes")
-        notificacoes = NotificacoesGrupos.objects.select_related("grupo").filter(
-            perfil=request.profile
+        payload = {"perfil": profile_detail_payload(request.profile)}
+        for name, queryset in unread_counts(request.profile).items():
+            payload[name] = queryset.count()
+        return JsonResponse(payload)
+
+
+class AsyncProfileResumo(AsyncAuthenticatedView):
+    async def get(self, request):
+        # the profile and each counter are independent queries, awaited together
+        counts = unread_counts(request.profile)
+        perfil, *totals = await asyncio.gather(
+            sync_to_async(profile_detail_payload)(request.profile),
+            *(queryset.acount() for queryset in counts.values()),
         )
-        if not include_read:
-            notificacoes = notificacoes.filter(lida=False)
-        data = [notificacao_payload(notificacao) for notificacao in notificacoes]
-        return JsonResponse(data, safe=False)
+        return JsonResponse({"perfil": perfil, **dict(zip(counts, totals))})
 
 
 class ProfileDetail(AuthenticatedView):
@@ -576,901 +565,781 @@ class ProfileDelete(AuthenticatedView):
         return JsonResponse({"message": "Profile deleted successfully"})
 
 
-class EventsList(View):
-    def get(self, request):
-        events = Events.objects.select_related("igreja").all()
-        igreja_id, error = parse_int(request.GET.get("igreja_id"), "igreja_id", required=False)
-        if error:
-            return error
-        if igreja_id is not None:
-            events = events.filter(igreja_id=igreja_id)
-        data = [event_payload(event) for event in events]
-        return JsonResponse(data, safe=False)
+def is_owner_or_staff(request, owner_id):
+    return owner_id == request.profile.id or has_staff_access(request.profile)
 
 
-class EventsDetail(View):
-    def get(self, request, pk):
-        try:
-            event = Events.objects.select_related("igreja").get(pk=pk)
-        except Events.DoesNotExist:
-            return json_error("Event not found", status=404)
-        return JsonResponse(event_payload(event))
+class IgrejaResource(Resource):
+    model = Igreja
+    prefix = "igrejas"
+    url_name = "igreja"
+    label = "Igreja"
+    actions = ("list", "detail")
+    access = {"list": PUBLIC, "detail": PUBLIC}
+    projection = serializers.IGREJA
+    payload = staticmethod(igreja_payload)
+    ordering = ("nome",)
 
 
-class EventsCreate(StaffView):
-    def post(self, request):
-        data, error = get_request_data(request)
-        if error:
-            return error
-        missing = require_fields(data, ["titulo", "data_inicio", "data_fim", "igreja_id"])
-        if missing:
-            return missing
+class GruposResource(Resource):
+    model = Grupos
+    prefix = "grupos"
+    label = "Grupo"
+    actions = ("list", "detail")
+    projection = serializers.GRUPO
+    payload = staticmethod(grupo_payload)
+    related = ("igreja",)
+    filters = {"igreja_id": "igreja_id"}
 
-        igreja_id, parse_error = parse_int(data.get("igreja_id"), "igreja_id")
-        if parse_error:
-            return parse_error
-        data_inicio, parse_error = parse_datetime_value(data.get("data_inicio"), "data_inicio")
-        if parse_error:
-            return parse_error
-        data_fim, parse_error = parse_datetime_value(data.get("data_fim"), "data_fim")
-        if parse_error:
-            return parse_error
-        if data_fim < data_inicio:
+    def scope(self, request, queryset, params):
+        if not has_staff_access(request.profile):
+            queryset = queryset.filter(id__in=memberships.group_ids(request.profile))
+        return queryset, None
+
+    def can_view(self, request, obj):
+        return is_group_member(request.profile, obj)
+
+
+class EventsResource(Resource):
+    model = Events
+    prefix = "events"
+    label = "Event"
+    id_key = "event_id"
+    access = {"list": PUBLIC, "detail": PUBLIC, "create": STAFF, "update": STAFF, "delete": STAFF}
+    projection = serializers.EVENT
+    payload = staticmethod(event_payload)
+    related = ("igreja",)
+    filters = {"igreja_id": "igreja_id"}
+    async_actions = ("list", "detail")
+    fields = (
+        Field("titulo", required=True),
+        Field("descricao", blank="clear"),
+        Field("data_inicio", "datetime", required=True),
+        Field("data_fim", "datetime", required=True),
+        Field("igreja_id", "fk", required=True, queryset=Igreja.objects, attname="igreja", label="Igreja"),
+        Field("capacidade", "int", default=None),
+    )
+
+    def clean(self, obj):
+        if obj.data_fim < obj.data_inicio:
             return json_error("data_fim must be after data_inicio", status=400)
+        if obj.capacidade is not None and obj.capacidade < 0:
+            return json_error("Invalid capacidade", status=400)
+        return None
 
-        try:
-            igreja = Igreja.objects.get(pk=igreja_id)
-        except Igreja.DoesNotExist:
-            return json_error("Igreja not found", status=404)
-
-        event = Events.objects.create(
-            titulo=data.get("titulo"),
-            descricao=data.get("descricao", ""),
-            data_inicio=data_inicio,
-            data_fim=data_fim,
-            igreja=igreja,
-        )
-        return JsonResponse({"message": "Event created successfully", "event_id": event.id}, status=201)
 
+RSVP_ERRORS = {
+    rsvp.FULL: ("Event is full", 409),
+    rsvp.NOT_FOUND: ("Event not found", 404),
+}
 
-class EventsUpdate(StaffView):
-    def post(self, request, pk):
-        try:
-            event = Events.objects.get(pk=pk)
-        except Events.DoesNotExist:
-            return json_error("Event not found", status=404)
 
-        data, error = get_request_data(request)
-        if error:
-            return error
-        if "titulo" in data:
-            event.titulo = data.get("titulo") or event.titulo
-        if "descricao" in data:
-            event.descricao = data.get("descricao") or ""
-        if "data_inicio" in data:
-            data_inicio, parse_error = parse_datetime_value(
-                data.get("data_inicio"), "data_inicio", required=False
-            )
-            if parse_error:
-                return parse_error
-            if data_inicio is not None:
-                event.data_inicio = data_inicio
-        if "data_fim" in data:
-            data_fim, parse_error = parse_datetime_value(
-                data.get("data_fim"), "data_fim", required=False
-            )
-            if parse_error:
-                return parse_error
-            if data_fim is not None:
-                event.data_fim = data_fim
-        if event.data_fim < event.data_inicio:
-            return json_error("data_fim must be after data_inicio", status=400)
+def participantes_count(event_id):
+    return Events.objects.filter(pk=event_id).values_list("participantes_count", flat=True).first()
+
 
-        event.save()
-        return JsonResponse({"message": "Event updated successfully"})
+class EventsParticipar(AuthenticatedView):
+    def post(self, request, pk):
+        result = rsvp.join(pk, request.profile.id)
+        if result in RSVP_ERRORS:
+            message, status = RSVP_ERRORS[result]
+            return json_error(message, status=status)
+        return JsonResponse(
+            {
+                "message": "Participation confirmed",
+                "participando": True,
+                "participantes_count": participantes_count(pk),
+            },
+            status=201 if result == rsvp.JOINED else 200,
+        )
 
 
-class EventsDelete(StaffView):
+class EventsSair(AuthenticatedView):
     def post(self, request, pk):
-        try:
-            event = Events.objects.get(pk=pk)
-        except Events.DoesNotExist:
+        if not rsvp.leave(pk, request.profile.id) and not Events.objects.filter(pk=pk).exists():
             return json_error("Event not found", status=404)
-        event.delete()
-        return JsonResponse({"message": "Event deleted successfully"})
+        return JsonResponse(
+            {
+                "message": "Participation cancelled",
+                "participando": False,
+                "participantes_count": participantes_count(pk),
+            }
+        )
 
 
-class AtividadesList(AuthenticatedView):
-    def get(self, request):
-        atividades = Atividades.objects.select_related("Grupo")
-        grupo_id, error = parse_int(request.GET.get("grupo_id"), "grupo_id", required=False)
-        if error:
-            return error
-        if grupo_id is not None:
-            atividades = atividades.filter(Grupo_id=grupo_id)
-        if not has_staff_access(request.profile):
-            atividades = atividades.filter(
-                Grupo_id__in=request.profile.grupos.values_list("id", flat=True)
-            )
-        data = [atividade_payload(atividade) for atividade in atividades]
-        return JsonResponse(data, safe=False)
+class EventsParticipantes(AuthenticatedView):
+    max_page_size = 100
 
-
-class AtividadesDetail(AuthenticatedView):
     def get(self, request, pk):
-        try:
-            atividade = Atividades.objects.select_related("Grupo").get(pk=pk)
-        except Atividades.DoesNotExist:
-            return json_error("Atividade not found", status=404)
-        if not is_group_member(request.profile, atividade.Grupo):
-            return json_error("Forbidden", status=403)
-        return JsonResponse(atividade_payload(atividade))
-
-
-class AtividadesCreate(AuthenticatedView):
-    def post(self, request):
-        data, error = get_request_data(request)
+        total = participantes_count(pk)
+        if total is None:
+            return json_error("Event not found", status=404)
+        paging, error = parse_page(request, max_size=self.max_page_size)
         if error:
             return error
-        missing = require_fields(data, ["nome", "data", "grupo_id"])
-        if missing:
-            return missing
-
-        grupo_id, parse_error = parse_int(data.get("grupo_id"), "grupo_id")
-        if parse_error:
-            return parse_error
-        data_atividade, parse_error = parse_datetime_value(data.get("data"), "data")
-        if parse_error:
-            return parse_error
-
-        try:
-            grupo = Grupos.objects.get(pk=grupo_id)
-        except Grupos.DoesNotExist:
-            return json_error("Grupo not found", status=404)
-        if not is_group_member(request.profile, grupo):
-            return json_error("Forbidden", status=403)
-
-        atividade = Atividades.objects.create(
-            nome=data.get("nome"),
-            descricao=data.get("descricao", ""),
-            data=data_atividade,
-            Grupo=grupo,
-        )
+        page, page_size = paging
+        offset = (page - 1) * page_size
+        profiles = Profile.objects.filter(events=pk).order_by("user__username", "id")
+        rows = serializers.PARTICIPANTE.many(profiles[offset:offset + page_size + 1])
         return JsonResponse(
-            {"message": "Atividade created successfully", "atividade_id": atividade.id},
-            status=201,
+            {
+                "count": total,
+                "page": page,
+                "page_size": page_size,
+                "has_next": len(rows) > page_size,
+                "results": rows[:page_size],
+            }
         )
 
 
-class AtividadesUpdate(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            atividade = Atividades.objects.select_related("Grupo").get(pk=pk)
-        except Atividades.DoesNotExist:
-            return json_error("Atividade not found", status=404)
-        if not is_group_member(request.profile, atividade.Grupo):
-            return json_error("Forbidden", status=403)
+def archived_page(request, queryset, projection, max_size=50):
+    # archive tables are large and cold: no total count, just has_next
+    paging, error = parse_page(request, max_size=max_size)
+    if error:
+        return error
+    page, page_size = paging
+    offset = (page - 1) * page_size
+    rows = projection.many(queryset[offset:offset + page_size + 1])
+    return JsonResponse(
+        {
+            "page": page,
+            "page_size": page_size,
+            "has_next": len(rows) > page_size,
+            "results": rows[:page_size],
+        }
+    )
+
+
+class NotificacoesArquivadasList(AuthenticatedView):
+    def get(self, request):
+        notificacoes = NotificacoesArquivadas.objects.filter(
+            perfil_id=request.profile.id
+        ).order_by("-data_notificacao", "-id")
+        return archived_page(request, notificacoes, serializers.NOTIFICACAO_ARQUIVADA)
 
-        data, error = get_request_data(request)
-        if error:
-            return error
-        if "nome" in data:
-            atividade.nome = data.get("nome") or atividade.nome
-        if "descricao" in data:
-            atividade.descricao = data.get("descricao") or ""
-        if "data" in data:
-            data_atividade, parse_error = parse_datetime_value(
-                data.get("data"), "data", required=False
+
+class MensagensArquivadasList(AuthenticatedView):
+    def get(self, request):
+        profile_id = request.profile.id
+        kind = request.GET.get("kind", "todas")
+        if kind == "enviadas":
+            mensagens = MensagensArquivadas.objects.filter(remetente_id=profile_id)
+        elif kind == "recebidas":
+            mensagens = MensagensArquivadas.objects.filter(destinatario_id=profile_id)
+        else:
+            mensagens = MensagensArquivadas.objects.filter(
+                Q(remetente_id=profile_id) | Q(destinatario_id=profile_id)
             )
-            if parse_error:
-                return parse_error
-            if data_atividade is not None:
-                atividade.data = data_atividade
-        atividade.save()
-        return JsonResponse({"message": "Atividade updated successfully"})
+        mensagens = mensagens.order_by("-data_envio", "-id")
+        return archived_page(request, mensagens, serializers.MENSAGEM_ARQUIVADA)
+
+
+class AtividadesResource(Resource):
+    model = Atividades
+    prefix = "atividades"
+    label = "Atividade"
+    id_key = "atividade_id"
+    projection = serializers.ATIVIDADE
+    payload = staticmethod(atividade_payload)
+    related = ("Grupo",)
+    filters = {"grupo_id": "Grupo_id"}
+    fields = (
+        Field("nome", required=True),
+        Field("descricao", blank="clear"),
+        Field("data", "datetime", required=True),
+        Field("grupo_id", "fk", required=True, queryset=Grupos.objects, attname="Grupo", label="Grupo"),
+    )
+
+    def scope(self, request, queryset, params):
+        if not has_staff_access(request.profile):
+            queryset = queryset.filter(Grupo_id__in=memberships.group_ids(request.profile))
+        return queryset, None
 
+    def can_view(self, request, obj):
+        return is_group_member(request.profile, obj.Grupo_id)
 
-class AtividadesDelete(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            atividade = Atividades.objects.select_related("Grupo").get(pk=pk)
-        except Atividades.DoesNotExist:
-            return json_error("Atividade not found", status=404)
-        if not is_group_member(request.profile, atividade.Grupo):
+    can_change = can_view
+
+    def authorize_create(self, request, obj):
+        if not is_group_member(request.profile, obj.Grupo_id):
             return json_error("Forbidden", status=403)
-        atividade.delete()
-        return JsonResponse({"message": "Atividade deleted successfully"})
+        return None
 
 
-class ComunicadosList(View):
+class ComunicadosResource(Resource):
+    model = Comunicados
+    prefix = "comunicados"
+    label = "Comunicado"
+    id_key = "comunicado_id"
+    access = {"list": PUBLIC, "detail": PUBLIC, "create": STAFF, "update": STAFF, "delete": STAFF}
+    projection = serializers.COMUNICADO
+    payload = staticmethod(comunicado_payload)
+    related = ("igreja",)
+    filters = {"igreja_id": "igreja_id"}
+    fields = (
+        Field("titulo", required=True),
+        Field("mensagem", required=True),
+        Field("igreja_id", "fk", required=True, queryset=Igreja.objects, attname="igreja", label="Igreja"),
+        Field("publico", default=audiences.IGREJA, choices=audiences.PUBLICOS),
+        Field("grupo_ids", "ids", queryset=Grupos.objects, attname="grupos", label="grupos"),
+        Field(
+            "destinatario_ids",
+            "ids",
+            queryset=Profile.objects,
+            attname="destinatarios",
+            label="destinatarios",
+        ),
+    )
+
+    def scope(self, request, queryset, params):
+        return audiences.visible(queryset, request.profile), None
+
+    def can_view(self, request, obj):
+        return audiences.can_view(obj, request.profile)
+
+
+class AvisosResource(ComunicadosResource):
+    model = Avisos
+    prefix = "avisos"
+    label = "Aviso"
+    id_key = "aviso_id"
+    projection = serializers.AVISO
+    payload = staticmethod(aviso_payload)
+
+
+class AnunciosNaoLidos(AuthenticatedView):
+    max_page_size = 100
+
     def get(self, request):
-        comunicados = Comunicados.objects.select_related("igreja")
-        igreja_id, error = parse_int(request.GET.get("igreja_id"), "igreja_id", required=False)
+        paging, error = parse_page(request, max_size=self.max_page_size)
         if error:
             return error
-        if igreja_id is not None:
-            comunicados = comunicados.filter(igreja_id=igreja_id)
-        data = [comunicado_payload(comunicado) for comunicado in comunicados]
-        return JsonResponse(data, safe=False)
-
-
-class ComunicadosDetail(View):
-    def get(self, request, pk):
-        try:
-            comunicado = Comunicados.objects.select_related("igreja").get(pk=pk)
-        except Comunicados.DoesNotExist:
-            return json_error("Comunicado not found", status=404)
-        return JsonResponse(comunicado_payload(comunicado))
+        page, page_size = paging
+        offset = (page - 1) * page_size
+        rows = list(audiences.unread(request.profile)[offset:offset + page_size + 1])
+        return JsonResponse(
+            {
+                "page": page,
+                "page_size": page_size,
+                "has_next": len(rows) > page_size,
+                "results": rows[:page_size],
+            }
+        )
 
 
-class ComunicadosCreate(StaffView):
+class AnunciosLidos(AuthenticatedView):
     def post(self, request):
         data, error = get_request_data(request)
         if error:
             return error
-        missing = require_fields(data, ["titulo", "mensagem", "igreja_id"])
-        if missing:
-            return missing
+        marked = 0
+        for tipo in audiences.ANUNCIOS:
+            ids = []
+            for value in get_list_value(data, f"{tipo}_ids", request=request):
+                parsed, parse_error = parse_int(value, f"{tipo}_ids")
+                if parse_error:
+                    return parse_error
+                ids.append(parsed)
+            marked += audiences.mark_read(request.profile, tipo, ids)
+        return JsonResponse({"message": "Marked as read", "marcados": marked})
+
+
+class NotificacoesGruposResource(Resource):
+    model = NotificacoesGrupos
+    prefix = "notificacoes-grupos"
+    label = "Notificacao"
+    id_key = "notificacao_id"
+    access = {"list": STAFF, "detail": STAFF, "create": STAFF, "update": AUTHENTICATED, "delete": STAFF}
+    projection = serializers.NOTIFICACAO
+    payload = staticmethod(notificacao_payload)
+    related = ("grupo", "perfil")
+    fields = (
+        Field("perfil_id", "fk", required=True, queryset=Profile.objects, attname="perfil", label="Perfil"),
+        Field("grupo_id", "fk", required=True, queryset=Grupos.objects, attname="grupo", label="Grupo"),
+        Field("mensagem", required=True),
+        Field("lida", "bool", creatable=False),
+    )
+
+    def can_change(self, request, obj):
+        return is_owner_or_staff(request, obj.perfil_id)
+
+    def updatable_fields(self, request, obj):
+        # members can only mark their own notifications as read
+        fields = super().updatable_fields(request, obj)
+        if has_staff_access(request.profile):
+            return fields
+        return [field for field in fields if field.name == "lida"]
+
+
+class RecursosEducacionaisResource(Resource):
+    model = RecursosEducacionais
+    prefix = "recursos-educacionais"
+    label = "Recurso Educacional"
+    id_key = "recurso_id"
+    access = {"list": PUBLIC, "detail": PUBLIC, "create": STAFF, "update": STAFF, "delete": STAFF}
+    projection = serializers.RECURSO
+    payload = staticmethod(recurso_payload)
+    related = ("igreja",)
+    filters = {"igreja_id": "igreja_id"}
+    fields = (
+        Field("titulo", required=True),
+        Field("descricao"),
+        Field("igreja_id", "fk", required=True, queryset=Igreja.objects, attname="igreja", label="Igreja"),
+        Field("arquivo", "file", required=True),
+    )
+
+
+class ArquivosIgrejaResource(Resource):
+    model = ArquivosIgreja
+    prefix = "arquivos-igreja"
+    label = "Arquivo Igreja"
+    id_key = "arquivo_id"
+    access = {"list": PUBLIC, "detail": PUBLIC, "create": STAFF, "update": STAFF, "delete": STAFF}
+    projection = serializers.ARQUIVO
+    payload = staticmethod(arquivo_payload)
+    related = ("igreja",)
+    filters = {"igreja_id": "igreja_id"}
+    fields = (
+        Field("nome_arquivo", required=True),
+        Field("igreja_id", "fk", required=True, queryset=Igreja.objects, attname="igreja", label="Igreja"),
+        Field("arquivo", "file", required=True),
+    )
+
+
+class PostagensGruposResource(Resource):
+    model = PostagensGrupos
+    prefix = "postagens-grupos"
+    label = "Postagem"
+    id_key = "postagem_id"
+    projection = serializers.POSTAGEM
+    payload = staticmethod(postagem_payload)
+    related = ("autor__user", "grupo")
+    filters = {"grupo_id": "grupo_id"}
+    async_actions = ("list", "detail")
+    fields = (
+        Field("grupo_id", "fk", required=True, queryset=Grupos.objects, attname="grupo", label="Grupo"),
+        Field("conteudo"),
+        Field("enquete", "json", default=None, blank="raw"),
+        Field("link", default=None, blank="raw"),
+        Field("arquivo", "file"),
+    )
+
+    def scope(self, request, queryset, params):
+        if not has_staff_access(request.profile):
+            queryset = queryset.filter(grupo_id__in=memberships.group_ids(request.profile))
+        return queryset, None
 
-        igreja_id, parse_error = parse_int(data.get("igreja_id"), "igreja_id")
-        if parse_error:
-            return parse_error
-        try:
-            igreja = Igreja.objects.get(pk=igreja_id)
-        except Igreja.DoesNotExist:
-            return json_error("Igreja not found", status=404)
-
-        comunicado = Comunicados.objects.create(
-            titulo=data.get("titulo"),
-            mensagem=data.get("mensagem"),
-            igreja=igreja,
-        )
-        return JsonResponse(
-            {"message": "Comunicado created successfully", "comunicado_id": comunicado.id},
-            status=201,
-        )
+    def can_view(self, request, obj):
+        return is_group_member(request.profile, obj.grupo_id)
 
+    def can_change(self, request, obj):
+        return is_owner_or_staff(request, obj.autor_id)
 
-class ComunicadosUpdate(StaffView):
-    def post(self, request, pk):
-        try:
-            comunicado = Comunicados.objects.get(pk=pk)
-        except Comunicados.DoesNotExist:
-            return json_error("Comunicado not found", status=404)
+    def defaults(self, request):
+        return {"autor": request.profile}
 
-        data, error = get_request_data(request)
-        if error:
-            return error
-        if "titulo" in data:
-            comunicado.titulo = data.get("titulo") or comunicado.titulo
-        if "mensagem" in data:
-            comunicado.mensagem = data.get("mensagem") or comunicado.mensagem
-        comunicado.save()
-        return JsonResponse({"message": "Comunicado updated successfully"})
+    def authorize_create(self, request, obj):
+        if not is_group_member(request.profile, obj.grupo_id):
+            return json_error("Forbidden", status=403)
+        return None
 
+    async def apayload(self, obj):
+        # poll results and the comment preview query
+        return await sync_to_async(postagem_payload)(obj)
 
-class ComunicadosDelete(StaffView):
-    def post(self, request, pk):
-        try:
-            comunicado = Comunicados.objects.get(pk=pk)
-        except Comunicados.DoesNotExist:
-            return json_error("Comunicado not found", status=404)
-        comunicado.delete()
-        return JsonResponse({"message": "Comunicado deleted successfully"})
+    def clean(self, obj):
+        if not any([obj.conteudo, obj.enquete, obj.link, obj.arquivo]):
+            return json_error("Provide conteudo, enquete, link, or arquivo", status=400)
+        return None
 
 
-class AvisosList(View):
-    def get(self, request):
-        avisos = Avisos.objects.select_related("igreja")
-        igreja_id, error = parse_int(request.GET.get("igreja_id"), "igreja_id", required=False)
-        if error:
-            return error
-        if igreja_id is not None:
-            avisos = avisos.filter(igreja_id=igreja_id)
-        data = [aviso_payload(aviso) for aviso in avisos]
-        return JsonResponse(data, safe=False)
+def get_postagem_for_member(request, pk):
+    postagem = PostagensGrupos.objects.only("grupo_id", "enquete").filter(pk=pk).first()
+    if postagem is None:
+        return None, json_error("Postagem not found", status=404)
+    if not is_group_member(request.profile, postagem.grupo_id):
+        return None, json_error("Forbidden", status=403)
+    return postagem, None
 
 
-class AvisosDetail(View):
-    def get(self, request, pk):
-        try:
-            aviso = Avisos.objects.select_related("igreja").get(pk=pk)
-        except Avisos.DoesNotExist:
-            return json_error("Aviso not found", status=404)
-        return JsonResponse(aviso_payload(aviso))
+def enquete_results_payload(request, postagem):
+    meu_voto = (
+        VotosEnquete.objects.filter(postagem_id=postagem.pk, perfil_id=request.profile.id)
+        .values_list("opcao_id", flat=True)
+        .first()
+    )
+    tally = polls.results([postagem.pk])[postagem.pk] or {"total": 0, "opcoes": []}
+    return {"postagem_id": postagem.pk, "meu_voto": meu_voto, **tally}
 
 
-class AvisosCreate(StaffView):
-    def post(self, request):
-        data, error = get_request_data(request)
+class PostagensVotar(AuthenticatedView):
+    def post(self, request, pk):
+        postagem, error = get_postagem_for_member(request, pk)
         if error:
             return error
-        missing = require_fields(data, ["titulo", "mensagem", "igreja_id"])
-        if missing:
-            return missing
-
-        igreja_id, parse_error = parse_int(data.get("igreja_id"), "igreja_id")
-        if parse_error:
-            return parse_error
-        try:
-            igreja = Igreja.objects.get(pk=igreja_id)
-        except Igreja.DoesNotExist:
-            return json_error("Igreja not found", status=404)
-
-        aviso = Avisos.objects.create(
-            titulo=data.get("titulo"),
-            mensagem=data.get("mensagem"),
-            igreja=igreja,
-        )
-        return JsonResponse({"message": "Aviso created successfully", "aviso_id": aviso.id}, status=201)
-
-
-class AvisosUpdate(StaffView):
-    def post(self, request, pk):
-        try:
-            aviso = Avisos.objects.get(pk=pk)
-        except Avisos.DoesNotExist:
-            return json_error("Aviso not found", status=404)
-
         data, error = get_request_data(request)
         if error:
             return error
-        if "titulo" in data:
-            aviso.titulo = data.get("titulo") or aviso.titulo
-        if "mensagem" in data:
-            aviso.mensagem = data.get("mensagem") or aviso.mensagem
-        aviso.save()
-        return JsonResponse({"message": "Aviso updated successfully"})
-
-
-class AvisosDelete(StaffView):
-    def post(self, request, pk):
-        try:
-            aviso = Avisos.objects.get(pk=pk)
-        except Avisos.DoesNotExist:
-            return json_error("Aviso not found", status=404)
-        aviso.delete()
-        return JsonResponse({"message": "Aviso deleted successfully"})
-
-
-class NotificacoesGruposList(StaffView):
-    def get(self, request):
-        notificacoes = NotificacoesGrupos.objects.select_related("grupo", "perfil")
-        data = [notificacao_payload(notificacao) for notificacao in notificacoes]
-        return JsonResponse(data, safe=False)
-
-
-class NotificacoesGruposDetail(StaffView):
-    def get(self, request, pk):
-        try:
-            notificacao = NotificacoesGrupos.objects.select_related("grupo", "perfil").get(pk=pk)
-        except NotificacoesGrupos.DoesNotExist:
-            return json_error("Notificacao not found", status=404)
-        return JsonResponse(notificacao_payload(notificacao))
-
-
-class NotificacoesGruposCreate(StaffView):
-    def post(self, request):
-        data, error = get_request_data(request)
+        opcao_id, error = parse_int(data.get("opcao_id"), "opcao_id")
         if error:
             return error
-        missing = require_fields(data, ["perfil_id", "grupo_id", "mensagem"])
-        if missing:
-            return missing
-
-        perfil_id, parse_error = parse_int(data.get("perfil_id"), "perfil_id")
-        if parse_error:
-            return parse_error
-        grupo_id, parse_error = parse_int(data.get("grupo_id"), "grupo_id")
-        if parse_error:
-            return parse_error
-
-        try:
-            perfil = Profile.objects.get(pk=perfil_id)
-        except Profile.DoesNotExist:
-            return json_error("Perfil not found", status=404)
-        try:
-            grupo = Grupos.objects.get(pk=grupo_id)
-        except Grupos.DoesNotExist:
-            return json_error("Grupo not found", status=404)
-
-        notificacao = NotificacoesGrupos.objects.create(
-            perfil=perfil, grupo=grupo, mensagem=data.get("mensagem")
-        )
-        return JsonResponse(
-            {"message": "Notificacao created successfully", "notificacao_id": notificacao.id},
-            status=201,
-        )
+        if polls.vote(postagem.pk, opcao_id, request.profile.id) == polls.NOT_FOUND:
+            return json_error("Opcao not found", status=404)
+        return JsonResponse(enquete_results_payload(request, postagem))
 
 
-class NotificacoesGruposUpdate(AuthenticatedView):
+class PostagensRetirarVoto(AuthenticatedView):
     def post(self, request, pk):
-        try:
-            notificacao = NotificacoesGrupos.objects.select_related("perfil").get(pk=pk)
-        except NotificacoesGrupos.DoesNotExist:
-            return json_error("Notificacao not found", status=404)
-        if not has_staff_access(request.profile) and notificacao.perfil_id != request.profile.id:
-            return json_error("Forbidden", status=403)
-
-        data, error = get_request_data(request)
+        postagem, error = get_postagem_for_member(request, pk)
         if error:
             return error
-        if "mensagem" in data and has_staff_access(request.profile):
-            notificacao.mensagem = data.get("mensagem") or notificacao.mensagem
-        if "lida" in data:
-            notificacao.lida = parse_bool(data.get("lida"))
-        notificacao.save()
-        return JsonResponse({"message": "Notificacao updated successfully"})
+        polls.unvote(postagem.pk, request.profile.id)
+        return JsonResponse(enquete_results_payload(request, postagem))
 
 
-class NotificacoesGruposDelete(StaffView):
-    def post(self, request, pk):
-        try:
-            notificacao = NotificacoesGrupos.objects.get(pk=pk)
-        except NotificacoesGrupos.DoesNotExist:
-            return json_error("Notificacao not found", status=404)
-        notificacao.delete()
-        return JsonResponse({"message": "Notificacao deleted successfully"})
-
-
-class RecursosEducacionaisList(View):
-    def get(self, request):
-        recursos = RecursosEducacionais.objects.select_related("igreja")
-        igreja_id, error = parse_int(request.GET.get("igreja_id"), "igreja_id", required=False)
+class PostagensResultados(AuthenticatedView):
+    def get(self, request, pk):
+        postagem, error = get_postagem_for_member(request, pk)
         if error:
             return error
-        if igreja_id is not None:
-            recursos = recursos.filter(igreja_id=igreja_id)
-        data = [recurso_payload(recurso) for recurso in recursos]
-        return JsonResponse(data, safe=False)
+        if not polls.option_texts(postagem.enquete):
+            return json_error("Postagem has no enquete", status=404)
+        return JsonResponse(enquete_results_payload(request, postagem))
+
+
+class ComentariosPostagensResource(Resource):
+    model = ComentariosPostagens
+    prefix = "comentarios-postagens"
+    label = "Comentario"
+    id_key = "comentario_id"
+    projection = serializers.COMENTARIO
+    payload = staticmethod(comentario_payload)
+    related = ("autor__user", "postagem")
+    filters = {"postagem_id": "postagem_id"}
+    fields = (
+        Field(
+            "postagem_id",
+            "fk",
+            required=True,
+            queryset=PostagensGrupos.objects.only("id", "grupo_id"),
+            attname="postagem",
+            label="Postagem",
+        ),
+        Field("conteudo", required=True),
+    )
+
+    def scope(self, request, queryset, params):
+        if "postagem_id" in params:
+            try:
+                postagem = PostagensGrupos.objects.only("grupo_id").get(pk=params["postagem_id"])
+            except PostagensGrupos.DoesNotExist:
+                return None, json_error("Postagem not found", status=404)
+            if not is_group_member(request.profile, postagem.grupo_id):
+                return None, json_error("Forbidden", status=403)
+        elif not has_staff_access(request.profile):
+            queryset = queryset.filter(
+                postagem__grupo_id__in=memberships.group_ids(request.profile)
+            )
+        return queryset, None
 
+    def can_view(self, request, obj):
+        return is_group_member(request.profile, obj.postagem.grupo_id)
 
-class RecursosEducacionaisDetail(View):
-    def get(self, request, pk):
-        try:
-            recurso = RecursosEducacionais.objects.select_related("igreja").get(pk=pk)
-        except RecursosEducacionais.DoesNotExist:
-            return json_error("Recurso Educacional not found", status=404)
-        return JsonResponse(recurso_payload(recurso))
+    def can_change(self, request, obj):
+        return is_owner_or_staff(request, obj.autor_id)
 
+    def defaults(self, request):
+        return {"autor": request.profile}
 
-class RecursosEducacionaisCreate(StaffView):
-    def post(self, request):
-        data, error = get_request_data(request)
-        if error:
-            return error
-        missing = require_fields(data, ["titulo", "igreja_id"])
-        if missing:
-            return missing
-        if not request.FILES.get("arquivo"):
-            return json_error("arquivo is required", status=400)
+    def authorize_create(self, request, obj):
+        if not is_group_member(request.profile, obj.postagem.grupo_id):
+            return json_error("Forbidden", status=403)
+        return None
 
-        igreja_id, parse_error = parse_int(data.get("igreja_id"), "igreja_id")
-        if parse_error:
-            return parse_error
-        try:
-            igreja = Igreja.objects.get(pk=igreja_id)
-        except Igreja.DoesNotExist:
-            return json_error("Igreja not found", status=404)
-
-        recurso = RecursosEducacionais.objects.create(
-            titulo=data.get("titulo"),
-            descricao=data.get("descricao", ""),
-            arquivo=request.FILES["arquivo"],
-            igreja=igreja,
-        )
-        return JsonResponse(
-            {"message": "Recurso Educacional created successfully", "recurso_id": recurso.id},
-            status=201,
+
+class MensagensPrivadasResource(Resource):
+    model = MensagensPrivadas
+    prefix = "mensagens-privadas"
+    label = "Mensagem"
+    id_key = "mensagem_id"
+    projection = serializers.MENSAGEM
+    payload = staticmethod(mensagem_payload)
+    related = ("remetente__user", "destinatario__user")
+    async_actions = ("list", "detail")
+    fields = (
+        Field(
+            "destinatario_id",
+            "fk",
+            required=True,
+            queryset=Profile.objects,
+            attname="destinatario",
+            label="Destinatario",
+        ),
+        Field("conteudo", required=True),
+        Field("lida", "bool", creatable=False),
+    )
+
+    def scope(self, request, queryset, params):
+        profile = request.profile
+        kind = request.GET.get("kind", "todas")
+        if kind == "enviadas":
+            return queryset.filter(remetente=profile), None
+        if kind == "recebidas":
+            return queryset.filter(destinatario=profile), None
+        return queryset.filter(Q(remetente=profile) | Q(destinatario=profile)), None
+
+    def can_view(self, request, obj):
+        return (
+            request.profile.id in (obj.remetente_id, obj.destinatario_id)
+            or has_staff_access(request.profile)
         )
 
+    can_change = can_view
 
-class RecursosEducacionaisUpdate(StaffView):
-    def post(self, request, pk):
-        try:
-            recurso = RecursosEducacionais.objects.get(pk=pk)
-        except RecursosEducacionais.DoesNotExist:
-            return json_error("Recurso Educacional not found", status=404)
+    def defaults(self, request):
+        return {"remetente": request.profile}
 
-        data, error = get_request_data(request)
-        if error:
-            return error
-        if "titulo" in data:
-            recurso.titulo = data.get("titulo") or recurso.titulo
-        if "descricao" in data:
-            recurso.descricao = data.get("descricao") or recurso.descricao
-        if request.FILES.get("arquivo"):
-            recurso.arquivo = request.FILES["arquivo"]
-        recurso.save()
-        return JsonResponse({"message": "Recurso Educacional updated successfully"})
+    def authorize_create(self, request, obj):
+        if obj.destinatario_id == request.profile.id:
+            return json_error("destinatario_id must be different", status=400)
+        return None
 
+    def check_update(self, request, obj, data):
+        # only the sender edits the text and only the recipient marks it read
+        if "conteudo" in data and not is_owner_or_staff(request, obj.remetente_id):
+            return json_error("Forbidden", status=403)
+        if "lida" in data and not is_owner_or_staff(request, obj.destinatario_id):
+            return json_error("Forbidden", status=403)
+        return None
 
-class RecursosEducacionaisDelete(StaffView):
-    def post(self, request, pk):
-        try:
-            recurso = RecursosEducacionais.objects.get(pk=pk)
-        except RecursosEducacionais.DoesNotExist:
-            return json_error("Recurso Educacional not found", status=404)
-        recurso.delete()
-        return JsonResponse({"message": "Recurso Educacional deleted successfully"})
 
+RESOURCES = {
+    resource.prefix: resource
+    for resource in (
+        IgrejaResource(),
+        GruposResource(),
+        EventsResource(),
+        AtividadesResource(),
+        ComunicadosResource(),
+        AvisosResource(),
+        NotificacoesGruposResource(),
+        RecursosEducacionaisResource(),
+        ArquivosIgrejaResource(),
+        PostagensGruposResource(),
+        ComentariosPostagensResource(),
+        MensagensPrivadasResource(),
+    )
+}
+
+
+class SearchList(AuthenticatedView):
+    max_page_size = 50
 
-class ArquivosIgrejaList(View):
     def get(self, request):
-        arquivos = ArquivosIgreja.objects.select_related("igreja")
-        igreja_id, error = parse_int(request.GET.get("igreja_id"), "igreja_id", required=False)
+        query = request.GET.get("q", "").strip()
+        if not query:
+            return json_error("q is required", status=400)
+        paging, error = parse_page(request, max_size=self.max_page_size)
         if error:
             return error
-        if igreja_id is not None:
-            arquivos = arquivos.filter(igreja_id=igreja_id)
-        data = [arquivo_payload(arquivo) for arquivo in arquivos]
-        return JsonResponse(data, safe=False)
+        page, page_size = paging
 
+        entries = SearchEntry.objects.all()
+        tipo = request.GET.get("tipo")
+        if tipo:
+            entries = entries.filter(tipo=tipo)
+        entries = search_entries(visible_entries(entries, request.profile), query)
 
-class ArquivosIgrejaDetail(View):
-    def get(self, request, pk):
-        try:
-            arquivo = ArquivosIgreja.objects.select_related("igreja").get(pk=pk)
-        except ArquivosIgreja.DoesNotExist:
-            return json_error("Arquivo Igreja not found", status=404)
-        return JsonResponse(arquivo_payload(arquivo))
+        offset = (page - 1) * page_size
+        rows = list(entries[offset:offset + page_size + 1])
+        return JsonResponse(
+            {
+                "query": query,
+                "page": page,
+                "page_size": page_size,
+                "has_next": len(rows) > page_size,
+                "results": [search_entry_payload(entry) for entry in rows[:page_size]],
+            }
+        )
 
 
-class ArquivosIgrejaCreate(StaffView):
+def upload_session_payload(session):
+    return {
+        "upload_id": str(session.id),
+        "destino": session.destino,
+        "nome_arquivo": session.nome_arquivo,
+        "tamanho": session.tamanho,
+        "recebido": session.recebido,
+        "expira_em": uploads.expires_at(session),
+    }
+
+
+def get_upload_session(request, pk):
+    try:
+        session = UploadSession.objects.get(pk=pk)
+    except UploadSession.DoesNotExist:
+        return None, json_error("Upload not found", status=404)
+    if session.perfil_id != request.profile.id:
+        return None, json_error("Forbidden", status=403)
+    if uploads.is_expired(session):
+        uploads.discard_session(session)
+        return None, json_error("Upload expired", status=410)
+    return session, None
+
+
+class UploadsCreate(AuthenticatedView):
     def post(self, request):
-        data, error = get_request_data(request)
+        data, error = parse_json_body(request)
         if error:
             return error
-        missing = require_fields(data, ["nome_arquivo", "igreja_id"])
+        missing = require_fields(data, ["destino", "nome_arquivo", "tamanho", "sha256"])
         if missing:
             return missing
-        if not request.FILES.get("arquivo"):
-            return json_error("arquivo is required", status=400)
-
-        igreja_id, parse_error = parse_int(data.get("igreja_id"), "igreja_id")
+        destino = data.get("destino")
+        if destino not in uploads.UPLOAD_TARGETS:
+            return json_error("Invalid destino", status=400, choices=list(uploads.UPLOAD_TARGETS))
+        staff_only = RESOURCES[destino].access.get("create") == STAFF
+        if staff_only and not has_staff_access(request.profile):
+            return json_error("Forbidden", status=403)
+        tamanho, parse_error = parse_int(data.get("tamanho"), "tamanho")
         if parse_error:
             return parse_error
-        try:
-            igreja = Igreja.objects.get(pk=igreja_id)
-        except Igreja.DoesNotExist:
-            return json_error("Igreja not found", status=404)
+        if tamanho <= 0 or tamanho > settings.CHUNKED_UPLOAD_MAX_BYTES:
+            return json_error("Invalid tamanho", status=400, max=settings.CHUNKED_UPLOAD_MAX_BYTES)
 
-        arquivo = ArquivosIgreja.objects.create(
-            igreja=igreja,
+        session = UploadSession.objects.create(
+            perfil=request.profile,
+            destino=destino,
             nome_arquivo=data.get("nome_arquivo"),
-            arquivo=request.FILES["arquivo"],
+            tamanho=tamanho,
+            sha256=str(data.get("sha256")).lower(),
         )
-        return JsonResponse(
-            {"message": "Arquivo Igreja created successfully", "arquivo_id": arquivo.id},
-            status=201,
-        )
-
+        return JsonResponse(upload_session_payload(session), status=201)
 
-class ArquivosIgrejaUpdate(StaffView):
-    def post(self, request, pk):
-        try:
-            arquivo = ArquivosIgreja.objects.get(pk=pk)
-        except ArquivosIgreja.DoesNotExist:
-            return json_error("Arquivo Igreja not found", status=404)
 
-        data, error = get_request_data(request)
+class UploadsDetail(AuthenticatedView):
+    def get(self, request, pk):
+        session, error = get_upload_session(request, pk)
         if error:
             return error
-        if "nome_arquivo" in data:
-            arquivo.nome_arquivo = data.get("nome_arquivo") or arquivo.nome_arquivo
-        if request.FILES.get("arquivo"):
-            arquivo.arquivo = request.FILES["arquivo"]
-        arquivo.save()
-        return JsonResponse({"message": "Arquivo Igreja updated successfully"})
-
-
-class ArquivosIgrejaDelete(StaffView):
-    def post(self, request, pk):
-        try:
-            arquivo = ArquivosIgreja.objects.get(pk=pk)
-        except ArquivosIgreja.DoesNotExist:
-            return json_error("Arquivo Igreja not found", status=404)
-        arquivo.delete()
-        return JsonResponse({"message": "Arquivo Igreja deleted successfully"})
-
+        return JsonResponse(upload_session_payload(session))
 
-class PostagensGruposList(AuthenticatedView):
-    def get(self, request):
-        postagens = PostagensGrupos.objects.select_related("autor__user", "grupo")
-        grupo_id, error = parse_int(request.GET.get("grupo_id"), "grupo_id", required=False)
+    def put(self, request, pk):
+        session, error = get_upload_session(request, pk)
         if error:
             return error
-        if grupo_id is not None:
-            postagens = postagens.filter(grupo_id=grupo_id)
-        if not has_staff_access(request.profile):
-            postagens = postagens.filter(
-                grupo_id__in=request.profile.grupos.values_list("id", flat=True)
-            )
-        data = [postagem_payload(postagem) for postagem in postagens]
-        return JsonResponse(data, safe=False)
-
-
-class PostagensGruposDetail(AuthenticatedView):
-    def get(self, request, pk):
-        try:
-            postagem = PostagensGrupos.objects.select_related("autor__user", "grupo").get(pk=pk)
-        except PostagensGrupos.DoesNotExist:
-            return json_error("Postagem not found", status=404)
-        if not is_group_member(request.profile, postagem.grupo):
-            return json_error("Forbidden", status=403)
-        return JsonResponse(postagem_payload(postagem))
-
-
-class PostagensGruposCreate(AuthenticatedView):
-    def post(self, request):
-        data, error = get_request_data(request)
-        if error:
-            return error
-        missing = require_fields(data, ["grupo_id"])
-        if missing:
-            return missing
-
-        grupo_id, parse_error = parse_int(data.get("grupo_id"), "grupo_id")
+        byte_range = uploads.parse_content_range(request.META.get("HTTP_CONTENT_RANGE", ""))
+        if byte_range is None:
+            return json_error("Content-Range header required", status=400)
+        start, end = byte_range
+        length = end - start + 1
+        if start != session.recebido:
+            return json_error("Unexpected offset", status=409, recebido=session.recebido)
+        if end >= session.tamanho:
+            return json_error("Chunk exceeds declared tamanho", status=400)
+        content_length, parse_error = parse_int(
+            request.META.get("CONTENT_LENGTH"), "Content-Length"
+        )
         if parse_error:
             return parse_error
-        try:
-            grupo = Grupos.objects.get(pk=grupo_id)
-        except Grupos.DoesNotExist:
-            return json_error("Grupo not found", status=404)
-        if not is_group_member(request.profile, grupo):
-            return json_error("Forbidden", status=403)
-
-        conteudo = data.get("conteudo", "")
-        enquete = data.get("enquete")
-        link = data.get("link")
-        arquivo = request.FILES.get("arquivo")
-        if not any([conteudo, enquete, link, arquivo]):
-            return json_error("Provide conteudo, enquete, link, or arquivo", status=400)
+        if content_length != length:
+            return json_error("Content-Length does not match Content-Range", status=400)
 
-        postagem = PostagensGrupos.objects.create(
-            autor=request.profile,
-            grupo=grupo,
-            conteudo=conteudo,
-            arquivo=arquivo,
-            enquete=enquete,
-            link=link,
-        )
-        return JsonResponse(
-            {"message": "Postagem created successfully", "postagem_id": postagem.id},
-            status=201,
-        )
+        written = uploads.write_chunk(session, request, start, length)
+        if written is None:
+            return json_error("Unexpected offset", status=409, recebido=session.recebido)
+        if written != length:
+            return json_error("Incomplete chunk", status=400, recebido=session.recebido)
+        return JsonResponse(upload_session_payload(session))
 
 
-class PostagensGruposUpdate(AuthenticatedView):
+class UploadsFinalize(AuthenticatedView):
     def post(self, request, pk):
-        try:
-            postagem = PostagensGrupos.objects.select_related("grupo").get(pk=pk)
-        except PostagensGrupos.DoesNotExist:
-            return json_error("Postagem not found", status=404)
-        if postagem.autor_id != request.profile.id and not has_staff_access(request.profile):
-            return json_error("Forbidden", status=403)
-
-        data, error = get_request_data(request)
+        session, error = get_upload_session(request, pk)
         if error:
             return error
-        if "conteudo" in data:
-            postagem.conteudo = data.get("conteudo") or postagem.conteudo
-        if "enquete" in data:
-            postagem.enquete = data.get("enquete")
-        if "link" in data:
-            postagem.link = data.get("link")
-        if request.FILES.get("arquivo"):
-            postagem.arquivo = request.FILES["arquivo"]
-        postagem.save()
-        return JsonResponse({"message": "Postagem updated successfully"})
-
-
-class PostagensGruposDelete(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            postagem = PostagensGrupos.objects.get(pk=pk)
-        except PostagensGrupos.DoesNotExist:
-            return json_error("Postagem not found", status=404)
-        if postagem.autor_id != request.profile.id and not has_staff_access(request.profile):
-            return json_error("Forbidden", status=403)
-        postagem.delete()
-        return JsonResponse({"message": "Postagem deleted successfully"})
-
-
-class ComentariosPostagensList(AuthenticatedView):
-    def get(self, request):
-        comentarios = ComentariosPostagens.objects.select_related("autor__user", "postagem__grupo")
-        postagem_id, error = parse_int(
-            request.GET.get("postagem_id"), "postagem_id", required=False
-        )
+        if session.recebido != session.tamanho:
+            return json_error("Upload incomplete", status=409, recebido=session.recebido)
+        data, error = get_request_data(request)
         if error:
             return error
-        if postagem_id is not None:
-            comentarios = comentarios.filter(postagem_id=postagem_id)
-            try:
-                postagem = PostagensGrupos.objects.select_related("grupo").get(pk=postagem_id)
-            except PostagensGrupos.DoesNotExist:
-                return json_error("Postagem not found", status=404)
-            if not is_group_member(request.profile, postagem.grupo):
-                return json_error("Forbidden", status=403)
-        elif not has_staff_access(request.profile):
-            comentarios = comentarios.filter(
-                postagem__grupo_id__in=request.profile.grupos.values_list("id", flat=True)
-            )
-        data = [comentario_payload(comentario) for comentario in comentarios]
-        return JsonResponse(data, safe=False)
-
 
-class ComentariosPostagensDetail(AuthenticatedView):
-    def get(self, request, pk):
-        try:
-            comentario = ComentariosPostagens.objects.select_related(
-                "autor__user", "postagem__grupo"
-            ).get(pk=pk)
-        except ComentariosPostagens.DoesNotExist:
-            return json_error("Comentario not found", status=404)
-        if not is_group_member(request.profile, comentario.postagem.grupo):
-            return json_error("Forbidden", status=403)
-        return JsonResponse(comentario_payload(comentario))
-
-
-class ComentariosPostagensCreate(AuthenticatedView):
-    def post(self, request):
-        data, error = get_request_data(request)
+        resource = RESOURCES[session.destino]
+        instance, error = resource.build(request, data)
         if error:
             return error
-        missing = require_fields(data, ["postagem_id", "conteudo"])
-        if missing:
-            return missing
 
-        postagem_id, parse_error = parse_int(data.get("postagem_id"), "postagem_id")
-        if parse_error:
-            return parse_error
-        try:
-            postagem = PostagensGrupos.objects.select_related("grupo").get(pk=postagem_id)
-        except PostagensGrupos.DoesNotExist:
-            return json_error("Postagem not found", status=404)
-        if not is_group_member(request.profile, postagem.grupo):
-            return json_error("Forbidden", status=403)
+        path = uploads.part_path(session)
+        if uploads.file_sha256(path) != session.sha256:
+            uploads.discard_session(session)
+            return json_error("Checksum mismatch", status=400)
 
-        comentario = ComentariosPostagens.objects.create(
-            postagem=postagem, autor=request.profile, conteudo=data.get("conteudo")
+        uploads.attach_file(
+            instance, "arquivo", path, session.nome_arquivo, sha256=session.sha256
         )
+        resource.save(instance)
+        session.delete()
         return JsonResponse(
-            {"message": "Comentario created successfully", "comentario_id": comentario.id},
+            {
+                "message": "Upload finalized successfully",
+                "destino": session.destino,
+                "id": instance.id,
+            },
             status=201,
         )
 
 
-class ComentariosPostagensUpdate(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            comentario = ComentariosPostagens.objects.select_related("postagem__grupo").get(pk=pk)
-        except ComentariosPostagens.DoesNotExist:
-            return json_error("Comentario not found", status=404)
-        if comentario.autor_id != request.profile.id and not has_staff_access(request.profile):
-            return json_error("Forbidden", status=403)
+def can_download_postagem(profile, postagem):
+    return profile is not None and is_group_member(profile, postagem.grupo_id)
 
-        data, error = get_request_data(request)
-        if error:
-            return error
-        if "conteudo" in data:
-            comentario.conteudo = data.get("conteudo") or comentario.conteudo
-        comentario.save()
-        return JsonResponse({"message": "Comentario updated successfully"})
 
+def can_download_profile_image(profile, owner):
+    # profile lists and event participants show every member's avatar to any
+    # signed-in caller, so any signed-in caller may load it
+    return profile is not None
 
-class ComentariosPostagensDelete(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            comentario = ComentariosPostagens.objects.get(pk=pk)
-        except ComentariosPostagens.DoesNotExist:
-            return json_error("Comentario not found", status=404)
-        if comentario.autor_id != request.profile.id and not has_staff_access(request.profile):
-            return json_error("Forbidden", status=403)
-        comentario.delete()
-        return JsonResponse({"message": "Comentario deleted successfully"})
 
-
-class MensagensPrivadasList(AuthenticatedView):
-    def get(self, request):
-        kind = request.GET.get("kind", "todas")
-        mensagens = MensagensPrivadas.objects.select_related("remetente__user", "destinatario__user").filter(
-            Q(remetente=request.profile) | Q(destinatario=request.profile)
-        )
-        if kind == "enviadas":
-            mensagens = mensagens.filter(remetente=request.profile)
-        elif kind == "recebidas":
-            mensagens = mensagens.filter(destinatario=request.profile)
-        data = [mensagem_payload(mensagem) for mensagem in mensagens]
-        return JsonResponse(data, safe=False)
+# kind -> (queryset, file field, permission check or None when public)
+MEDIA_SOURCES = {
+    "arquivos-igreja": (ArquivosIgreja.objects.all(), "arquivo", None),
+    "recursos-educacionais": (RecursosEducacionais.objects.all(), "arquivo", None),
+    "postagens-grupos": (
+        PostagensGrupos.objects.all(),
+        "arquivo",
+        can_download_postagem,
+    ),
+    "profiles": (Profile.objects.all(), "image", can_download_profile_image),
+}
 
 
-class MensagensPrivadasDetail(AuthenticatedView):
-    def get(self, request, pk):
+class MediaDownload(View):
+    def get(self, request, kind, pk, variant=None):
+        if kind not in MEDIA_SOURCES:
+            return json_error("Not found", status=404)
+        queryset, field_name, check = MEDIA_SOURCES[kind]
         try:
-            mensagem = MensagensPrivadas.objects.select_related(
-                "remetente__user", "destinatario__user"
-            ).get(pk=pk)
-        except MensagensPrivadas.DoesNotExist:
-            return json_error("Mensagem not found", status=404)
-        if (
-            mensagem.remetente_id != request.profile.id
-            and mensagem.destinatario_id != request.profile.id
-            and not has_staff_access(request.profile)
-        ):
-            return json_error("Forbidden", status=403)
-        return JsonResponse(mensagem_payload(mensagem))
-
-
-class MensagensPrivadasCreate(AuthenticatedView):
-    def post(self, request):
-        data, error = get_request_data(request)
-        if error:
-            return error
-        missing = require_fields(data, ["destinatario_id", "conteudo"])
-        if missing:
-            return missing
-
-        destinatario_id, parse_error = parse_int(data.get("destinatario_id"), "destinatario_id")
-        if parse_error:
-            return parse_error
-        if destinatario_id == request.profile.id:
-            return json_error("destinatario_id must be different", status=400)
-        try:
-            destinatario = Profile.objects.get(pk=destinatario_id)
-        except Profile.DoesNotExist:
-            return json_error("Destinatario not found", status=404)
-
-        mensagem = MensagensPrivadas.objects.create(
-            remetente=request.profile,
-            destinatario=destinatario,
-            conteudo=data.get("conteudo"),
-        )
-        return JsonResponse(
-            {"message": "Mensagem created successfully", "mensagem_id": mensagem.id}, status=201
-        )
-
-
-class MensagensPrivadasUpdate(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            mensagem = MensagensPrivadas.objects.get(pk=pk)
-        except MensagensPrivadas.DoesNotExist:
-            return json_error("Mensagem not found", status=404)
-        if (
-            mensagem.remetente_id != request.profile.id
-            and mensagem.destinatario_id != request.profile.id
-            and not has_staff_access(request.profile)
-        ):
-            return json_error("Forbidden", status=403)
-
-        data, error = get_request_data(request)
-        if error:
-            return error
-        if "conteudo" in data:
-            if mensagem.remetente_id != request.profile.id and not has_staff_access(request.profile):
-                return json_error("Forbidden", status=403)
-            mensagem.conteudo = data.get("conteudo") or mensagem.conteudo
-        if "lida" in data:
-            if mensagem.destinatario_id != request.profile.id and not has_staff_access(request.profile):
+            instance = queryset.get(pk=pk)
+        except queryset.model.DoesNotExist:
+            return json_error("Not found", status=404)
+        if check is not None:
+            profile, error = get_authenticated_profile(request)
+            if error:
+                return error
+            if not check(profile, instance):
                 return json_error("Forbidden", status=403)
-            mensagem.lida = parse_bool(data.get("lida"))
-        mensagem.save()
-        return JsonResponse({"message": "Mensagem updated successfully"})
-
 
-class MensagensPrivadasDelete(AuthenticatedView):
-    def post(self, request, pk):
-        try:
-            mensagem = MensagensPrivadas.objects.get(pk=pk)
-        except MensagensPrivadas.DoesNotExist:
-            return json_error("Mensagem not found", status=404)
-        if (
-            mensagem.remetente_id != request.profile.id
-            and mensagem.destinatario_id != request.profile.id
-            and not has_staff_access(request.profile)
-        ):
-            return json_error("Forbidden", status=403)
-        mensagem.delete()
-        return JsonResponse({"message": "Mensagem deleted successfully"})
+        field_file = getattr(instance, field_name)
+        if not field_file:
+            return json_error("File not found", status=404)
+        if variant is not None:
+            # derivatives are served under the same permission as their source
+            sources = IMAGE_SOURCES.get(queryset.model)
+            variants = getattr(instance, sources[1]) if sources else None
+            name = current_variants(field_file.name, variants).get(variant)
+            if name is None:
+                return json_error("File not found", status=404)
+            field_file = FieldFile(instance, field_file.field, name)
+        response = serve_field_file(request, field_file)
+        if response is None:
+            return json_error("File not found", status=404)
+        return response
@@ -1,17 +1,70 @@
+import hashlib
+import math
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
-from django.http import HttpResponse
+from django.core.cache import cache, caches
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .ratelimit import build_limiter
+from .routers import replica_reads
 
 
-class SimpleCorsMiddleware:
+class DualModeMiddleware:
+    # Runs natively in both handler modes, so an ASGI deployment with async
+    # views does not bounce every request through a thread.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        if request.path.startswith("/api/") and request.method == "OPTIONS":
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class SimpleCorsMiddleware(DualModeMiddleware):
+    def is_preflight(self, request):
+        return request.path.startswith("/api/") and request.method == "OPTIONS"
+
+    def handle(self, request):
+        if self.is_preflight(request):
             response = HttpResponse()
         else:
             response = self.get_response(request)
+        return self.add_headers(request, response)
 
+    async def __acall__(self, request):
+        if self.is_preflight(request):
+            response = HttpResponse()
+        else:
+            response = await self.get_response(request)
+        return self.add_headers(request, response)
+
+    def add_headers(self, request, response):
         if request.path.startswith("/api/"):
             origin = request.headers.get("Origin")
             allow_all = getattr(settings, "CORS_ALLOW_ALL_ORIGINS", False)
@@ -20,12 +73,222 @@ class SimpleCorsMiddleware:
             if allow_all:
                 response["Access-Control-Allow-Origin"] = "*" if not origin else origin
                 if origin:
-                    response["Vary"] = "Origin"
+                    patch_vary_headers(response, ("Origin",))
             elif origin and origin in allowed:
                 response["Access-Control-Allow-Origin"] = origin
-                response["Vary"] = "Origin"
+                patch_vary_headers(response, ("Origin",))
+
+            response["Access-Control-Allow-Methods"] = "GET, POST, PUT, OPTIONS"
+            response["Access-Control-Allow-Headers"] = "Content-Type, Content-Range, Authorization"
+
+        return response
+
+
+class ReplicaRoutingMiddleware(DualModeMiddleware):
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def sticky_keys(self, request):
+        keys = [f"replica-sticky:ip:{request.META.get('REMOTE_ADDR', '')}"]
+        auth_header = request.META.get("HTTP_AUTHORIZATION", "")
+        if auth_header:
+            digest = hashlib.sha256(auth_header.encode()).hexdigest()
+            keys.append(f"replica-sticky:token:{digest}")
+        return keys
+
+    def routed(self, request):
+        return getattr(settings, "DATABASE_REPLICAS", []) and request.path.startswith("/api/")
+
+    def handle(self, request):
+        if not self.routed(request):
+            return self.get_response(request)
+
+        keys = self.sticky_keys(request)
+        if request.method in self.safe_methods and not cache.get_many(keys):
+            reset_token = replica_reads.set(True)
+            try:
+                return self.get_response(request)
+            finally:
+                replica_reads.reset(reset_token)
+
+        response = self.get_response(request)
+        if request.method not in self.safe_methods:
+            cache.set_many(
+                {key: True for key in keys}, getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+            )
+        return response
+
+    async def __acall__(self, request):
+        if not self.routed(request):
+            return await self.get_response(request)
+
+        keys = self.sticky_keys(request)
+        if request.method in self.safe_methods and not await cache.aget_many(keys):
+            reset_token = replica_reads.set(True)
+            try:
+                return await self.get_response(request)
+            finally:
+                replica_reads.reset(reset_token)
+
+        response = await self.get_response(request)
+        if request.method not in self.safe_methods:
+            await cache.aset_many(
+                {key: True for key in keys}, getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+            )
+        return response
+
+
+class RateLimitMiddleware(DualModeMiddleware):
+    # Buckets are chosen by URL name (see RATE_LIMITS), so the check runs in
+    # process_view, after resolution and before the view touches the database.
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.limiter = build_limiter()
+
+    def remember(self, request):
+        # Views set request.profile once the token checks out; from then on
+        # that Authorization header is limited per profile instead of per IP.
+        profile = getattr(request, "profile", None)
+        if self.limiter is not None and profile is not None:
+            self.limiter.remember(request, profile.pk)
+
+    def handle(self, request):
+        response = self.get_response(request)
+        self.remember(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.remember(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.limiter is None or request.method == "OPTIONS":
+            return None
+        retry_after = self.limiter.hit(request.resolver_match.url_name, request)
+        if not retry_after:
+            return None
+        seconds = max(math.ceil(retry_after), 1)
+        response = JsonResponse({"error": "Too many requests", "retry_after": seconds}, status=429)
+        response["Retry-After"] = str(seconds)
+        return response
+
+
+def gzip_compressor():
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def brotli_compressor():
+    compressor = brotli.Compressor(quality=5)
+    return compressor.process, compressor.finish
+
+
+def zstd_compressor():
+    compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    return compressor.compress, compressor.flush
+
 
-            response["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-            response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+# Preferred first when the client weighs several encodings equally.
+COMPRESSORS = {"gzip": gzip_compressor}
+if zstandard is not None:
+    COMPRESSORS = {"zstd": zstd_compressor, **COMPRESSORS}
+if brotli is not None:
+    COMPRESSORS = {"br": brotli_compressor, **COMPRESSORS}
 
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+ACCEPT_ENCODING_RE = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$")
+
+
+def negotiate_encoding(header):
+    weights = {}
+    for part in header.split(","):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if not match:
+            continue
+        try:
+            weights[match.group(1).lower()] = float(match.group(2) or 1)
+        except ValueError:
+            continue
+    best, best_weight = None, 0
+    for encoding in COMPRESSORS:
+        weight = weights.get(encoding, weights.get("*", 0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress_bytes(encoding, data):
+    compress, flush = COMPRESSORS[encoding]()
+    return compress(data) + flush()
+
+
+def compress_stream(encoding, chunks):
+    compress, flush = COMPRESSORS[encoding]()
+    for chunk in chunks:
+        compressed = compress(chunk)
+        if compressed:
+            yield compressed
+    yield flush()
+
+
+class CompressionMiddleware(DualModeMiddleware):
+    def is_compressible(self, response):
+        # FileResponse is left alone so the server can still use sendfile.
+        if isinstance(response, FileResponse):
+            return False
+        if response.has_header("Content-Encoding") or response.has_header("Content-Range"):
+            return False
+        if response.status_code in (204, 206, 304):
+            return False
+        content_type = response.get("Content-Type", "").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def handle(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                return response
+            response.streaming_content = compress_stream(encoding, response.streaming_content)
+            del response["Content-Length"]
+        else:
+            response.content = self.compressed_content(request, response, encoding)
+            response["Content-Length"] = str(len(response.content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
         return response
+
+    def compressed_content(self, request, response, encoding):
+        # Public (token-less) GETs repeat the same bodies, so keep the
+        # compressed variant keyed by the body hash instead of recompressing.
+        public = (
+            request.method == "GET"
+            and response.status_code == 200
+            and not request.META.get("HTTP_AUTHORIZATION")
+            and settings.COMPRESSION_CACHE_SECONDS > 0
+        )
+        if not public:
+            return compress_bytes(encoding, response.content)
+        store = caches[settings.COMPRESSION_CACHE_ALIAS]
+        key = f"compressed:{encoding}:{hashlib.sha1(response.content).hexdigest()}"
+        compressed = store.get(key)
+        if compressed is None:
+            compressed = compress_bytes(encoding, response.content)
+            store.set(key, compressed, settings.COMPRESSION_CACHE_SECONDS)
+        return compressed
@@ -0,0 +1,153 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    count, _, period = rate.partition("/")
+    return int(count), PERIODS[period.strip()[0].lower()]
+
+
+class Rule:
+    # Generic cell rate algorithm: one "theoretical arrival time" per key.
+    # A request is let through while it stays within burst * interval of
+    # the current time, so a key costs one read and one write.
+    def __init__(self, name, rate, burst, key):
+        count, period = parse_rate(rate)
+        self.name = name
+        self.interval = period / count
+        self.tolerance = self.interval * max(burst, 1)
+        self.key = key
+
+    def check(self, tat, now):
+        new_tat = max(tat or now, now) + self.interval
+        allow_at = new_tat - self.tolerance
+        if allow_at > now:
+            return None, allow_at - now
+        return new_tat, 0
+
+
+class LocalMemoryBackend:
+    # Per process: limits scale with the number of workers.
+    max_keys = 100000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def hit(self, rule, key, now):
+        with self.lock:
+            new_tat, retry_after = rule.check(self.entries.get(key), now)
+            if new_tat is not None:
+                self.entries[key] = new_tat
+                self.entries.move_to_end(key)
+                if len(self.entries) > self.max_keys:
+                    self.entries.popitem(last=False)
+            return retry_after
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CacheBackend:
+    # Shared between workers through a Django cache. Reads and writes are
+    # not atomic, so concurrent requests may overshoot a bucket slightly.
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def hit(self, rule, key, now):
+        cache_key = f"ratelimit:{key}"
+        new_tat, retry_after = rule.check(self.cache.get(cache_key), now)
+        if new_tat is not None:
+            self.cache.set(cache_key, new_tat, math.ceil(new_tat - now) + 1)
+        return retry_after
+
+    def reset(self):
+        pass
+
+
+class RateLimiter:
+    # Authorization headers seen on an authenticated response, mapped to the
+    # profile id. Only those get their own bucket; anything else (missing,
+    # bogus or not yet verified) is limited by client IP.
+    max_verified = 100000
+    verified_seconds = 600
+
+    def __init__(self, rules, backend):
+        self.rules = [Rule(name, *spec) for name, spec in rules.items()]
+        self.backend = backend
+        self.resolved = {}
+        self.verified_lock = threading.Lock()
+        self.verified = OrderedDict()
+
+    def rule_for(self, url_name):
+        # exact names win over patterns; resolved once per url name
+        if url_name not in self.resolved:
+            exact = [rule for rule in self.rules if rule.name == url_name]
+            matching = exact or [
+                rule for rule in self.rules if fnmatchcase(url_name or "", rule.name)
+            ]
+            self.resolved[url_name] = matching[0] if matching else None
+        return self.resolved[url_name]
+
+    def header_digest(self, request):
+        auth_header = request.META.get("HTTP_AUTHORIZATION", "")
+        return hashlib.sha256(auth_header.encode()).hexdigest() if auth_header else None
+
+    def remember(self, request, profile_id):
+        digest = self.header_digest(request)
+        if digest is None:
+            return
+        with self.verified_lock:
+            self.verified[digest] = (profile_id, time.time() + self.verified_seconds)
+            self.verified.move_to_end(digest)
+            if len(self.verified) > self.max_verified:
+                self.verified.popitem(last=False)
+
+    def verified_profile(self, request):
+        digest = self.header_digest(request)
+        if digest is None:
+            return None
+        with self.verified_lock:
+            entry = self.verified.get(digest)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self.verified[digest]
+                return None
+            return entry[0]
+
+    def identity(self, rule, request):
+        if rule.key == "token":
+            profile_id = self.verified_profile(request)
+            if profile_id is not None:
+                return f"profile:{profile_id}"
+        return "ip:" + request.META.get("REMOTE_ADDR", "")
+
+    def hit(self, url_name, request):
+        rule = self.rule_for(url_name)
+        if rule is None:
+            return 0
+        key = f"{rule.name}:{self.identity(rule, request)}"
+        return self.backend.hit(rule, key, time.time())
+
+
+def build_limiter():
+    backend_name = getattr(settings, "RATE_LIMIT_BACKEND", "locmem")
+    if backend_name == "off":
+        return None
+    if backend_name == "cache":
+        backend = CacheBackend(getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default"))
+    else:
+        backend = LocalMemoryBackend()
+    return RateLimiter(getattr(settings, "RATE_LIMITS", {}), backend)
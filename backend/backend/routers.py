@@ -0,0 +1,35 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+replica_reads = ContextVar("replica_reads", default=False)
+
+# Tokens are issued and rotated on the primary; reading them from a lagging
+# replica would reject a freshly issued token.
+PRIMARY_ONLY_MODELS = {("API", "authtoken")}
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if not replicas or not replica_reads.get():
+            return None
+        if (model._meta.app_label, model._meta.model_name) in PRIMARY_ONLY_MODELS:
+            return "default"
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {"default", *getattr(settings, "DATABASE_REPLICAS", [])}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, "DATABASE_REPLICAS", []):
+            return False
+        return None
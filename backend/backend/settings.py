@@ -51,6 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'backend.middleware.SimpleCorsMiddleware',
+    'backend.middleware.ReplicaRoutingMiddleware',
+    'backend.middleware.RateLimitMiddleware',
+    'backend.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +93,68 @@ DATABASES = {
     }
 }
 
+# Read replicas receive safe GET traffic through backend.routers. Locally they
+# can be SQLite copies of the primary file (SQLITE_REPLICA_PATHS=a.sqlite3,b.sqlite3).
+SQLITE_REPLICA_PATHS = [
+    path.strip()
+    for path in os.environ.get("SQLITE_REPLICA_PATHS", "").split(",")
+    if path.strip()
+]
+for index, path in enumerate(SQLITE_REPLICA_PATHS, start=1):
+    DATABASES[f"replica_{index}"] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["backend.routers.PrimaryReplicaRouter"]
+# After a write, the same token (or client IP) keeps reading from the primary
+# for this many seconds so it sees its own changes despite replication lag.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+
+# Opt-in SQLite profile for single-node deployments: WAL lets readers proceed
+# while a writer holds the lock, and busy_timeout makes writers wait instead of
+# failing with "database is locked".
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "").lower() in ("1", "true", "yes")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KB", "20000")),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+
+def sqlite_tuning_options(pragmas):
+    return {
+        "init_command": ";".join(
+            f"PRAGMA {name}={value}" for name, value in pragmas.items()
+        ),
+        "transaction_mode": "IMMEDIATE",
+    }
+
+
+if SQLITE_TUNING:
+    for database in DATABASES.values():
+        if database["ENGINE"] == "django.db.backends.sqlite3":
+            database.setdefault("OPTIONS", {}).update(sqlite_tuning_options(SQLITE_PRAGMAS))
+
+
+# Without REDIS_URL every process keeps its own LocMem cache, which is fine for
+# one process; with several workers, settings that invalidate through a cache
+# (token revocations, membership and poll caches) need the shared one, and so
+# does replica stickiness: the pin that keeps a client's reads on the primary
+# for REPLICA_STICKY_SECONDS after a write lives in the default cache.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,7 +194,116 @@ STATIC_URL = 'static/'
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
-AUTH_TOKEN_TTL_DAYS = int(os.environ.get("AUTH_TOKEN_TTL_DAYS", "7"))
+# ArquivosIgreja and RecursosEducacionais files go through the "dedup" storage,
+# which keeps one copy per distinct content under MEDIA_ROOT/blobs.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "dedup": {"BACKEND": "API.storage.DeduplicatingStorage"},
+}
+
+# /api/media/ responses are private (permission-checked) but revalidated with
+# ETag/Last-Modified. MEDIA_ACCEL_REDIRECT hands the transfer to the front-end
+# server: "x-accel-redirect" (nginx, internal location MEDIA_ACCEL_PREFIX) or
+# "x-sendfile" (Apache/lighttpd).
+MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", "3600"))
+MEDIA_ACCEL_REDIRECT = os.environ.get("MEDIA_ACCEL_REDIRECT", "").lower()
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
+
+# Thumbnails/WebP derivatives of profile images and post attachments are
+# rendered on this many background threads (0 renders inline after commit).
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get("IMAGE_DERIVATIVE_WORKERS", "2"))
+
+# Resumable uploads are assembled under MEDIA_ROOT / CHUNKED_UPLOAD_DIR and moved
+# into the model's upload_to directory on finalize. Sessions not finalized
+# within CHUNKED_UPLOAD_TTL_HOURS of their creation expire; the token sweeper
+# deletes them together with their part files.
+CHUNKED_UPLOAD_DIR = "uploads/partes"
+CHUNKED_UPLOAD_MAX_BYTES = int(os.environ.get("CHUNKED_UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+CHUNKED_UPLOAD_TTL_HOURS = int(os.environ.get("CHUNKED_UPLOAD_TTL_HOURS", "24"))
+
+# Responses smaller than COMPRESSION_MIN_SIZE bytes are sent as-is. Compressed
+# bodies of public GET responses are cached for COMPRESSION_CACHE_SECONDS.
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "512"))
+COMPRESSION_CACHE_ALIAS = "default"
+COMPRESSION_CACHE_SECONDS = int(os.environ.get("COMPRESSION_CACHE_SECONDS", "300"))
+
+# "auto" encodes API responses with orjson when it is installed; "stdlib"
+# forces json + ApiJSONEncoder (same output, datetimes included).
+JSON_ENCODER_BACKEND = os.environ.get("JSON_ENCODER_BACKEND", "auto")
+
+# Token-bucket (GCRA) limits per URL name, checked before the view runs.
+# name or fnmatch pattern -> (rate, burst, key); key is "ip" or "token"
+# (the profile behind a token that has already authenticated a request,
+# falling back to the client IP for missing or unverified headers).
+# RATE_LIMIT_BACKEND: "locmem" (per process), "cache" (shared through
+# RATE_LIMIT_CACHE_ALIAS) or "off".
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "locmem")
+RATE_LIMIT_CACHE_ALIAS = "default"
+RATE_LIMITS = {
+    "login": ("10/m", 10, "ip"),
+    "register": ("5/m", 5, "ip"),
+    "search": ("60/m", 20, "token"),
+    "*-list": ("120/m", 40, "token"),
+    "*-arquivadas": ("30/m", 10, "token"),
+    "*": (os.environ.get("RATE_LIMIT_DEFAULT", "600/m"), 100, "token"),
+}
+
+# Group/church ids of the caller are cached per profile for this many seconds
+# (0 keeps them for the current request only). Membership changes evict them
+# from the default cache, so the cache is on by default only with REDIS_URL:
+# on a per-process LocMem cache other workers keep serving the old groups for
+# up to MEMBERSHIP_CACHE_SECONDS after a change.
+MEMBERSHIP_CACHE_SECONDS = int(
+    os.environ.get("MEMBERSHIP_CACHE_SECONDS", "60" if REDIS_URL else "0")
+)
+
+# `manage.py archive_old_records` moves read notifications older than
+# NOTIFICACOES_RETENCAO_DIAS and messages older than MENSAGENS_RETENCAO_MESES
+# (30-day months) into the archive tables; 0 keeps them forever.
+NOTIFICACOES_RETENCAO_DIAS = int(os.environ.get("NOTIFICACOES_RETENCAO_DIAS", "30"))
+MENSAGENS_RETENCAO_MESES = int(os.environ.get("MENSAGENS_RETENCAO_MESES", "12"))
+
+# Number of latest comments embedded in each postagem of the feed (0 disables it).
+COMENTARIOS_PREVIEW_SIZE = int(os.environ.get("COMENTARIOS_PREVIEW_SIZE", "3"))
+
+# Tokens are issued per device (at most AUTH_TOKEN_MAX_PER_USER per user) and
+# expire after AUTH_TOKEN_TTL_DAYS without use; last_used_at is written at most
+# every AUTH_TOKEN_TOUCH_SECONDS. AUTH_TOKEN_MAX_AGE_DAYS caps a key's lifetime
+# (0 = no cap); clients rotate it through /api/token/refresh/.
+AUTH_TOKEN_TTL_DAYS = int(os.environ.get("AUTH_TOKEN_TTL_DAYS", "30"))
+AUTH_TOKEN_MAX_AGE_DAYS = int(os.environ.get("AUTH_TOKEN_MAX_AGE_DAYS", "180"))
+AUTH_TOKEN_TOUCH_SECONDS = int(os.environ.get("AUTH_TOKEN_TOUCH_SECONDS", "300"))
+AUTH_TOKEN_MAX_PER_USER = int(os.environ.get("AUTH_TOKEN_MAX_PER_USER", "10"))
+
+# Serve the hot read endpoints (feed, messages, events, notifications, profile
+# summary) with async views on the async ORM. Only worth it under ASGI; under
+# WSGI every async view pays for an event loop per request.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "").lower() in ("1", "true", "yes")
+
+# Password hashing for login/register runs on PASSWORD_HASH_WORKERS threads
+# (0 = on the request thread). PASSWORD_HASH_QUEUE more may wait; beyond that,
+# or after PASSWORD_HASH_TIMEOUT seconds, the request gets a 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "32"))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10"))
+
+# With AUTH_ACCESS_TOKENS, login/refresh also return a signed access token valid
+# for AUTH_ACCESS_TOKEN_SECONDS that is checked without a database query. The
+# stored token becomes the refresh token; deleting it revokes its access tokens
+# through AUTH_REVOCATION_CACHE_ALIAS, which must be shared across processes:
+# the system check fails (API.E001) when it is a per-process LocMem cache.
+AUTH_ACCESS_TOKENS = os.environ.get("AUTH_ACCESS_TOKENS", "").lower() in ("1", "true", "yes")
+AUTH_ACCESS_TOKEN_SECONDS = int(os.environ.get("AUTH_ACCESS_TOKEN_SECONDS", "300"))
+AUTH_REVOCATION_CACHE_ALIAS = os.environ.get("AUTH_REVOCATION_CACHE_ALIAS", "default")
+
+# Expired tokens, sessions and uploads are purged by `manage.py purge_expired_tokens`,
+# or every AUTH_TOKEN_SWEEP_INTERVAL seconds by a background thread (0 = off),
+# AUTH_TOKEN_SWEEP_BATCH_SIZE rows per transaction. The thread is started by
+# backend/wsgi.py and backend/asgi.py, once per server worker process.
+AUTH_TOKEN_SWEEP_INTERVAL = int(os.environ.get("AUTH_TOKEN_SWEEP_INTERVAL", "0"))
+AUTH_TOKEN_SWEEP_BATCH_SIZE = int(os.environ.get("AUTH_TOKEN_SWEEP_BATCH_SIZE", "500"))
+AUTH_TOKEN_SWEEP_PAUSE = float(os.environ.get("AUTH_TOKEN_SWEEP_PAUSE", "0.05"))
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG or os.environ.get(
     "CORS_ALLOW_ALL_ORIGINS", ""
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Started here rather than in AppConfig.ready() so migrate, shell, tests and
+# the autoreloader parent never run it; each server worker process gets one.
+from API import sweeper  # noqa: E402
+
+sweeper.start_scheduler()